@@ -0,0 +1,113 @@
+"""Microbenchmark: concurrent writes with readers, default engine versus the tuned profiles.
+
+Writer threads commit small chat-history and quiz-result rows (like quiz
+submissions, chat and podcast status updates) while reader threads scan the
+same table. Reports commits per second, failed transactions and commit latency.
+
+Run from the Backend directory:
+    python -m benchmarks.bench_db_write_concurrency
+Set BENCH_POSTGRES_URL to also compare a PostgreSQL database (the tables are
+created there and dropped afterwards).
+"""
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database.database import create_db_engine
+from models.database import Base, ChatHistory, QuizResult
+
+WORDS = ("cell energy membrane protein enzyme reaction gradient transport "
+         "nucleus division chromosome replication theory evidence model").split()
+WRITERS = 16
+READERS = 4
+COMMITS_PER_WRITER = 150
+
+
+def writer(session_factory, seed: int, latencies, errors):
+    rng = random.Random(seed)
+    for _ in range(COMMITS_PER_WRITER):
+        db = session_factory()
+        started = time.perf_counter()
+        try:
+            # No user rows exist, so foreign keys are left empty
+            db.add(ChatHistory(message=" ".join(rng.choice(WORDS) for _ in range(12)),
+                               response=" ".join(rng.choice(WORDS) for _ in range(60)),
+                               document_ids=[], language="en"))
+            db.add(QuizResult(score=rng.randint(0, 10), total_questions=10, answers=[]))
+            db.commit()
+            latencies.append((time.perf_counter() - started) * 1000)
+        except OperationalError:
+            db.rollback()
+            errors.append(1)
+        finally:
+            db.close()
+
+
+def reader(session_factory, stop: threading.Event, reads):
+    while not stop.is_set():
+        db = session_factory()
+        try:
+            db.query(func.count(ChatHistory.id)).filter(ChatHistory.response.like("%theory%")).scalar()
+            reads.append(1)
+        except OperationalError:
+            pass
+        finally:
+            db.close()
+
+
+def run(label: str, engine):
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    latencies, errors, reads, stop = [], [], [], threading.Event()
+
+    readers = [threading.Thread(target=reader, args=(session_factory, stop, reads)) for _ in range(READERS)]
+    writers = [threading.Thread(target=writer, args=(session_factory, i, latencies, errors)) for i in range(WRITERS)]
+    started = time.perf_counter()
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+    p50 = statistics.median(latencies) if latencies else 0.0
+    print(f"{label:>16} {len(latencies) / elapsed:>10.0f} {len(errors):>7} {len(reads):>7} "
+          f"{p50:>8.1f} {p99:>8.1f} {elapsed:>8.2f}")
+
+
+def main():
+    print(f"{WRITERS} writers x {COMMITS_PER_WRITER} commits, {READERS} readers")
+    print(f"{'engine':>16} {'commits/s':>10} {'failed':>7} {'reads':>7} {'p50 ms':>8} {'p99 ms':>8} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        # The engine as it was configured before the profiles
+        url = f"sqlite:///{os.path.join(tmp, 'default.db')}"
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        run("sqlite default", engine)
+        engine.dispose()
+
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'profile.db')}")
+        run("sqlite profile", engine)
+        engine.dispose()
+
+    postgres_url = os.getenv("BENCH_POSTGRES_URL")
+    if postgres_url:
+        for label, engine in (("postgres default", create_engine(postgres_url)),
+                              ("postgres profile", create_db_engine(postgres_url))):
+            run(label, engine)
+            Base.metadata.drop_all(bind=engine)
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
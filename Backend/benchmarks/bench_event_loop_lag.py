@@ -0,0 +1,98 @@
+"""Microbenchmark: event-loop lag while handlers run slow queries, inline versus db_call.
+
+A probe task sleeps 10 ms in a loop and records how late it wakes up; at the
+same time several simulated requests run a full-table scan on a temporary
+SQLite database.
+
+Run from the Backend directory:
+    python -m benchmarks.bench_event_loop_lag
+"""
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from database.database import db_call
+from models.database import Base, ChatHistory
+
+WORDS = ("cell energy membrane protein enzyme reaction gradient transport "
+         "nucleus division chromosome replication theory evidence model").split()
+PROBE_INTERVAL = 0.01
+
+
+def populate(session_factory, rows: int, seed: int = 7):
+    rng = random.Random(seed)
+    db = session_factory()
+    db.bulk_insert_mappings(ChatHistory, [
+        {
+            "user_id": rng.randint(1, 50),
+            "message": " ".join(rng.choice(WORDS) for _ in range(20)),
+            "response": " ".join(rng.choice(WORDS) for _ in range(80)),
+            "document_ids": [],
+            "language": "en",
+        }
+        for _ in range(rows)
+    ])
+    db.commit()
+    db.close()
+
+
+def slow_query(db) -> int:
+    # LIKE with a leading wildcard cannot use an index, so every row is scanned
+    return db.query(func.count(ChatHistory.id)).filter(ChatHistory.response.like("%theory evidence%")).scalar()
+
+
+async def probe(lags, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+
+async def run(label: str, session_factory, offload: bool, requests: int):
+    lags, stop = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+
+    async def handler():
+        db = session_factory()
+        try:
+            if offload:
+                return await db_call(db, slow_query, db)
+            return slow_query(db)
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[handler() for _ in range(requests)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(f"{label:>8} {requests:>8} {elapsed:>8.2f} {len(lags):>7} {statistics.median(lags):>8.1f} "
+          f"{p99:>8.1f} {lags[-1]:>8.1f}")
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                               connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        populate(session_factory, 200_000)
+
+        print(f"{'mode':>8} {'requests':>8} {'seconds':>8} {'probes':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for requests in (4, 16):
+            await run("inline", session_factory, offload=False, requests=requests)
+            await run("db_call", session_factory, offload=True, requests=requests)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
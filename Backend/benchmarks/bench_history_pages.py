@@ -0,0 +1,79 @@
+"""Microbenchmark: history page latency by depth, keyset cursor versus OFFSET and full listing.
+
+Run from the Backend directory:
+    python -m benchmarks.bench_history_pages
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.database import Base, ChatHistory
+from utils.pagination import encode_cursor, keyset_paginate
+
+ROWS = 200_000
+PAGE = 50
+REPEATS = 20
+
+
+def populate(session_factory, seed: int = 7):
+    rng = random.Random(seed)
+    started = datetime(2025, 1, 1)
+    db = session_factory()
+    db.bulk_insert_mappings(ChatHistory, [
+        {
+            # Most rows belong to one heavy user; timestamps repeat to exercise the id tie-break
+            "user_id": 1 if rng.random() < 0.9 else rng.randint(2, 50),
+            "message": "question",
+            "response": "answer " * 40,
+            "document_ids": [],
+            "language": "en",
+            "timestamp": started + timedelta(seconds=i // 3),
+        }
+        for i in range(ROWS)
+    ])
+    db.commit()
+    db.close()
+
+
+def timed(fn) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        fn()
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        populate(session_factory)
+        db = session_factory()
+
+        history = db.query(ChatHistory).filter(ChatHistory.user_id == 1)
+        newest_first = history.order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc())
+        total = history.count()
+
+        full_ms = timed(lambda: history.all())
+        print(f"unpaginated .all(): {total} rows in {full_ms:.1f} ms per request")
+        print(f"{'depth':>8} {'keyset ms':>10} {'offset ms':>10}")
+        for depth in (0, 1_000, 10_000, 100_000, total - PAGE):
+            cursor = None
+            if depth:
+                anchor = newest_first.offset(depth - 1).first()
+                cursor = encode_cursor(anchor.timestamp, anchor.id)
+            keyset_ms = timed(lambda: keyset_paginate(history, ChatHistory.id, PAGE, cursor,
+                                                      order_column=ChatHistory.timestamp))
+            offset_ms = timed(lambda: newest_first.offset(depth).limit(PAGE).all())
+            print(f"{depth:>8} {keyset_ms:>10.2f} {offset_ms:>10.2f}")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Microbenchmark: DOCX and PPTX extraction throughput on large in-memory files.
+
+Run from the Backend directory:
+    python -m benchmarks.bench_office_extract
+"""
+import asyncio
+import io
+import random
+import time
+
+import docx
+from pptx import Presentation
+from pptx.util import Inches
+
+from utils.document_processor import DocumentProcessor
+
+WORDS = ("cell energy membrane protein enzyme reaction gradient transport "
+         "nucleus division chromosome replication theory evidence model").split()
+
+
+def sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))).capitalize() + "."
+
+
+def make_docx(paragraphs: int, seed: int = 7) -> bytes:
+    rng = random.Random(seed)
+    document = docx.Document()
+    for i in range(paragraphs):
+        if i % 50 == 0:
+            document.add_heading(f"Section {i // 50 + 1}", level=1)
+        if i % 100 == 99:
+            table = document.add_table(rows=6, cols=4)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = rng.choice(WORDS)
+        document.add_paragraph(" ".join(sentence(rng) for _ in range(rng.randint(2, 6))))
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_pptx(slides: int, seed: int = 7) -> bytes:
+    rng = random.Random(seed)
+    presentation = Presentation()
+    layout = presentation.slide_layouts[1]  # Title and content
+    for i in range(slides):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f"Lecture slide {i + 1}"
+        body = slide.placeholders[1].text_frame
+        body.text = sentence(rng)
+        for _ in range(rng.randint(2, 6)):
+            body.add_paragraph().text = sentence(rng)
+        if i % 10 == 9:
+            table = slide.shapes.add_table(4, 3, Inches(1), Inches(4), Inches(6), Inches(2)).table
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = rng.choice(WORDS)
+        slide.notes_slide.notes_text_frame.text = sentence(rng)
+    buffer = io.BytesIO()
+    presentation.save(buffer)
+    return buffer.getvalue()
+
+
+async def measure(label: str, extract, data: bytes):
+    started = time.perf_counter()
+    extracted = await extract(data)
+    elapsed = time.perf_counter() - started
+    megabytes = len(data) / (1024 * 1024)
+    print(f"{label:>14} {megabytes:>8.2f} {len(extracted.text) / (1024 * 1024):>8.2f} "
+          f"{len(extracted.headings):>8} {extracted.page_count:>6} {elapsed:>8.2f} {megabytes / elapsed:>8.2f}")
+
+
+async def main():
+    print(f"{'input':>14} {'file MB':>8} {'text MB':>8} {'headings':>8} {'pages':>6} {'seconds':>8} {'MB/s':>8}")
+    for paragraphs in (2000, 8000, 32000):
+        await measure(f"docx {paragraphs}p", DocumentProcessor.extract_text_from_docx, make_docx(paragraphs))
+    for slides in (100, 400, 1600):
+        await measure(f"pptx {slides}s", DocumentProcessor.extract_text_from_pptx, make_pptx(slides))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""Microbenchmark: podcast episodes generated one after another versus the concurrent pipeline.
+
+The LLM and gTTS are replaced by fixed delays (an awaited call under the LLM
+limiter, and a blocking call) so only scheduling is measured. The sequential
+path reproduces the old loop, which ran TTS on the event loop; the pipeline
+path is PodcastService.generate_podcast. Reports wall time per podcast and the
+longest the event loop went without running other work.
+
+Run from the Backend directory:
+    python -m benchmarks.bench_podcast_pipeline
+"""
+import asyncio
+import os
+import tempfile
+import time
+from itertools import islice
+
+from sqlalchemy.orm import sessionmaker
+
+import services.podcast_service as podcast_service
+from database.database import create_db_engine
+from models.database import Base, Document, DocumentContent, PodcastJob, User
+from services.podcast_jobs import PodcastJobRunner
+from utils.llm_client import llm_limiter
+from utils.text_store import text_store
+
+EPISODES = 10
+LLM_SECONDS = 0.8
+TTS_SECONDS = 1.5
+
+
+class SimulatedLLM:
+    async def generate_response(self, prompt: str) -> str:
+        async with llm_limiter:
+            await asyncio.sleep(LLM_SECONDS)
+        return "script " * 150
+
+
+class SimulatedTTS:
+    def text_to_speech(self, text: str, output_path: str):
+        time.sleep(TTS_SECONDS)
+        with open(output_path, "wb") as f:
+            f.write(b"\xff\xfb" * 100)
+
+
+async def sequential(job):
+    """The old handler: one episode at a time, TTS blocking the event loop"""
+    document = await podcast_service.document_cache.get(job.db, 1)
+    chunks = [chunk.text for chunk in
+              islice(podcast_service.episode_splitter.iter_chunks(document.text_content), job.episodes_requested)]
+    for i, chunk in enumerate(chunks, start=1):
+        resp = await podcast_service.llm_client.generate_response(f"episode {i}:\n\n{chunk}")
+        mp3_filename = f"{job.podcast_id}_ep{i}.mp3"
+        podcast_service.tts_client.text_to_speech(resp, os.path.join(podcast_service.STATIC_DIR, mp3_filename))
+        await job.save_episode(i, resp, mp3_filename)
+
+
+async def run(label: str, handler, session_factory):
+    with session_factory() as db:
+        podcast_id = podcast_service.PodcastService().create_podcast_task(1, [1], EPISODES, "en", None, db)
+
+    runner = PodcastJobRunner(session_factory, workers=1, poll_seconds=0.05, heartbeat_seconds=5)
+    lag, last = [0.0], time.perf_counter()
+
+    async def ticker():
+        nonlocal last
+        while True:
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            lag[0] = max(lag[0], now - last - 0.01)
+            last = now
+
+    ticking = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    runner.start(handler)
+    while True:
+        await asyncio.sleep(0.05)
+        with session_factory() as db:
+            job = db.query(PodcastJob).filter(PodcastJob.podcast_id == podcast_id).one()
+            if job.status in ("completed", "failed"):
+                break
+    elapsed = time.perf_counter() - started
+    await runner.stop()
+    ticking.cancel()
+    assert job.status == "completed" and job.episodes_done == EPISODES, job.error
+    print(f"{label:>10} {elapsed:>10.2f} {lag[0] * 1000:>14.0f}")
+
+
+def main():
+    podcast_service.llm_client = SimulatedLLM()
+    podcast_service.tts_client = SimulatedTTS()
+    with tempfile.TemporaryDirectory() as tmp:
+        podcast_service.STATIC_DIR = tmp
+        text_store.root = os.path.join(tmp, "text")
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        text = " ".join(f"word{i}" for i in range(EPISODES * 800))
+        text_store.put("0" * 64, text)
+        with session_factory() as db:
+            db.add(User(id=1, name="student", email="student@example.com"))
+            db.add(DocumentContent(id=1, content_hash="0" * 64, file_type="pdf", text_length=len(text)))
+            db.add(Document(id=1, filename="book.pdf", file_type="pdf", content_id=1, user_id=1))
+            db.commit()
+
+        print(f"{EPISODES} episodes, LLM {LLM_SECONDS}s, TTS {TTS_SECONDS}s, "
+              f"{podcast_service.TTS_WORKERS} TTS workers")
+        print(f"{'mode':>10} {'seconds':>10} {'max loop lag ms':>14}")
+        asyncio.run(run("sequential", sequential, session_factory))
+        asyncio.run(run("pipeline", podcast_service.PodcastService().generate_podcast, session_factory))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
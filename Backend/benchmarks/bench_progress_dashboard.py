@@ -0,0 +1,128 @@
+"""Microbenchmark: /progress plus /dashboard reads, raw history queries versus the maintained aggregates.
+
+The raw path reproduces the per-request queries the service used to run
+(COUNT/AVG/GROUP BY over the user's whole history, streak dates twice);
+the aggregate path calls ProgressService. Reports statements and latency per
+load as the history grows.
+
+Run from the Backend directory:
+    python -m benchmarks.bench_progress_dashboard
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import sessionmaker
+
+from database.database import create_db_engine
+from models.database import (
+    ActivityEvent, Base, ChatHistory, Document, DocumentContent, FlashcardProgress, QuizResult, User,
+)
+from services.progress_service import ProgressService
+from utils.progress_stats import activity_event, rebuild_stats
+
+USER = 1
+REPEATS = 20
+
+
+def populate(session_factory, quizzes: int, seed: int = 11):
+    rng = random.Random(seed)
+    db = session_factory()
+    db.add(User(id=USER, name="student", email="student@example.com"))
+    db.add(DocumentContent(id=1, content_hash="0" * 64, file_type="pdf"))
+    db.bulk_insert_mappings(Document, [
+        {"id": i, "filename": f"doc{i}.pdf", "file_type": "pdf", "subject": f"subject{i % 6}",
+         "content_id": 1, "user_id": USER}
+        for i in range(1, 31)
+    ])
+    started = datetime.utcnow() - timedelta(days=365)
+    results = [
+        {"user_id": USER, "document_id": rng.randint(1, 30), "score": rng.randint(0, 100),
+         "total_questions": 10, "answers": [], "taken_at": started + timedelta(minutes=rng.randint(0, 525_600))}
+        for _ in range(quizzes)
+    ]
+    chats = [
+        {"user_id": USER, "message": "question", "response": "answer", "document_ids": [], "language": "en",
+         "timestamp": started + timedelta(minutes=rng.randint(0, 525_600))}
+        for _ in range(quizzes)
+    ]
+    db.bulk_insert_mappings(QuizResult, results)
+    db.bulk_insert_mappings(ChatHistory, chats)
+    db.bulk_insert_mappings(ActivityEvent, [
+        activity_event(USER, "quiz", r["taken_at"], 450, r["document_id"], r["score"]) for r in results
+    ] + [activity_event(USER, "chat", c["timestamp"], 60) for c in chats])
+    db.bulk_insert_mappings(FlashcardProgress, [
+        {"user_id": USER, "flashcard_id": f"card{i}", "review_count": rng.randint(1, 9),
+         "last_reviewed": started + timedelta(days=rng.randint(0, 364)),
+         "next_review": started + timedelta(days=rng.randint(300, 400))}
+        for i in range(quizzes // 4)
+    ])
+    rebuild_stats(db)
+    db.commit()
+    db.close()
+
+
+def raw_load(db):
+    """The history queries one /progress plus /dashboard load used to issue"""
+    quizzes = db.query(QuizResult).filter(QuizResult.user_id == USER)
+    db.query(Document).filter(Document.user_id == USER).count()
+    quizzes.count()
+    db.query(func.avg(QuizResult.score)).filter(QuizResult.user_id == USER).scalar()
+    db.query(FlashcardProgress).filter(FlashcardProgress.user_id == USER).count()
+    subject_scores = db.query(Document.subject, func.avg(QuizResult.score)).join(
+        QuizResult, Document.id == QuizResult.document_id).filter(
+        QuizResult.user_id == USER).group_by(Document.subject)
+    subject_scores.all()
+    subject_scores.all()
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    db.query(func.date(QuizResult.taken_at), func.count(QuizResult.id)).filter(
+        QuizResult.user_id == USER, QuizResult.taken_at >= week_ago).group_by(func.date(QuizResult.taken_at)).all()
+    quizzes.order_by(QuizResult.taken_at.desc()).limit(10).all()
+    db.query(func.avg(QuizResult.score)).filter(QuizResult.user_id == USER, QuizResult.taken_at >= week_ago).scalar()
+    for _ in range(2):  # streak for /progress and again for the recommendations
+        db.query(func.date(QuizResult.taken_at)).filter(QuizResult.user_id == USER).distinct().order_by(
+            func.date(QuizResult.taken_at).desc()).all()
+    db.query(FlashcardProgress).filter(FlashcardProgress.user_id == USER,
+                                       FlashcardProgress.next_review <= datetime.utcnow()).count()
+    db.query(ChatHistory).filter(ChatHistory.user_id == USER).count()
+
+
+def aggregate_load(db, service=ProgressService()):
+    service._user_progress(USER, db)
+    service._dashboard_data(USER, db)
+
+
+def measure(engine, session_factory, load):
+    statements = []
+    listener = lambda *args: statements.append(1)
+    event.listen(engine, "before_cursor_execute", listener)
+    db = session_factory()
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        load(db)
+        db.expire_all()
+    elapsed_ms = (time.perf_counter() - started) / REPEATS * 1000
+    db.close()
+    event.remove(engine, "before_cursor_execute", listener)
+    return len(statements) // REPEATS, elapsed_ms
+
+
+def main():
+    print(f"{'quizzes':>8} {'raw stmts':>10} {'raw ms':>8} {'agg stmts':>10} {'agg ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for quizzes in (1_000, 10_000, 100_000):
+            engine = create_db_engine(f"sqlite:///{os.path.join(tmp, f'{quizzes}.db')}")
+            Base.metadata.create_all(bind=engine)
+            session_factory = sessionmaker(bind=engine)
+            populate(session_factory, quizzes)
+            raw_statements, raw_ms = measure(engine, session_factory, raw_load)
+            agg_statements, agg_ms = measure(engine, session_factory, aggregate_load)
+            print(f"{quizzes:>8} {raw_statements:>10} {raw_ms:>8.2f} {agg_statements:>10} {agg_ms:>8.2f}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Microbenchmark: TextSplitter throughput on multi-megabyte inputs.
+
+Run from the Backend directory:
+    python -m benchmarks.bench_text_splitter
+"""
+import random
+import time
+
+from utils.text_splitter import TextSplitter
+
+WORDS = ("cell energy membrane protein enzyme reaction gradient transport "
+         "nucleus division chromosome replication theory evidence model").split()
+
+
+def make_text(target_bytes: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    parts, size, section = [], 0, 1
+    while size < target_bytes:
+        if rng.random() < 0.02:
+            block = f"\n{section}.{rng.randint(1, 9)} {rng.choice(WORDS).title()} {rng.choice(WORDS).title()}\n"
+            section += 1
+        else:
+            sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))).capitalize() + "."
+                         for _ in range(rng.randint(2, 8))]
+            block = " ".join(sentences) + "\n\n"
+        parts.append(block)
+        size += len(block)
+    return "".join(parts)
+
+
+def main():
+    splitter = TextSplitter()
+    print(f"{'size':>8} {'chunks':>8} {'seconds':>8} {'MB/s':>8} {'s/MB':>8}")
+    for megabytes in (1, 2, 4, 8, 16):
+        text = make_text(megabytes * 1024 * 1024)
+        started = time.perf_counter()
+        chunks = sum(1 for _ in splitter.iter_chunks(text))
+        elapsed = time.perf_counter() - started
+        print(f"{megabytes:>6}MB {chunks:>8} {elapsed:>8.2f} {megabytes / elapsed:>8.2f} {elapsed / megabytes:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
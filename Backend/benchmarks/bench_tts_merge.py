@@ -0,0 +1,87 @@
+"""Microbenchmark: one long episode through the old TTS path versus in-memory parallel synthesis.
+
+gTTS is replaced by a stand-in that waits per 100-character request (as gTTS
+makes one request per ~100 characters) and returns silent MPEG-2 Layer III
+frames like Google's. The old path synthesizes 4000-character chunks one by
+one into .partN.mp3 files and joins them by decoding and re-encoding with
+ffmpeg (skipped when ffmpeg is not installed); the new path is TTSClient.
+Reports wall time, synthesis seconds per minute of audio and ffmpeg CPU time.
+
+Run from the Backend directory:
+    python -m benchmarks.bench_tts_merge
+"""
+import os
+import tempfile
+import textwrap
+import time
+
+from pydub import AudioSegment
+from pydub.utils import which
+
+import utils.tts_client as tts_module
+from utils.tts_client import TTSClient, _children_cpu_seconds, _scan_frames
+
+TEXT_CHARS = 12_000
+SECONDS_PER_REQUEST = 0.05
+# MPEG-2 Layer III, 32 kbps, 24 kHz, mono: the format Google returns
+FRAME = bytes([0xFF, 0xF3, 0x44, 0xC0]) + bytes(92)
+FRAMES_PER_REQUEST = 250  # ~6 s of audio per 100 characters
+
+
+class SimulatedGTTS:
+    def __init__(self, text: str, lang: str = "en"):
+        self.requests = max(1, -(-len(text) // 100))
+
+    def write_to_fp(self, fp):
+        for _ in range(self.requests):
+            time.sleep(SECONDS_PER_REQUEST)
+            fp.write(FRAME * FRAMES_PER_REQUEST)
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            self.write_to_fp(f)
+
+
+def old_path(text: str, output_path: str):
+    """The previous TTSClient: sequential 4000-character chunks via part files, joined by re-encoding"""
+    combined = AudioSegment.empty()
+    for i, chunk in enumerate(textwrap.wrap(text, 4000), start=1):
+        temp_file = f"{output_path}.part{i}.mp3"
+        SimulatedGTTS(chunk).save(temp_file)
+        combined += AudioSegment.from_file(temp_file, format="mp3")
+        os.remove(temp_file)
+    combined.export(output_path, format="mp3")
+
+
+def report(label: str, elapsed: float, audio_seconds: float, ffmpeg_cpu: float):
+    print(f"{label:>10} {elapsed:>9.2f} {audio_seconds:>9.1f} {elapsed / audio_seconds * 60:>16.2f} {ffmpeg_cpu:>11.3f}")
+
+
+def main():
+    text = " ".join(["lesson"] * (TEXT_CHARS // 7))
+    tts_module.gTTS = SimulatedGTTS
+    print(f"{len(text)} characters, {SECONDS_PER_REQUEST}s per 100-character request")
+    print(f"{'path':>10} {'seconds':>9} {'audio s':>9} {'s per audio min':>16} {'ffmpeg cpu':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        if which("ffmpeg"):
+            output_path = os.path.join(tmp, "old.mp3")
+            cpu_before = _children_cpu_seconds() or 0.0
+            started = time.perf_counter()
+            old_path(text, output_path)
+            elapsed = time.perf_counter() - started
+            audio_seconds = len(AudioSegment.from_file(output_path, format="mp3")) / 1000
+            report("old", elapsed, audio_seconds, (_children_cpu_seconds() or 0.0) - cpu_before)
+        else:
+            print(f"{'old':>10} skipped: ffmpeg not found")
+
+        output_path = os.path.join(tmp, "new.mp3")
+        started = time.perf_counter()
+        stats = TTSClient().text_to_speech(text, output_path)
+        elapsed = time.perf_counter() - started
+        with open(output_path, "rb") as f:
+            assert _scan_frames(f.read()) is not None, "joined file is not a clean frame stream"
+        report("new", elapsed, stats["audio_seconds"], stats["ffmpeg_cpu_seconds"])
+
+
+if __name__ == "__main__":
+    main()
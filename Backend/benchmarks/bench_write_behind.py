@@ -0,0 +1,90 @@
+"""Microbenchmark: chat history writes committed inline versus through the write-behind queue.
+
+Request threads save a tutor reply (ChatHistory row, activity event and
+rollups) the way ChatService does; half of the users read their history back
+right after writing, which must see the write. Reports saves per second and
+transactions committed.
+
+Run from the Backend directory:
+    python -m benchmarks.bench_write_behind
+"""
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import sessionmaker
+
+from database.database import create_db_engine
+from database.write_behind import WriteBehindQueue
+from models.database import Base, ChatHistory, User
+from utils.progress_stats import record_chat
+
+THREADS = 16
+SAVES_PER_THREAD = 200
+
+
+def save_chat(queue: WriteBehindQueue, session_factory, user_id: int, i: int, check_reads: bool):
+    db = session_factory()
+    try:
+        record = ChatHistory(user_id=user_id, message=f"question {i}", response="answer " * 80,
+                             document_ids=[], language="en", timestamp=datetime.utcnow())
+
+        def write(session):
+            session.add(record)
+            record_chat(session, user_id, record.timestamp, record.message, record.response)
+        queue.submit(db, user_id, write)
+
+        if check_reads:
+            queue.flush_user(user_id)
+            seen = db.query(func.count(ChatHistory.id)).filter(
+                ChatHistory.user_id == user_id, ChatHistory.message == f"question {i}").scalar()
+            assert seen == 1, "read-your-writes violated"
+    finally:
+        db.close()
+
+
+def run(label: str, enabled: bool, tmp: str):
+    engine = create_db_engine(f"sqlite:///{os.path.join(tmp, f'{label}.db')}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with session_factory() as db:
+        db.add_all([User(id=i, name=f"user{i}", email=f"user{i}@example.com") for i in range(1, THREADS + 1)])
+        db.commit()
+
+    queue = WriteBehindQueue(session_factory, enabled=enabled)
+    commits = []
+    event.listen(engine, "commit", lambda conn: commits.append(1))
+
+    def worker(user_id: int):
+        for i in range(SAVES_PER_THREAD):
+            save_chat(queue, session_factory, user_id, i, check_reads=user_id % 2 == 0 and i % 10 == 0)
+
+    threads = [threading.Thread(target=worker, args=(user_id,)) for user_id in range(1, THREADS + 1)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue.stop()
+    elapsed = time.perf_counter() - started
+
+    with session_factory() as db:
+        saved = db.query(func.count(ChatHistory.id)).scalar()
+    assert saved == THREADS * SAVES_PER_THREAD, f"{saved} rows saved"
+    print(f"{label:>14} {saved / elapsed:>10.0f} {len(commits):>8} {elapsed:>8.2f}")
+    engine.dispose()
+
+
+def main():
+    print(f"{THREADS} threads x {SAVES_PER_THREAD} chat saves")
+    print(f"{'mode':>14} {'saves/s':>10} {'commits':>8} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        run("inline", False, tmp)
+        run("write-behind", True, tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,119 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker, Session
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
 from models.database import Base
+import asyncio
 import os
+import threading
+
+from alembic import command
+from alembic.config import Config
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./study_guide.db")
+# Threads that run blocking Session work for async handlers; keep at or below the connection pool size
+DB_POOL_THREADS = int(os.getenv("DB_POOL_THREADS", "8"))
+
+# SQLite profile: WAL lets readers run alongside the single writer, and writers wait for the lock instead of failing
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+
+# PostgreSQL profile
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+
+def _sqlite_engine(url: str) -> Engine:
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+    )
+    in_memory = ":memory:" in url or url.rstrip("/") in ("sqlite:", "sqlite+pysqlite:")
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            # journal_mode is persistent, but setting it on every connection is cheap and idempotent
+            cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+    return engine
+
+
+def _postgres_engine(url: str) -> Engine:
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        connect_args={"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"},
+    )
+
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+def create_db_engine(url: str = DATABASE_URL) -> Engine:
+    """Engine tuned for the database behind url (SQLite or PostgreSQL profile)"""
+    if url.startswith("sqlite"):
+        return _sqlite_engine(url)
+    if url.startswith("postgresql"):
+        return _postgres_engine(url)
+    return create_engine(url, pool_pre_ping=True)
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_db_executor = ThreadPoolExecutor(max_workers=DB_POOL_THREADS, thread_name_prefix="db")
+
+def alembic_config(connection=None) -> Config:
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    config.attributes["connection"] = connection
+    return config
+
+def _unversioned_revision(connection) -> Optional[str]:
+    """Revision matching a database built by create_all before migrations existed, if this is one"""
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    if "alembic_version" in tables or "documents" not in tables:
+        return None
+
+    def columns(table: str) -> set:
+        return {column["name"] for column in inspector.get_columns(table)} if table in tables else set()
+
+    if "document_contents" not in tables or "text_content" in columns("documents"):
+        return "0001"
+    # 0003 adds whatever part of the page, outline, digest and version schema is missing
+    if "text_content" in columns("document_contents"):
+        return "0002"
+    if "flashcards" in columns("flashcard_sets"):
+        return "0004"
+    return "0005"
+
 def init_db():
-    """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    """Upgrade the schema to the latest migration"""
+    with engine.begin() as connection:
+        config = alembic_config(connection)
+        revision = _unversioned_revision(connection)
+        if revision:
+            print(f"🗂️  Stamping unversioned database at revision {revision}")
+            command.stamp(config, revision)
+        command.upgrade(config, "head")
 
 def get_db():
     """Database dependency"""
@@ -19,4 +121,24 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def _locked_call(db: Session, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    # A Session is not thread-safe; calls sharing one (e.g. a concurrent batch upload) run one at a time
+    with db.info.setdefault("db_call_lock", threading.Lock()):
+        return fn(*args, **kwargs)
+
+async def db_call(db: Session, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run blocking Session work on the bounded DB thread pool instead of the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, partial(_locked_call, db, fn, *args, **kwargs))
+
+def commit_new(db: Session, *objects):
+    """Add, commit and refresh new rows in one call, so db_call covers the whole round trip"""
+    db.add_all(objects)
+    db.commit()
+    for obj in objects:
+        db.refresh(obj)
+
+def shutdown_db_executor():
+    _db_executor.shutdown(wait=True)
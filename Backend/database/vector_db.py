@@ -1,9 +1,11 @@
 import chromadb
 from chromadb.config import Settings
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import uuid
 
+from utils.outline import find_section
+
 class VectorDB:
     def __init__(self):
         self.client = chromadb.PersistentClient(
@@ -23,31 +25,104 @@ class VectorDB:
             # Collection might already exist
             return self.client.get_collection(collection_name)
     
-    def add_documents(self, collection_name: str, documents: List[str], metadatas: List[Dict[str, Any]]):
-        """Add documents to a collection"""
+    def add_documents(self, collection_name: str, documents: List[str], metadatas: List[Dict[str, Any]],
+                      embeddings: Optional[List[List[float]]] = None):
+        """Add documents to a collection, reusing precomputed embeddings when given"""
+        if not documents:
+            return []
         collection = self.get_collection(collection_name)
         ids = [str(uuid.uuid4()) for _ in documents]
+        kwargs = {"embeddings": embeddings} if embeddings is not None else {}
         
         collection.add(
             documents=documents,
             metadatas=metadatas,
-            ids=ids
+            ids=ids,
+            **kwargs
         )
         return ids
     
+    def get_embeddings_by_hash(self, collection_name: str) -> Dict[str, List[float]]:
+        """Map each chunk hash in a collection to its stored embedding"""
+        collection = self.get_collection(collection_name)
+        results = collection.get(include=["metadatas", "embeddings"])
+        embeddings = {}
+        for metadata, embedding in zip(results["metadatas"], results["embeddings"]):
+            chunk_hash = (metadata or {}).get("chunk_hash")
+            if chunk_hash:
+                embeddings[chunk_hash] = list(embedding)
+        return embeddings
+    
+    def chunk_hashes(self, collection_name: str, start: Optional[int] = None, end: Optional[int] = None) -> List[str]:
+        """Hashes of the chunks overlapping a character range, in document order"""
+        return [span["hash"] for span in self.chunk_spans(collection_name, start, end)]
+    
+    def chunk_spans(self, collection_name: str, start: Optional[int] = None,
+                    end: Optional[int] = None) -> List[Dict[str, Any]]:
+        """{"hash", "start", "end"} of the chunks overlapping a character range, in document order"""
+        collection = self.get_collection(collection_name)
+        where = self.scope_filter(start, end)
+        kwargs = {"where": where} if where else {}
+        metadatas = [m or {} for m in collection.get(include=["metadatas"], **kwargs)["metadatas"]]
+        metadatas.sort(key=lambda metadata: metadata.get("chunk_index", 0))
+        return [{"hash": metadata["chunk_hash"], "start": metadata.get("start"), "end": metadata.get("end")}
+                for metadata in metadatas if "chunk_hash" in metadata]
+    
     def get_collection(self, collection_name: str):
         """Get existing collection"""
         return self.client.get_collection(collection_name)
     
-    def query_documents(self, collection_name: str, query: str, n_results: int = 5):
-        """Query documents from collection"""
+    def query_documents(self, collection_name: str, query: str, n_results: int = 5, where: Optional[Dict[str, Any]] = None):
+        """Query documents from collection, optionally restricted by a metadata filter"""
         collection = self.get_collection(collection_name)
+        kwargs = {"where": where} if where else {}
         results = collection.query(
             query_texts=[query],
-            n_results=n_results
+            n_results=n_results,
+            **kwargs
         )
         return results
     
+    def get_chunks(self, collection_name: str, where: Optional[Dict[str, Any]] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Fetch chunks matching a metadata filter, in document order"""
+        collection = self.get_collection(collection_name)
+        kwargs = {"where": where} if where else {}
+        results = collection.get(include=["documents", "metadatas"], **kwargs)
+        chunks = [
+            {"text": text, **(metadata or {})}
+            for text, metadata in zip(results["documents"], results["metadatas"])
+        ]
+        chunks.sort(key=lambda chunk: chunk.get("chunk_index", 0))
+        return chunks[:limit] if limit else chunks
+    
+    def document_scope(self, outline: Optional[List[Dict[str, Any]]], page_start: Optional[int] = None,
+                       page_end: Optional[int] = None, section: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Chunk filter for a page range and/or a section name resolved against a document outline"""
+        start = end = None
+        if section:
+            entry = find_section(outline, section)
+            if entry is None:
+                raise LookupError(f"Section '{section}' not found")
+            start, end = entry["start"], entry["end"]
+        return self.scope_filter(start, end, page_start, page_end)
+    
+    @staticmethod
+    def scope_filter(start: Optional[int] = None, end: Optional[int] = None,
+                     page_start: Optional[int] = None, page_end: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Metadata filter for chunks overlapping a character range and/or page range"""
+        conditions = []
+        if start is not None:
+            conditions.append({"end": {"$gt": start}})
+        if end is not None:
+            conditions.append({"start": {"$lt": end}})
+        if page_start is not None:
+            conditions.append({"page_end": {"$gte": page_start}})
+        if page_end is not None:
+            conditions.append({"page_start": {"$lte": page_end}})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+    
     def delete_collection(self, collection_name: str):
         """Delete a collection"""
         try:
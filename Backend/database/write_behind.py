@@ -0,0 +1,184 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import atexit
+import os
+import threading
+
+from sqlalchemy.orm import Session
+
+from database.database import SessionLocal
+from utils.progress_stats import batched_events
+
+# Optional write-behind for small, append-style writes (chat history, review logs)
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "0") == "1"
+# How long a write may wait for others to share its transaction
+WRITE_BEHIND_INTERVAL_MS = int(os.getenv("WRITE_BEHIND_INTERVAL_MS", "50"))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500"))
+# Longest a reader waits for its writes before reading without them; readers hold a DB pool thread meanwhile
+WRITE_BEHIND_FLUSH_TIMEOUT_S = float(os.getenv("WRITE_BEHIND_FLUSH_TIMEOUT_S", "5"))
+
+Write = Callable[[Session], Any]
+
+
+class WriteBehindQueue:
+    """Commits small writes from many requests in grouped transactions.
+
+    A write is a function applying itself to a Session. Disabled, submit()
+    applies it to the caller's session and commits right away. Enabled, it
+    is queued and one flusher thread commits the queue at most every
+    interval (sooner when it fills up or a reader is waiting), in submission
+    order. Readers call flush_user() first, so a user sees their own writes
+    unless the flush times out; stop() commits everything still queued.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, enabled: bool = WRITE_BEHIND,
+                 interval_ms: int = WRITE_BEHIND_INTERVAL_MS, max_batch: int = WRITE_BEHIND_MAX_BATCH,
+                 flush_timeout: float = WRITE_BEHIND_FLUSH_TIMEOUT_S):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self.flush_timeout = flush_timeout
+        self._pending: List[Tuple[int, Write]] = []  # (sequence number, write)
+        self._seq = 0
+        self._flushed_seq = 0
+        self._user_seq: Dict[int, int] = {}  # Last sequence number submitted per user
+        self._waiters = 0
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._cond = threading.Condition()
+        self.batches = 0
+        self.writes = 0
+        self.failed = 0
+
+    def submit(self, db: Session, user_id: Optional[int], write: Write):
+        """Apply write now (disabled, or after stop) or queue it for the next grouped commit"""
+        with self._cond:
+            queued = self.enabled and not self._stopping
+            if queued:
+                self._seq += 1
+                self._pending.append((self._seq, write))
+                if user_id is not None:
+                    self._user_seq[user_id] = self._seq
+                if self._thread is None:
+                    self._start_flusher()
+                if len(self._pending) >= self.max_batch:
+                    self._cond.notify_all()
+        if not queued:
+            write(db)
+            db.commit()
+
+    def flush_user(self, user_id: int) -> bool:
+        """Block until every write submitted for user_id is committed (read-your-writes).
+
+        Returns False if that took longer than flush_timeout; the caller then reads without them.
+        """
+        with self._cond:
+            return self._wait_for(self._user_seq.get(user_id))
+
+    def flush(self) -> bool:
+        """Block until everything submitted so far is committed, or flush_timeout passes"""
+        with self._cond:
+            return self._wait_for(self._seq)
+
+    def _wait_for(self, target: Optional[int]) -> bool:
+        if not target or target <= self._flushed_seq:
+            return True
+        self._waiters += 1
+        self._cond.notify_all()
+        try:
+            flushed = self._cond.wait_for(lambda: self._flushed_seq >= target, timeout=self.flush_timeout)
+        finally:
+            self._waiters -= 1
+        if not flushed:
+            print(f"⚠️  Write-behind flush timed out after {self.flush_timeout:.1f}s "
+                  f"({len(self._pending)} write(s) pending); reading without them")
+        return flushed
+
+    def _start_flusher(self):
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                with self._cond:
+                    while not self._pending and not self._stopping:
+                        self._cond.wait()
+                    if not self._pending:
+                        return
+                    # Give other requests the interval to join this transaction, unless someone is waiting on it
+                    self._cond.wait_for(
+                        lambda: self._waiters or self._stopping or len(self._pending) >= self.max_batch,
+                        timeout=self.interval,
+                    )
+                    batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+
+                try:
+                    self._commit([write for _, write in batch])
+                except Exception as e:
+                    # Opening the session or rolling back failed; the batch is lost but the flusher goes on
+                    self.failed += len(batch)
+                    print(f"❌ Dropped write-behind batch of {len(batch)}: {e}")
+                finally:
+                    # Waiters must be released whether or not the batch made it
+                    with self._cond:
+                        self._flushed_seq = batch[-1][0]
+                        for user_id in [user for user, seq in self._user_seq.items() if seq <= self._flushed_seq]:
+                            del self._user_seq[user_id]
+                        self._cond.notify_all()
+        finally:
+            with self._cond:
+                self._thread = None
+                if self._pending:
+                    # Died on something unexpected; a new flusher picks up what is left
+                    self._start_flusher()
+
+    def _commit(self, writes: List[Write]):
+        db = self.session_factory()
+        try:
+            try:
+                # Activity events of the whole batch share one insert and one rollup bump per user and day
+                with batched_events(db):
+                    for write in writes:
+                        write(db)
+                db.commit()
+                self.batches += 1
+                self.writes += len(writes)
+                return
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️  Write-behind batch of {len(writes)} failed ({e}); retrying one by one")
+            # One bad write must not take the rest of the batch with it
+            for write in writes:
+                try:
+                    write(db)
+                    db.commit()
+                    self.writes += 1
+                except Exception as e:
+                    db.rollback()
+                    self.failed += 1
+                    print(f"❌ Dropped write-behind write: {e}")
+            self.batches += 1
+        finally:
+            db.close()
+
+    def stop(self):
+        """Commit everything still queued and stop the flusher; later writes are applied inline"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        while thread is not None:
+            thread.join()
+            with self._cond:
+                thread = self._thread
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"enabled": self.enabled, "pending": len(self._pending), "batches": self.batches,
+                    "writes": self.writes, "failed": self.failed}
+
+
+write_behind = WriteBehindQueue()
+# Shutdown hooks call stop() too; this covers scripts and workers that exit without them
+atexit.register(write_behind.stop)
@@ -1,39 +1,47 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.staticfiles import StaticFiles
 from typing import List, Optional
 import uvicorn
 from datetime import datetime
+import json
 import os
+import re
 
 from dotenv import load_dotenv
 # Load .env file explicitly from the directory where main.py is located
 load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
 
-from database.database import get_db, init_db, Base, engine
+from database.database import get_db, init_db, db_call, shutdown_db_executor
+from database.write_behind import write_behind
 from services.pdf_service import PDFService
 from services.quiz_service import QuizService
 from services.flashcard_service import FlashcardService
 from services.chat_service import ChatService
 from services.summarizer_service import SummarizerService
-from services.podcast_service import PodcastService
+from services.podcast_service import PodcastService, STATIC_DIR
+from services.podcast_jobs import podcast_jobs
 from services.mindmap_service import MindMapService
 from services.progress_service import ProgressService
 from services.timetable_service import TimetableService
+from utils.upload_spool import UploadLimitMiddleware, UploadTooLargeError
+from utils.document_cache import document_cache
+from utils.tts_client import tts_client
+from utils.pagination import InvalidCursorError, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from models.schema import *
 from sqlalchemy.orm import Session
-from models.database import Document, Podcast
 
 
 # ✅ Define app first
 app = FastAPI(title="Personalized Study Guide Generator", version="1.0.0")
 
-# ✅ Create all tables
-Base.metadata.create_all(bind=engine) 
-
 # ✅ Mount static AFTER app is defined
-app.mount("/static", StaticFiles(directory="static"), name="static") 
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+
+# Oversized upload bodies are refused before Starlette reads them (inside CORS, so the 413 carries its headers)
+app.add_middleware(UploadLimitMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -44,10 +52,20 @@ app.add_middleware(
 )
 
 
-# Initialize database on startup
+# Bring the schema up to date on startup (Alembic migrations)
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    # Also resumes podcast jobs left queued or running by a previous run
+    podcast_jobs.start(PodcastService().generate_podcast)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Hand in-flight podcast jobs back to the queue for the next process
+    await podcast_jobs.stop()
+    # Commit queued chat and review writes before the DB pool goes away
+    write_behind.stop()
+    shutdown_db_executor()
 
 # Dependency injection
 def get_pdf_service():
@@ -84,7 +102,7 @@ def get_timetable_service():
 
         
 
-@app.post("/upload-document", response_model=List[DocumentResponse])
+@app.post("/upload-document", response_model=BatchUploadResponse)
 async def upload_document(
     files: List[UploadFile] = File(...),
     user_id: int = Form(...),
@@ -92,36 +110,155 @@ async def upload_document(
     db: Session = Depends(get_db),
     pdf_service: PDFService = Depends(get_pdf_service)
 ):
-    """Upload and process PDF/DOCX/Image files"""
+    """Upload and process PDF/DOCX/Image files concurrently"""
     try:
-        results = []
-        for file in files:
-            result = await pdf_service.process_document(file, user_id, subject, db)
-            print(f"Document uploaded successfully: ID={result.id}, UserID={result.user_id}, Filename={result.filename}")
-            results.append(result)
-        return results
+        results = await pdf_service.process_documents(files, user_id, subject, db)
     except Exception as e:
         import traceback
-        print(f"Error processing document: {e}")
+        print(f"Error processing documents: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/documents/{user_id}", response_model=List[DocumentResponse])
+    succeeded = [r for r in results if r["status"] == "success"]
+    for result in succeeded:
+        document = result["document"]
+        print(f"Document uploaded successfully: ID={document.id}, UserID={document.user_id}, Filename={document.filename}")
+    if not succeeded:
+        raise HTTPException(status_code=400, detail="; ".join(f"{r['filename']}: {r['error']}" for r in results))
+
+    return {"results": results, "succeeded": len(succeeded), "failed": len(results) - len(succeeded)}
+
+async def _document_listing(pdf_service: PDFService, db: Session, user_id: Optional[int], limit: int,
+                            cursor: Optional[str], fields: Optional[str], format: str):
+    """One page of document metadata as JSON, or as NDJSON with the cursor in X-Next-Cursor"""
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    try:
+        items, next_cursor = await db_call(db, pdf_service.list_documents, db, user_id, limit, cursor, field_list)
+    except (ValueError, InvalidCursorError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if format == "ndjson":
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        lines = (json.dumps(jsonable_encoder(item)) + "\n" for item in items)
+        return StreamingResponse(lines, media_type="application/x-ndjson", headers=headers)
+    return {"items": items, "next_cursor": next_cursor}
+
+async def _history_page(db: Session, fn, *args, limit: int, cursor: Optional[str], **options):
+    """Run a paginated service listing off the event loop and wrap it as a Page"""
+    try:
+        items, next_cursor = await db_call(db, fn, *args, db, limit=limit, cursor=cursor, **options)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/documents/{user_id}", response_model=DocumentPage)
 async def get_user_documents(
     user_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields, e.g. id,filename"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db),
+    pdf_service: PDFService = Depends(get_pdf_service)
+):
+    """Newest-first page of a user's document metadata"""
+    return await _document_listing(pdf_service, db, user_id, limit, cursor, fields, format)
+
+_CHAR_RANGE_RE = re.compile(r"chars=(\d*)-(\d*)")
+
+@app.get("/documents/{document_id}/text")
+async def get_document_text(
+    document_id: int,
+    start: Optional[int] = Query(None, ge=0, description="First character offset"),
+    end: Optional[int] = Query(None, ge=0, description="Character offset to stop before"),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    db: Session = Depends(get_db)
+):
+    """Stream a document's extracted text, whole or a character range.
+
+    Ranges are given either as ?start=&end= or as a `Range: chars=first-last`
+    header (inclusive, like HTTP byte ranges); partial responses are 206.
+    """
+    document = await document_cache.get(db, document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    content = document.content
+    length = content.text_length
+
+    first, stop = 0, length
+    match = _CHAR_RANGE_RE.fullmatch(range_header.strip()) if range_header else None
+    if match and (match.group(1) or match.group(2)):
+        if match.group(1):
+            first = int(match.group(1))
+            stop = min(int(match.group(2)) + 1, length) if match.group(2) else length
+        else:
+            # Suffix range: the last N characters
+            first = max(0, length - int(match.group(2)))
+        if first >= length or stop <= first:
+            raise HTTPException(status_code=416, detail="Range not satisfiable",
+                                headers={"Content-Range": f"chars */{length}"})
+    elif start is not None or end is not None:
+        first = min(start or 0, length)
+        stop = min(end if end is not None else length, length)
+        stop = max(stop, first)
+
+    headers = {"Accept-Ranges": "chars"}
+    status_code = 200
+    if (first, stop) != (0, length):
+        status_code = 206
+        headers["Content-Range"] = f"chars {first}-{max(first, stop - 1)}/{length}"
+    return StreamingResponse(content.iter_text(first, stop), status_code=status_code,
+                             media_type="text/plain; charset=utf-8", headers=headers)
+
+@app.get("/documents/{user_id}/{document_id}", response_model=DocumentResponse)
+async def get_user_document(
+    user_id: int,
+    document_id: int,
+    db: Session = Depends(get_db)
+):
+    """Metadata of one of a user's documents"""
+    document = await document_cache.get(db, document_id)
+    if not document or document.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
+
+@app.post("/documents/{document_id}/versions")
+async def upload_document_version(
+    document_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    pdf_service: PDFService = Depends(get_pdf_service)
+):
+    """Upload a revised file as the next version of a document"""
+    try:
+        return await pdf_service.create_new_version(document_id, file, db)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/documents/{document_id}")
+async def delete_document(
+    document_id: int,
     db: Session = Depends(get_db),
     pdf_service: PDFService = Depends(get_pdf_service)
 ):
-    """Get all documents uploaded by a user"""
-    return pdf_service.get_user_documents(user_id, db)
+    """Delete a document; shared content is removed once no document references it"""
+    if not await pdf_service.delete_document(document_id, db):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"document_id": document_id, "deleted": True}
 
-@app.get("/documents", response_model=List[DocumentResponse])
+@app.get("/documents", response_model=DocumentPage)
 async def get_all_documents(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields, e.g. id,filename"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     db: Session = Depends(get_db),
     pdf_service: PDFService = Depends(get_pdf_service)
 ):
-    """Get all documents"""
-    return pdf_service.get_all_documents(db)
+    """Newest-first page of all document metadata"""
+    return await _document_listing(pdf_service, db, None, limit, cursor, fields, format)
 
 # ==============================================
 # QUIZ ENDPOINTS
@@ -136,7 +273,8 @@ async def generate_quiz(
     """Generate quiz from document"""
     try:
         quiz = await quiz_service.generate_quiz_from_document(
-            request.document_id, request.num_questions, request.difficulty, db
+            request.document_id, request.num_questions, request.difficulty, db,
+            page_start=request.page_start, page_end=request.page_end, section=request.section
         )
         return quiz
     except Exception as e:
@@ -151,7 +289,7 @@ async def submit_quiz(
 ):
     """Submit quiz answers and get results"""
     try:
-        result = quiz_service.evaluate_quiz(submission, db)
+        result = await db_call(db, quiz_service.evaluate_quiz, submission, db)
         # Update progress
         await progress_service.update_quiz_progress(
             submission.user_id, submission.document_id, result, db
@@ -160,14 +298,16 @@ async def submit_quiz(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/quiz-history/{user_id}")
+@app.get("/quiz-history/{user_id}", response_model=Page)
 async def get_quiz_history(
     user_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     quiz_service: QuizService = Depends(get_quiz_service)
 ):
-    """Get quiz history for a user"""
-    return quiz_service.get_quiz_history(user_id, db)
+    """Newest-first page of a user's quiz results"""
+    return await _history_page(db, quiz_service.get_quiz_history, user_id, limit=limit, cursor=cursor)
 
 # ==============================================
 # FLASHCARD ENDPOINTS
@@ -196,18 +336,19 @@ async def study_flashcard(
 ):
     """Record flashcard study session with spaced repetition"""
     try:
-        return flashcard_service.study_flashcard(study_request, db)
+        return await db_call(db, flashcard_service.study_flashcard, study_request, db)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/flashcards/review/{user_id}")
 async def get_flashcards_for_review(
     user_id: int,
+    limit: int = Query(50, ge=1, le=500),
     db: Session = Depends(get_db),
     flashcard_service: FlashcardService = Depends(get_flashcard_service)
 ):
     """Get flashcards due for review based on spaced repetition"""
-    return flashcard_service.get_cards_for_review(user_id, db)
+    return await db_call(db, flashcard_service.get_cards_for_review, user_id, db, limit)
 
 # ==============================================
 # CHAT/TUTOR ENDPOINTS
@@ -226,21 +367,27 @@ async def chat_with_tutor(
             chat_request.message,
             chat_request.document_ids,
             chat_request.language,
-            db
+            db,
+            page_start=chat_request.page_start,
+            page_end=chat_request.page_end,
+            section=chat_request.section
         )
         return response
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/chat-history/{user_id}")
+@app.get("/chat-history/{user_id}", response_model=Page)
 async def get_chat_history(
     user_id: int,
-    limit: int = 50,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_archived: bool = Query(False, description="Continue into conversations moved to the archive"),
     db: Session = Depends(get_db),
     chat_service: ChatService = Depends(get_chat_service)
 ):
-    """Get chat history for a user"""
-    return chat_service.get_chat_history(user_id, limit, db)
+    """Newest-first page of a user's chat history"""
+    return await _history_page(db, chat_service.get_chat_history, user_id, limit=limit, cursor=cursor,
+                               include_archived=include_archived)
 
 # ==============================================
 # SUMMARIZATION ENDPOINTS
@@ -261,14 +408,16 @@ async def summarize_document(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/summaries/{user_id}")
+@app.get("/summaries/{user_id}", response_model=Page)
 async def get_user_summaries(
     user_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     summarizer_service: SummarizerService = Depends(get_summarizer_service)
 ):
-    """Get all summaries created by user"""
-    return summarizer_service.get_user_summaries(user_id, db)
+    """Newest-first page of the summaries created by a user"""
+    return await _history_page(db, summarizer_service.get_user_summaries, user_id, limit=limit, cursor=cursor)
 
 # ==============================================
 # PODCAST ENDPOINTS
@@ -277,26 +426,22 @@ async def get_user_summaries(
 @app.post("/generate-podcast")
 async def generate_podcast(
     request: PodcastRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     podcast_service: PodcastService = Depends(get_podcast_service)
 ):
-    task_id = podcast_service.create_podcast_task(
-        request.user_id, request.document_ids, request.episodes, request.language, request.topic, db
-    )
-
-    podcast = db.query(Podcast).filter(Podcast.id == task_id).first()
-    document = db.query(Document).filter(Document.id.in_(request.document_ids)).first()
-
-    background_tasks.add_task(
-        podcast_service.generate_podcast,
-        podcast, document, db
-    )
+    """Queue podcast generation; poll /podcast-status for progress"""
+    try:
+        task_id = await db_call(
+            db, podcast_service.create_podcast_task,
+            request.user_id, request.document_ids, request.episodes, request.language, request.topic, db
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    podcast_jobs.wake()
 
     return {"task_id": task_id, "status": "processing"}
 
 
-
 @app.get("/podcast-status/{task_id}")
 async def get_podcast_status(
     task_id: str,
@@ -304,17 +449,19 @@ async def get_podcast_status(
     podcast_service: PodcastService = Depends(get_podcast_service)
 ):
     """Check podcast generation status"""
-    return podcast_service.get_task_status(task_id, db)
+    return await db_call(db, podcast_service.get_task_status, task_id, db)
 
 
-@app.get("/podcasts/{user_id}")
+@app.get("/podcasts/{user_id}", response_model=Page)
 async def get_user_podcasts(
     user_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     podcast_service: PodcastService = Depends(get_podcast_service)
 ):
-    """Get all podcasts generated by user"""
-    return podcast_service.get_user_podcasts(user_id, db)
+    """Newest-first page of the podcasts generated by a user"""
+    return await _history_page(db, podcast_service.get_user_podcasts, user_id, limit=limit, cursor=cursor)
 
 # ==============================================
 # MIND MAP ENDPOINTS
@@ -338,14 +485,16 @@ async def generate_mindmap(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/mindmaps/{user_id}")
+@app.get("/mindmaps/{user_id}", response_model=Page)
 async def get_user_mindmaps(
     user_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     mindmap_service: MindMapService = Depends(get_mindmap_service)
 ):
-    """Get all mind maps created by user"""
-    return mindmap_service.get_user_mindmaps(user_id, db)
+    """Newest-first page of the mind maps created by a user"""
+    return await _history_page(db, mindmap_service.get_user_mindmaps, user_id, limit=limit, cursor=cursor)
 # Add this endpoint to your main.py file in the MIND MAP ENDPOINTS section
 
 @app.get("/mindmaps/{mindmap_id}")
@@ -356,7 +505,7 @@ async def get_specific_mindmap(
     """Get specific mind map by ID"""
     from models.database import MindMap
     
-    mindmap = db.query(MindMap).filter(MindMap.id == mindmap_id).first()
+    mindmap = await db_call(db, lambda: db.query(MindMap).filter(MindMap.id == mindmap_id).first())
     if not mindmap:
         raise HTTPException(status_code=404, detail="Mind map not found")
     
@@ -366,6 +515,7 @@ async def get_specific_mindmap(
         "nodes": mindmap.nodes or [],
         "edges": mindmap.edges or [],
         "topic": mindmap.topic,
+        "is_stale": bool(mindmap.is_stale),
         "created_at": mindmap.created_at
     }
 # ==============================================
@@ -412,6 +562,8 @@ async def get_important_questions(
             document_id, pyq_document_id, num_questions, db
         )
         return questions
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         import traceback
         print(f"Error generating important questions: {e}")
@@ -442,7 +594,7 @@ async def get_user_timetable(
     timetable_service: TimetableService = Depends(get_timetable_service)
 ):
     """Get user's current study timetable"""
-    return timetable_service.get_user_timetable(user_id, db)
+    return await db_call(db, timetable_service.get_user_timetable, user_id, db)
 
 @app.post("/update-timetable-progress")
 async def update_timetable_progress(
@@ -452,7 +604,7 @@ async def update_timetable_progress(
 ):
     """Update progress on timetable tasks"""
     try:
-        return timetable_service.update_task_progress(request, db)
+        return await db_call(db, timetable_service.update_task_progress, request, db)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -469,7 +621,7 @@ async def create_user(
     from services.user_service import UserService
     user_service = UserService()
     try:
-        user = user_service.create_user(user_data, db)
+        user = await db_call(db, user_service.create_user, user_data, db)
         return user
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -483,7 +635,7 @@ async def login(
     from services.user_service import UserService
     user_service = UserService()
     try:
-        user = user_service.login(user_data, db)
+        user = await db_call(db, user_service.login, user_data, db)
         return user
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -496,7 +648,7 @@ async def get_user(
     """Get user by ID"""
     from services.user_service import UserService
     user_service = UserService()
-    user = user_service.get_user(user_id, db)
+    user = await db_call(db, user_service.get_user, user_id, db)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -531,7 +683,11 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow(),
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "document_cache": document_cache.stats(),
+        "write_behind": write_behind.stats(),
+        "podcast_jobs": podcast_jobs.stats(),
+        "tts": tts_client.stats()
     }
 
 if __name__ == "__main__":
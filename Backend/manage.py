@@ -0,0 +1,220 @@
+"""Maintenance commands for the backend data stores.
+
+Run from the Backend directory:
+    python manage.py <command> [options]
+
+Schema changes are Alembic migrations (see migrations/); `alembic` can also be
+run directly from this directory.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date, datetime
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+
+from alembic import command
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from database.database import engine, init_db, alembic_config
+from models.database import (
+    ActivityEvent, ChatArchiveSegment, ChatHistory, Document, DocumentContent, Flashcard, FlashcardProgress, MindMap,
+    Podcast, PodcastJob, QuizResult, StudyTimetable, Summary, TimetableProgress, User, UserDailyStats, UserStats,
+    UserSubjectStats,
+)
+from utils.chat_archive import CHAT_RETENTION_DAYS, archive_chat_history, retention_cutoff
+from utils.document_digest import build_and_save_digest, is_current
+from utils.pagination import encode_cursor, keyset_query
+from utils.progress_stats import rebuild_stats
+
+# Representative forms of the per-request service queries; each must be answered from an index.
+# tests/test_query_plans.py checks the SQL the service functions themselves send
+HOT_QUERIES = {
+    "documents by user (page)": lambda db: db.query(Document.id, Document.filename).filter(
+        Document.user_id == 1, Document.id < 1000).order_by(Document.id.desc()).limit(51),
+    "content by hash": lambda db: db.query(DocumentContent).filter(DocumentContent.content_hash == "0" * 64),
+    "user by email": lambda db: db.query(User).filter(User.email == "student@example.com"),
+    "recent quiz results": lambda db: db.query(QuizResult).filter(
+        QuizResult.user_id == 1).order_by(QuizResult.taken_at.desc()).limit(10),
+    "progress totals": lambda db: db.query(UserStats).filter(UserStats.user_id == 1),
+    "weekly activity": lambda db: db.query(UserDailyStats).filter(
+        UserDailyStats.user_id == 1, UserDailyStats.day >= date(2026, 1, 1)).order_by(UserDailyStats.day),
+    "activity streak days": lambda db: db.query(UserDailyStats.day).filter(
+        UserDailyStats.user_id == 1, UserDailyStats.day <= date(2026, 1, 1), UserDailyStats.study_seconds > 0).order_by(
+        UserDailyStats.day.desc()),
+    "activity events window": lambda db: db.query(ActivityEvent).filter(
+        ActivityEvent.user_id == 1, ActivityEvent.occurred_at >= datetime(2026, 1, 1),
+        ActivityEvent.occurred_at < datetime(2026, 2, 1)),
+    "subject performance": lambda db: db.query(UserSubjectStats).filter(UserSubjectStats.user_id == 1),
+    "cards due count": lambda db: db.query(func.count(FlashcardProgress.id)).filter(
+        FlashcardProgress.user_id == 1, FlashcardProgress.next_review <= datetime(2026, 1, 1)),
+    "chat history page": lambda db: keyset_query(
+        db.query(ChatHistory).filter(ChatHistory.user_id == 1), ChatHistory.id, 50,
+        encode_cursor(datetime(2026, 1, 1), 1000), order_column=ChatHistory.timestamp),
+    "chat rows past retention": lambda db: db.query(ChatHistory).filter(
+        ChatHistory.user_id == 1, ChatHistory.timestamp < datetime(2026, 1, 1)).order_by(
+        ChatHistory.timestamp, ChatHistory.id).limit(2000),
+    "chat archive segments": lambda db: db.query(ChatArchiveSegment).filter(
+        ChatArchiveSegment.user_id == 1, ChatArchiveSegment.first_timestamp <= datetime(2026, 1, 1)).order_by(
+        ChatArchiveSegment.last_timestamp.desc(), ChatArchiveSegment.last_id.desc()),
+    "flashcards due": lambda db: db.query(Flashcard.id, Flashcard.question).join(
+        FlashcardProgress, FlashcardProgress.flashcard_id == Flashcard.id).filter(
+        FlashcardProgress.user_id == 1, FlashcardProgress.next_review <= datetime(2026, 1, 1)).order_by(
+        FlashcardProgress.next_review).limit(50),
+    "flashcard progress": lambda db: db.query(FlashcardProgress).filter(
+        FlashcardProgress.user_id == 1, FlashcardProgress.flashcard_id == "card"),
+    "summaries by user": lambda db: db.query(Summary).filter(
+        Summary.user_id == 1).order_by(Summary.created_at.desc()),
+    "summaries by document": lambda db: db.query(Summary).filter(
+        Summary.document_id == 1, Summary.is_stale.isnot(True)),
+    "mind maps by user": lambda db: db.query(MindMap).filter(
+        MindMap.user_id == 1).order_by(MindMap.created_at.desc()),
+    "mind maps by document": lambda db: db.query(MindMap).filter(
+        MindMap.document_id == 1, MindMap.is_stale.isnot(True)),
+    "podcasts by user": lambda db: db.query(Podcast).filter(
+        Podcast.user_id == 1).order_by(Podcast.created_at.desc()),
+    "podcast job claim": lambda db: db.query(PodcastJob.id).filter(
+        PodcastJob.status.in_(("queued", "running")), PodcastJob.available_at <= datetime(2026, 1, 1)).order_by(
+        PodcastJob.available_at).limit(2),
+    "podcast job by podcast": lambda db: db.query(PodcastJob).filter(PodcastJob.podcast_id == "podcast"),
+    "current timetable": lambda db: db.query(StudyTimetable).filter(
+        StudyTimetable.user_id == 1, StudyTimetable.exam_date > datetime(2026, 1, 1)).order_by(
+        StudyTimetable.created_at.desc()).limit(1),
+    "timetable task progress": lambda db: db.query(TimetableProgress).filter(
+        TimetableProgress.user_id == 1, TimetableProgress.timetable_id == "timetable",
+        TimetableProgress.task_id == "task"),
+}
+
+
+def migrate(args):
+    """Upgrade the schema to the latest migration (also run on server startup)"""
+    init_db()
+    print("✅ Database schema is up to date")
+
+
+def downgrade(args):
+    """Roll the schema back to an earlier migration"""
+    with engine.begin() as connection:
+        command.downgrade(alembic_config(connection), args.revision)
+    print(f"↩️  Database schema downgraded to {args.revision}")
+
+
+def rebuild_stats_command(args):
+    """Recompute the progress aggregates from the activity log and the document and flashcard tables"""
+    init_db()
+    with Session(engine) as db:
+        users = rebuild_stats(db, args.user_id)
+        db.commit()
+    print(f"📊 Rebuilt progress aggregates for {users} user(s)")
+
+
+def archive_chats(args):
+    """Move chat history past the retention period into compressed archive files (run from cron)"""
+    init_db()
+    older_than = retention_cutoff(args.days)
+    if older_than is None:
+        print("⏭️  Chat retention is off (0 days); nothing archived")
+        return
+    with Session(engine) as db:
+        totals = archive_chat_history(db, older_than, args.user_id)
+    print(f"🗄️  Archived {totals['rows']} chat message(s) older than {older_than:%Y-%m-%d} for {totals['users']} "
+          f"user(s) in {totals['segments']} segment(s): {totals['raw_bytes'] / 1024:.0f} KB -> "
+          f"{totals['stored_bytes'] / 1024:.0f} KB")
+
+
+def backfill_digests(args):
+    """Build the generator digest of every stored document that predates digests or has an old layout"""
+    init_db()
+    built, last_id = 0, 0
+    with Session(engine) as db:
+        while True:
+            rows = db.query(DocumentContent.id, DocumentContent.digest).filter(
+                DocumentContent.id > last_id).order_by(DocumentContent.id).limit(args.batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            for content_id, digest in rows:
+                if not is_current(digest) and build_and_save_digest(content_id) is not None:
+                    built += 1
+            db.rollback()  # End the read transaction between pages
+    print(f"🧾 Built {built} document digest(s)")
+
+
+def _plan_scans(db: Session, sql: str):
+    """(table scans, full plan) for sql; no scans means every table is reached through an index"""
+    if engine.dialect.name == "sqlite":
+        rows = db.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return [row.detail for row in rows if row.detail.startswith("SCAN ")], [row.detail for row in rows]
+
+    # PostgreSQL prefers sequential scans on small tables, so ask whether an index plan exists at all
+    db.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    nodes, stack = [], [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        nodes.append(f"{node['Node Type']} {node.get('Relation Name', '')} {node.get('Index Name', '')}".strip())
+        stack.extend(node.get("Plans", []))
+    return [node for node in nodes if node.startswith("Seq Scan")], nodes
+
+
+def check_indexes(args):
+    """EXPLAIN each hot service query and fail if any of them scans a whole table"""
+    init_db()
+    failures = 0
+    with Session(engine) as db:
+        for name, build in HOT_QUERIES.items():
+            query = build(db)
+            sql = str(query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            scans, plan = _plan_scans(db, sql)
+            print(f"{'❌' if scans else '✅'} {name}")
+            if scans or args.verbose:
+                for line in plan:
+                    print(f"      {line}")
+            failures += bool(scans)
+        db.rollback()
+
+    if failures:
+        print(f"❌ {failures} of {len(HOT_QUERIES)} queries scan a table")
+        sys.exit(1)
+    print(f"✅ All {len(HOT_QUERIES)} queries use an index")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command_parser = commands.add_parser("migrate", help=migrate.__doc__)
+    command_parser.set_defaults(func=migrate)
+
+    command_parser = commands.add_parser("downgrade", help=downgrade.__doc__)
+    command_parser.add_argument("revision", help="Target revision, e.g. 0003 or -1")
+    command_parser.set_defaults(func=downgrade)
+
+    command_parser = commands.add_parser("rebuild-stats", help=rebuild_stats_command.__doc__)
+    command_parser.add_argument("--user-id", type=int, help="Only rebuild this user's aggregates")
+    command_parser.set_defaults(func=rebuild_stats_command)
+
+    command_parser = commands.add_parser("archive-chats", help=archive_chats.__doc__)
+    command_parser.add_argument("--days", type=int, default=CHAT_RETENTION_DAYS,
+                                help=f"Keep this many days of chat history hot (default {CHAT_RETENTION_DAYS})")
+    command_parser.add_argument("--user-id", type=int, help="Only archive this user's history")
+    command_parser.set_defaults(func=archive_chats)
+
+    command_parser = commands.add_parser("backfill-digests", help=backfill_digests.__doc__)
+    command_parser.add_argument("--batch-size", type=int, default=100, help="Content rows read per query")
+    command_parser.set_defaults(func=backfill_digests)
+
+    command_parser = commands.add_parser("check-indexes", help=check_indexes.__doc__)
+    command_parser.add_argument("--verbose", action="store_true", help="Print the plan of every query")
+    command_parser.set_defaults(func=check_indexes)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
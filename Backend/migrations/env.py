@@ -0,0 +1,54 @@
+from logging.config import fileConfig
+import os
+
+from alembic import context
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
+
+from database.database import DATABASE_URL, create_db_engine
+from models.database import Base
+
+config = context.config
+target_metadata = Base.metadata
+
+# init_db() hands over its own connection; the CLI opens one from DATABASE_URL
+connection = config.attributes.get("connection")
+
+if connection is None and config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL for DATABASE_URL without connecting"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=DATABASE_URL.startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite cannot ALTER most things in place; batch mode copies the table instead
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+elif connection is not None:
+    run_migrations(connection)
+else:
+    engine = create_db_engine()
+    with engine.connect() as cli_connection:
+        run_migrations(cli_connection)
+    engine.dispose()
@@ -0,0 +1,183 @@
+"""Baseline schema, as first created by create_all: document text and collection on documents
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('preferred_language', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email')
+    )
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_table('chat_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('response', sa.Text(), nullable=False),
+    sa.Column('document_ids', sa.JSON(), nullable=True),
+    sa.Column('language', sa.String(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_chat_history_id'), 'chat_history', ['id'], unique=False)
+    op.create_table('documents',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(), nullable=False),
+    sa.Column('file_type', sa.String(), nullable=False),
+    sa.Column('subject', sa.String(), nullable=True),
+    sa.Column('text_content', sa.Text(), nullable=False),
+    sa.Column('vector_db_id', sa.String(), nullable=True),
+    sa.Column('upload_date', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_documents_id'), 'documents', ['id'], unique=False)
+    op.create_table('flashcard_progress',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('flashcard_id', sa.String(), nullable=False),
+    sa.Column('ease_factor', sa.Float(), nullable=True),
+    sa.Column('interval_days', sa.Integer(), nullable=True),
+    sa.Column('next_review', sa.DateTime(), nullable=True),
+    sa.Column('review_count', sa.Integer(), nullable=True),
+    sa.Column('last_reviewed', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_flashcard_progress_id'), 'flashcard_progress', ['id'], unique=False)
+    op.create_table('study_timetables',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('exam_date', sa.DateTime(), nullable=False),
+    sa.Column('daily_schedule', sa.JSON(), nullable=True),
+    sa.Column('subjects', sa.JSON(), nullable=True),
+    sa.Column('crash_course', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('flashcard_sets',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=True),
+    sa.Column('flashcards', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('mindmaps',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('topic', sa.String(), nullable=False),
+    sa.Column('nodes', sa.JSON(), nullable=True),
+    sa.Column('edges', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('podcasts',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('episodes', sa.JSON(), nullable=True),
+    sa.Column('script_content', sa.Text(), nullable=True),
+    sa.Column('language', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('quizzes',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=True),
+    sa.Column('questions', sa.JSON(), nullable=True),
+    sa.Column('difficulty', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('summaries',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('summary_text', sa.Text(), nullable=False),
+    sa.Column('summary_type', sa.String(), nullable=False),
+    sa.Column('language', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('timetable_progress',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('timetable_id', sa.String(), nullable=True),
+    sa.Column('task_id', sa.String(), nullable=False),
+    sa.Column('completed', sa.Boolean(), nullable=True),
+    sa.Column('hours_studied', sa.Float(), nullable=True),
+    sa.Column('completion_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['timetable_id'], ['study_timetables.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_timetable_progress_id'), 'timetable_progress', ['id'], unique=False)
+    op.create_table('quiz_results',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('document_id', sa.Integer(), nullable=True),
+    sa.Column('quiz_id', sa.String(), nullable=True),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('total_questions', sa.Integer(), nullable=False),
+    sa.Column('answers', sa.JSON(), nullable=True),
+    sa.Column('taken_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_quiz_results_id'), 'quiz_results', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_quiz_results_id'), table_name='quiz_results')
+    op.drop_table('quiz_results')
+    op.drop_index(op.f('ix_timetable_progress_id'), table_name='timetable_progress')
+    op.drop_table('timetable_progress')
+    op.drop_table('summaries')
+    op.drop_table('quizzes')
+    op.drop_table('podcasts')
+    op.drop_table('mindmaps')
+    op.drop_table('flashcard_sets')
+    op.drop_table('study_timetables')
+    op.drop_index(op.f('ix_flashcard_progress_id'), table_name='flashcard_progress')
+    op.drop_table('flashcard_progress')
+    op.drop_index(op.f('ix_documents_id'), table_name='documents')
+    op.drop_table('documents')
+    op.drop_index(op.f('ix_chat_history_id'), table_name='chat_history')
+    op.drop_table('chat_history')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,115 @@
+"""Document text and vector collection move to document_contents, shared by identical uploads
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# As of this revision; a Table (not sa.table) so inserts report the new id on every backend
+document_contents = sa.Table(
+    "document_contents", sa.MetaData(),
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("content_hash", sa.String),
+    sa.Column("file_type", sa.String),
+    sa.Column("text_content", sa.Text),
+    sa.Column("vector_db_id", sa.String),
+    sa.Column("ref_count", sa.Integer),
+    sa.Column("created_at", sa.DateTime),
+)
+
+
+def _columns(table: str) -> set:
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "document_contents" not in sa.inspect(bind).get_table_names():
+        op.create_table('document_contents',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(), nullable=False),
+        sa.Column('file_type', sa.String(), nullable=False),
+        sa.Column('text_content', sa.Text(), nullable=False),
+        sa.Column('vector_db_id', sa.String(), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_document_contents_content_hash'), 'document_contents', ['content_hash'], unique=True)
+        op.create_index(op.f('ix_document_contents_id'), 'document_contents', ['id'], unique=False)
+    if "text_content" not in _columns("documents"):
+        return
+
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.add_column(sa.Column('content_id', sa.Integer(), nullable=True))
+
+    ids = [row.id for row in bind.execute(sa.text("SELECT id FROM documents ORDER BY id"))]
+    contents = {}  # SHA-256 of the text -> content id
+    spare_collections = 0
+    for document_id in ids:
+        # One row at a time so large texts are never all in memory
+        # Typed so SQLite hands back a datetime rather than a string
+        row = bind.execute(sa.text(
+            "SELECT file_type, text_content, vector_db_id, upload_date FROM documents WHERE id = :id"
+        ).columns(upload_date=sa.DateTime), {"id": document_id}).one()
+        text = row.text_content or ""
+        # The uploaded files are gone, so copies are matched by the SHA-256 of their text
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        content_id = contents.get(content_hash)
+        if content_id is None:
+            content_id = bind.execute(document_contents.insert().values(
+                content_hash=content_hash, file_type=row.file_type, text_content=text,
+                vector_db_id=row.vector_db_id, ref_count=1, created_at=row.upload_date,
+            )).inserted_primary_key[0]
+            contents[content_hash] = content_id
+        else:
+            # Copies share the oldest document's collection; theirs are no longer referenced
+            bind.execute(document_contents.update().where(document_contents.c.id == content_id).values(
+                ref_count=document_contents.c.ref_count + 1,
+                vector_db_id=sa.func.coalesce(document_contents.c.vector_db_id, row.vector_db_id),
+            ))
+            spare_collections += row.vector_db_id is not None
+        bind.execute(sa.text("UPDATE documents SET content_id = :content_id WHERE id = :id"),
+                     {"content_id": content_id, "id": document_id})
+    print(f"📄 Moved the text of {len(ids)} document(s) into {len(contents)} content row(s); "
+          f"{spare_collections} duplicate vector collection(s) left unused")
+
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.alter_column('content_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('documents_content_id_fkey', 'document_contents', ['content_id'], ['id'])
+        batch_op.drop_column('vector_db_id')
+        batch_op.drop_column('text_content')
+    op.create_index(op.f('ix_documents_content_id'), 'documents', ['content_id'], unique=False)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    op.drop_index(op.f('ix_documents_content_id'), table_name='documents')
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.add_column(sa.Column('text_content', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('vector_db_id', sa.String(), nullable=True))
+    for row in bind.execute(sa.text("SELECT id, content_id FROM documents")).all():
+        bind.execute(sa.text(
+            "UPDATE documents SET text_content = (SELECT text_content FROM document_contents WHERE id = :content_id), "
+            "vector_db_id = (SELECT vector_db_id FROM document_contents WHERE id = :content_id) WHERE id = :id"
+        ), {"content_id": row.content_id, "id": row.id})
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.alter_column('text_content', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_constraint('documents_content_id_fkey', type_='foreignkey')
+        batch_op.drop_column('content_id')
+    op.drop_index(op.f('ix_document_contents_id'), table_name='document_contents')
+    op.drop_index(op.f('ix_document_contents_content_hash'), table_name='document_contents')
+    op.drop_table('document_contents')
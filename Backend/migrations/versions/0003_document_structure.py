@@ -0,0 +1,70 @@
+"""Page counts, outlines and digests on contents; document versions and stale artifacts
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Added one feature at a time, so a database created by create_all part way through has some of them
+COLUMNS = [
+    ("document_contents", "page_count", sa.Integer, {}),
+    ("document_contents", "outline", sa.JSON, {}),
+    ("document_contents", "digest", sa.JSON, {}),
+    ("documents", "version", sa.Integer, {"nullable": False, "server_default": "1"}),
+    ("summaries", "source_chunks", sa.JSON, {}),
+    ("summaries", "is_stale", sa.Boolean, {}),
+    ("mindmaps", "source_chunks", sa.JSON, {}),
+    ("mindmaps", "is_stale", sa.Boolean, {}),
+]
+TABLES = list(dict.fromkeys(table for table, _, _, _ in COLUMNS))
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        missing = [(name, type_, options) for column_table, name, type_, options in COLUMNS
+                   if column_table == table and name not in existing]
+        if missing:
+            with op.batch_alter_table(table) as batch_op:
+                for name, type_, options in missing:
+                    batch_op.add_column(sa.Column(name, type_(), **{"nullable": True, **options}))
+
+    if "document_versions" not in inspector.get_table_names():
+        op.create_table('document_versions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=True),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(), nullable=False),
+        sa.Column('chunks_added', sa.Integer(), nullable=True),
+        sa.Column('chunks_reused', sa.Integer(), nullable=True),
+        sa.Column('removed_chunk_hashes', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_document_versions_document_id'), 'document_versions', ['document_id'], unique=False)
+        op.create_index(op.f('ix_document_versions_id'), 'document_versions', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_document_versions_id'), table_name='document_versions')
+    op.drop_index(op.f('ix_document_versions_document_id'), table_name='document_versions')
+    op.drop_table('document_versions')
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            for column_table, name, _, _ in reversed(COLUMNS):
+                if column_table == table:
+                    batch_op.drop_column(name)
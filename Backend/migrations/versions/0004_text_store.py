@@ -0,0 +1,119 @@
+"""Move document text out of document_contents into the compressed text store
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+import json
+import os
+import struct
+import tempfile
+
+from alembic import op
+import sqlalchemy as sa
+import zstandard as zstd
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The text store layout as of this revision (utils/text_store.py reads it): TEXT_STORE_DIR/<hash[:2]>/<hash>.zst
+# holds one zstd frame per block of text, then a skippable frame with a JSON block index whose last
+# 4 bytes are the index length
+TEXT_STORE_DIR = os.getenv("TEXT_STORE_DIR", "./text_store")
+BLOCK_CHARS = 65536
+LEVEL = 9
+SKIPPABLE_MAGIC = 0x184D2A50
+INDEX_VERSION = 1
+
+document_contents = sa.table(
+    "document_contents",
+    sa.column("id", sa.Integer),
+    sa.column("content_hash", sa.String),
+    sa.column("text_content", sa.Text),
+    sa.column("text_length", sa.Integer),
+)
+
+
+def _path(key: str) -> str:
+    return os.path.join(TEXT_STORE_DIR, key[:2], f"{key}.zst")
+
+
+def _put(key: str, text: str):
+    path = _path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    compressor = zstd.ZstdCompressor(level=LEVEL)
+    frames = []
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for start in range(0, len(text), BLOCK_CHARS):
+                frame = compressor.compress(text[start:start + BLOCK_CHARS].encode("utf-8"))
+                out.write(frame)
+                frames.append(len(frame))
+            index = json.dumps({"version": INDEX_VERSION, "length": len(text), "block_chars": BLOCK_CHARS,
+                                "frames": frames}).encode("utf-8")
+            payload = index + struct.pack("<I", len(index))
+            out.write(struct.pack("<II", SKIPPABLE_MAGIC, len(payload)) + payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _read(key: str) -> str:
+    with open(_path(key), "rb") as f:
+        data = f.read()
+    (index_length,) = struct.unpack("<I", data[-4:])
+    index = json.loads(data[-4 - index_length:-4])
+    decompressor = zstd.ZstdDecompressor()
+    blocks, position = [], 0
+    for size in index["frames"]:
+        blocks.append(decompressor.decompress(data[position:position + size]).decode("utf-8"))
+        position += size
+    return "".join(blocks)
+
+
+def _columns(table: str) -> set:
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    columns = _columns("document_contents")
+    if "text_length" not in columns:
+        with op.batch_alter_table("document_contents") as batch_op:
+            batch_op.add_column(sa.Column("text_length", sa.Integer(), nullable=False, server_default="0"))
+    if "text_content" not in columns:
+        return
+
+    ids = [row.id for row in bind.execute(sa.select(document_contents.c.id).where(
+        document_contents.c.text_content.isnot(None)).order_by(document_contents.c.id))]
+    for content_id in ids:
+        # One row at a time so large texts are never all in memory
+        row = bind.execute(sa.select(document_contents.c.content_hash, document_contents.c.text_content).where(
+            document_contents.c.id == content_id)).one()
+        _put(row.content_hash, row.text_content)
+        bind.execute(document_contents.update().where(document_contents.c.id == content_id).values(
+            text_length=len(row.text_content)))
+    print(f"🗜️  Moved text of {len(ids)} content row(s) to {TEXT_STORE_DIR}")
+
+    with op.batch_alter_table("document_contents") as batch_op:
+        batch_op.drop_column("text_content")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    with op.batch_alter_table("document_contents") as batch_op:
+        batch_op.add_column(sa.Column("text_content", sa.Text(), nullable=True))
+    for row in bind.execute(sa.select(document_contents.c.id, document_contents.c.content_hash)).all():
+        text = _read(row.content_hash) if os.path.exists(_path(row.content_hash)) else ""
+        bind.execute(document_contents.update().where(document_contents.c.id == row.id).values(text_content=text))
+    with op.batch_alter_table("document_contents") as batch_op:
+        batch_op.drop_column("text_length")
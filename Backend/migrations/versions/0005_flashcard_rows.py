@@ -0,0 +1,120 @@
+"""Store flashcards as rows and index due-card lookups
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PROGRESS_INDEXES = {
+    "ix_flashcard_progress_user_next_review": ["user_id", "next_review"],
+    "ix_flashcard_progress_user_flashcard": ["user_id", "flashcard_id"],
+}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # Databases created by create_all after the model change already have the table
+    if "flashcards" not in inspector.get_table_names():
+        op.create_table('flashcards',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('set_id', sa.String(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=True),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('question', sa.Text(), nullable=False),
+        sa.Column('answer', sa.Text(), nullable=False),
+        sa.Column('difficulty', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ),
+        sa.ForeignKeyConstraint(['set_id'], ['flashcard_sets.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_flashcards_document_id'), 'flashcards', ['document_id'], unique=False)
+        op.create_index(op.f('ix_flashcards_set_id'), 'flashcards', ['set_id'], unique=False)
+
+    if "flashcards" in {column["name"] for column in inspector.get_columns("flashcard_sets")}:
+        existing = {row.id for row in bind.execute(sa.text("SELECT id FROM flashcards"))}
+        sets = bind.execute(sa.text(
+            "SELECT id, document_id, flashcards, created_at FROM flashcard_sets WHERE flashcards IS NOT NULL"
+        )).all()
+        rows = []
+        for set_row in sets:
+            cards = set_row.flashcards
+            if isinstance(cards, str):
+                cards = json.loads(cards)
+            for position, card in enumerate(cards or []):
+                if not card.get("id") or card["id"] in existing:
+                    continue
+                existing.add(card["id"])
+                rows.append({
+                    "id": card["id"],
+                    "set_id": set_row.id,
+                    "document_id": set_row.document_id,
+                    "position": position,
+                    "question": card.get("question", ""),
+                    "answer": card.get("answer", ""),
+                    "difficulty": card.get("difficulty", 0),
+                    "created_at": set_row.created_at,
+                })
+        if rows:
+            bind.execute(sa.text(
+                "INSERT INTO flashcards (id, set_id, document_id, position, question, answer, difficulty, created_at) "
+                "VALUES (:id, :set_id, :document_id, :position, :question, :answer, :difficulty, :created_at)"
+            ), rows)
+        print(f"🃏 Moved {len(rows)} card(s) from {len(sets)} set(s) into flashcards")
+
+        with op.batch_alter_table("flashcard_sets") as batch_op:
+            batch_op.drop_column("flashcards")
+
+    # Progress for cards that no longer exist can never be reviewed again
+    bind.execute(sa.text(
+        "DELETE FROM flashcard_progress WHERE flashcard_id NOT IN (SELECT id FROM flashcards)"
+    ))
+    if all(fk["referred_table"] != "flashcards" for fk in inspector.get_foreign_keys("flashcard_progress")):
+        with op.batch_alter_table("flashcard_progress") as batch_op:
+            batch_op.create_foreign_key("flashcard_progress_flashcard_id_fkey", "flashcards",
+                                        ["flashcard_id"], ["id"])
+
+    indexes = {index["name"] for index in sa.inspect(bind).get_indexes("flashcard_progress")}
+    for name, columns in PROGRESS_INDEXES.items():
+        if name not in indexes:
+            op.create_index(name, "flashcard_progress", columns, unique=False)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    for name in PROGRESS_INDEXES:
+        op.drop_index(name, table_name="flashcard_progress")
+    with op.batch_alter_table("flashcard_progress") as batch_op:
+        batch_op.drop_constraint("flashcard_progress_flashcard_id_fkey", type_="foreignkey")
+
+    with op.batch_alter_table("flashcard_sets") as batch_op:
+        batch_op.add_column(sa.Column("flashcards", sa.JSON(), nullable=True))
+    cards = {}
+    for row in bind.execute(sa.text(
+        "SELECT id, set_id, question, answer, difficulty FROM flashcards ORDER BY set_id, position"
+    )):
+        cards.setdefault(row.set_id, []).append({
+            "id": row.id, "question": row.question, "answer": row.answer, "difficulty": row.difficulty
+        })
+    for set_id, set_cards in cards.items():
+        bind.execute(sa.text("UPDATE flashcard_sets SET flashcards = :cards WHERE id = :id"),
+                     {"cards": json.dumps(set_cards), "id": set_id})
+
+    op.drop_index(op.f('ix_flashcards_set_id'), table_name='flashcards')
+    op.drop_index(op.f('ix_flashcards_document_id'), table_name='flashcards')
+    op.drop_table('flashcards')
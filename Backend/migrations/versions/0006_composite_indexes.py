@@ -0,0 +1,43 @@
+"""Composite indexes for the per-user history, progress and listing queries
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_documents_user_id_id", "documents", ["user_id", "id"]),
+    ("ix_quiz_results_user_taken_at", "quiz_results", ["user_id", "taken_at"]),
+    ("ix_chat_history_user_timestamp", "chat_history", ["user_id", "timestamp"]),
+    ("ix_summaries_user_created_at", "summaries", ["user_id", "created_at"]),
+    ("ix_summaries_document_id", "summaries", ["document_id"]),
+    ("ix_podcasts_user_created_at", "podcasts", ["user_id", "created_at"]),
+    ("ix_mindmaps_user_created_at", "mindmaps", ["user_id", "created_at"]),
+    ("ix_mindmaps_document_id", "mindmaps", ["document_id"]),
+    ("ix_study_timetables_user_created_at", "study_timetables", ["user_id", "created_at"]),
+    ("ix_timetable_progress_user_timetable_task", "timetable_progress", ["user_id", "timetable_id", "task_id"]),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if name not in {index["name"] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,66 @@
+"""Per-user progress aggregates for /progress and /dashboard
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if "user_stats" not in tables:
+        op.create_table('user_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('documents', sa.Integer(), nullable=False),
+        sa.Column('quizzes_taken', sa.Integer(), nullable=False),
+        sa.Column('quiz_score_total', sa.Float(), nullable=False),
+        sa.Column('flashcards_studied', sa.Integer(), nullable=False),
+        sa.Column('flashcard_reviews', sa.Integer(), nullable=False),
+        sa.Column('chats', sa.Integer(), nullable=False),
+        sa.Column('last_quiz_date', sa.Date(), nullable=True),
+        sa.Column('quiz_streak', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+        )
+    if "user_daily_stats" not in tables:
+        op.create_table('user_daily_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('quizzes', sa.Integer(), nullable=False),
+        sa.Column('quiz_score_total', sa.Float(), nullable=False),
+        sa.Column('flashcard_reviews', sa.Integer(), nullable=False),
+        sa.Column('chats', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'day')
+        )
+    if "user_subject_stats" not in tables:
+        op.create_table('user_subject_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('subject', sa.String(), nullable=False),
+        sa.Column('quizzes', sa.Integer(), nullable=False),
+        sa.Column('quiz_score_total', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'subject')
+        )
+    # Filled by 0008, which rebuilds the aggregates from the activity log
+
+
+def downgrade() -> None:
+    op.drop_table('user_subject_stats')
+    op.drop_table('user_daily_stats')
+    op.drop_table('user_stats')
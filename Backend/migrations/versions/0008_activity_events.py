@@ -0,0 +1,179 @@
+"""Append-only activity log; daily rollups gain study time and uploads
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH = 5000
+# Study time estimates of utils.progress_stats as of this revision
+QUIZ_SECONDS_PER_QUESTION = 45
+FLASHCARD_REVIEW_SECONDS = 20
+READING_WORDS_PER_MINUTE = 200
+MAX_EVENT_SECONDS = 3600
+
+activity_events = sa.table(
+    "activity_events",
+    sa.column("user_id", sa.Integer),
+    sa.column("kind", sa.String),
+    sa.column("occurred_at", sa.DateTime),
+    sa.column("duration_seconds", sa.Integer),
+    sa.column("document_id", sa.Integer),
+    sa.column("value", sa.Float),
+)
+
+
+def _event(user_id, kind, occurred_at, duration_seconds=0, document_id=None, value=None):
+    return {
+        "user_id": user_id,
+        "kind": kind,
+        "occurred_at": occurred_at,
+        "duration_seconds": max(0, min(int(duration_seconds), MAX_EVENT_SECONDS)),
+        "document_id": document_id,
+        "value": value,
+    }
+
+
+def _reading_seconds(*texts) -> int:
+    words = sum(len(text.split()) for text in texts if text)
+    return round(words * 60 / READING_WORDS_PER_MINUTE)
+
+
+def _backfill_events(bind):
+    """Reconstruct events from the raw tables; durations use the same estimates as live events"""
+    sources = [
+        ("taken_at", "SELECT user_id, taken_at, total_questions, document_id, score FROM quiz_results "
+         "WHERE user_id IS NOT NULL AND taken_at IS NOT NULL",
+         lambda row: [_event(row.user_id, "quiz", row.taken_at,
+                             (row.total_questions or 0) * QUIZ_SECONDS_PER_QUESTION, row.document_id, row.score)]),
+        ("timestamp", "SELECT user_id, timestamp, message, response FROM chat_history "
+         "WHERE user_id IS NOT NULL AND timestamp IS NOT NULL",
+         lambda row: [_event(row.user_id, "chat", row.timestamp, _reading_seconds(row.message, row.response))]),
+        # Only the latest review time is kept, so every review lands on it
+        ("last_reviewed", "SELECT user_id, last_reviewed, review_count FROM flashcard_progress "
+         "WHERE user_id IS NOT NULL AND last_reviewed IS NOT NULL",
+         lambda row: [_event(row.user_id, "flashcard_review", row.last_reviewed, FLASHCARD_REVIEW_SECONDS)]
+         * (row.review_count or 0)),
+        ("upload_date", "SELECT user_id, upload_date, id FROM documents "
+         "WHERE user_id IS NOT NULL AND upload_date IS NOT NULL",
+         lambda row: [_event(row.user_id, "upload", row.upload_date, document_id=row.id)]),
+    ]
+    total = 0
+    for time_column, sql, to_events in sources:
+        # Typed so SQLite hands back datetimes rather than strings
+        query = sa.text(sql).columns(**{time_column: sa.DateTime}).execution_options(yield_per=BATCH)
+        for rows in bind.execute(query).partitions():
+            events = [event for row in rows for event in to_events(row)]
+            if events:
+                bind.execute(activity_events.insert(), events)
+                total += len(events)
+    return total
+
+
+def _count(kind: str) -> str:
+    return f"SUM(CASE WHEN kind = '{kind}' THEN 1 ELSE 0 END)"
+
+
+QUIZ_SCORES = "COALESCE(SUM(CASE WHEN kind = 'quiz' THEN value ELSE 0 END), 0)"
+
+# The aggregates rebuilt from the activity log, as utils.progress_stats.rebuild_stats did for this schema;
+# the document total is the current count and flashcards_studied the cards with progress
+REBUILD_STATS = [
+    "DELETE FROM user_subject_stats",
+    "DELETE FROM user_daily_stats",
+    "DELETE FROM user_stats",
+    f"""INSERT INTO user_daily_stats
+        (user_id, day, quizzes, quiz_score_total, flashcard_reviews, chats, uploads, study_seconds)
+        SELECT user_id, DATE(occurred_at), {_count('quiz')}, {QUIZ_SCORES}, {_count('flashcard_review')},
+               {_count('chat')}, {_count('upload')}, SUM(duration_seconds)
+        FROM activity_events GROUP BY user_id, DATE(occurred_at)""",
+    f"""INSERT INTO user_stats
+        (user_id, documents, quizzes_taken, quiz_score_total, flashcards_studied, flashcard_reviews, chats,
+         study_seconds, updated_at)
+        SELECT users.user_id,
+               COALESCE(documents.count, 0), COALESCE(events.quizzes, 0), COALESCE(events.quiz_score_total, 0),
+               COALESCE(progress.count, 0), COALESCE(events.flashcard_reviews, 0), COALESCE(events.chats, 0),
+               COALESCE(events.study_seconds, 0), CURRENT_TIMESTAMP
+        FROM (SELECT user_id FROM activity_events
+              UNION SELECT user_id FROM documents WHERE user_id IS NOT NULL
+              UNION SELECT user_id FROM flashcard_progress WHERE user_id IS NOT NULL) AS users
+        LEFT JOIN (SELECT user_id, {_count('quiz')} AS quizzes, {QUIZ_SCORES} AS quiz_score_total,
+                          {_count('flashcard_review')} AS flashcard_reviews, {_count('chat')} AS chats,
+                          SUM(duration_seconds) AS study_seconds
+                   FROM activity_events GROUP BY user_id) AS events ON events.user_id = users.user_id
+        LEFT JOIN (SELECT user_id, COUNT(id) AS count FROM documents GROUP BY user_id) AS documents
+               ON documents.user_id = users.user_id
+        LEFT JOIN (SELECT user_id, COUNT(id) AS count FROM flashcard_progress GROUP BY user_id) AS progress
+               ON progress.user_id = users.user_id""",
+    """INSERT INTO user_subject_stats (user_id, subject, quizzes, quiz_score_total)
+        SELECT quiz_results.user_id, documents.subject, COUNT(quiz_results.id), COALESCE(SUM(quiz_results.score), 0)
+        FROM quiz_results JOIN documents ON quiz_results.document_id = documents.id
+        WHERE quiz_results.user_id IS NOT NULL AND documents.subject IS NOT NULL AND documents.subject != ''
+        GROUP BY quiz_results.user_id, documents.subject""",
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "activity_events" not in inspector.get_table_names():
+        op.create_table('activity_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('occurred_at', sa.DateTime(), nullable=False),
+        sa.Column('duration_seconds', sa.Integer(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=True),
+        sa.Column('value', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_activity_events_user_occurred_at', 'activity_events', ['user_id', 'occurred_at'],
+                        unique=False)
+        events = _backfill_events(bind)
+        print(f"📝 Backfilled {events} activity event(s)")
+
+    stats_columns = {column["name"] for column in inspector.get_columns("user_stats")}
+    with op.batch_alter_table('user_stats') as batch_op:
+        if "study_seconds" not in stats_columns:
+            batch_op.add_column(sa.Column('study_seconds', sa.Integer(), nullable=False, server_default='0'))
+        # Streaks now come from the daily rollups
+        if "quiz_streak" in stats_columns:
+            batch_op.drop_column('quiz_streak')
+            batch_op.drop_column('last_quiz_date')
+
+    daily_columns = {column["name"] for column in inspector.get_columns("user_daily_stats")}
+    with op.batch_alter_table('user_daily_stats') as batch_op:
+        for name in ("uploads", "study_seconds"):
+            if name not in daily_columns:
+                batch_op.add_column(sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+
+    for statement in REBUILD_STATS:
+        bind.execute(sa.text(statement))
+    users = bind.execute(sa.text("SELECT COUNT(*) FROM user_stats")).scalar()
+    print(f"📊 Built progress aggregates for {users} users")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('user_daily_stats') as batch_op:
+        batch_op.drop_column('study_seconds')
+        batch_op.drop_column('uploads')
+    with op.batch_alter_table('user_stats') as batch_op:
+        batch_op.drop_column('study_seconds')
+        batch_op.add_column(sa.Column('last_quiz_date', sa.Date(), nullable=True))
+        batch_op.add_column(sa.Column('quiz_streak', sa.Integer(), nullable=False, server_default='0'))
+    op.drop_index('ix_activity_events_user_occurred_at', table_name='activity_events')
+    op.drop_table('activity_events')
@@ -0,0 +1,47 @@
+"""Index of chat history segments moved to compressed archive files
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "chat_archive_segments" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table('chat_archive_segments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(), nullable=False),
+    sa.Column('first_timestamp', sa.DateTime(), nullable=False),
+    sa.Column('first_id', sa.Integer(), nullable=False),
+    sa.Column('last_timestamp', sa.DateTime(), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('raw_bytes', sa.Integer(), nullable=False),
+    sa.Column('stored_bytes', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('path')
+    )
+    op.create_index('ix_chat_archive_segments_user_last', 'chat_archive_segments',
+                    ['user_id', 'last_timestamp', 'last_id'], unique=False)
+
+
+def downgrade() -> None:
+    # Archived rows stay in their files; restore them to chat_history before downgrading past this
+    op.drop_index('ix_chat_archive_segments_user_last', table_name='chat_archive_segments')
+    op.drop_table('chat_archive_segments')
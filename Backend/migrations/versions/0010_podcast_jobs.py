@@ -0,0 +1,64 @@
+"""Durable podcast generation jobs; podcasts stuck in processing are queued again
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 00:00:00
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "podcast_jobs" in sa.inspect(bind).get_table_names():
+        return
+    podcast_jobs = op.create_table('podcast_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('podcast_id', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('lease_owner', sa.String(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('episodes_requested', sa.Integer(), nullable=False),
+    sa.Column('episodes_total', sa.Integer(), nullable=True),
+    sa.Column('episodes_done', sa.Integer(), nullable=False),
+    sa.Column('stage', sa.String(), nullable=True),
+    sa.Column('checkpoint', sa.JSON(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['podcast_id'], ['podcasts.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('podcast_id')
+    )
+    op.create_index('ix_podcast_jobs_status_available_at', 'podcast_jobs', ['status', 'available_at'], unique=False)
+
+    # Tasks of the old in-process scheduler died with their process; the episode count was
+    # never stored, so they get the request default of one episode
+    now = datetime.utcnow()
+    stuck = bind.execute(sa.text("SELECT id FROM podcasts WHERE status = 'processing'")).scalars().all()
+    if stuck:
+        op.bulk_insert(podcast_jobs, [
+            {"podcast_id": podcast_id, "status": "queued", "available_at": now, "attempts": 0,
+             "episodes_requested": 1, "episodes_done": 0, "stage": "Queued (resumed)", "created_at": now}
+            for podcast_id in stuck
+        ])
+    print(f"🎙️  Queued {len(stuck)} unfinished podcast(s)")
+
+
+def downgrade() -> None:
+    op.drop_index('ix_podcast_jobs_status_available_at', table_name='podcast_jobs')
+    op.drop_table('podcast_jobs')
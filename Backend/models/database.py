@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Date, Text, Float, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from utils.text_store import text_store
 
 Base = declarative_base()
 
@@ -20,20 +23,81 @@ class User(Base):
     flashcard_progress = relationship("FlashcardProgress", back_populates="user")
     chat_history = relationship("ChatHistory", back_populates="user")
 
+class DocumentContent(Base):
+    __tablename__ = "document_contents"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String, unique=True, nullable=False, index=True)  # SHA-256 of the uploaded file
+    file_type = Column(String, nullable=False)
+    text_length = Column(Integer, default=0, nullable=False)  # Text itself lives in utils.text_store
+    vector_db_id = Column(String)  # ChromaDB collection shared by every copy
+    page_count = Column(Integer)  # None for formats without pages
+    # Loaded on first access so metadata queries stay small
+    outline = deferred(Column(JSON))  # Heading hierarchy with character and page spans
+    digest = deferred(Column(JSON))  # Key terms, passages, chunk stats and language, see utils.document_digest
+    ref_count = Column(Integer, default=0, nullable=False)  # Documents pointing at this content
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    documents = relationship("Document", back_populates="content")
+    
+    @property
+    def text_content(self) -> str:
+        """Full text; prefer read_text for slices"""
+        return text_store.read(self.content_hash)
+    
+    def read_text(self, start: int = 0, end: Optional[int] = None) -> str:
+        return text_store.read(self.content_hash, start, end)
+    
+    def read_ranges(self, ranges: List[Tuple[int, Optional[int]]]) -> List[str]:
+        return text_store.read_ranges(self.content_hash, ranges)
+    
+    def iter_text(self, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        return text_store.iter_range(self.content_hash, start, end)
+
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Per-user listings, newest first by id
+        Index("ix_documents_user_id_id", "user_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
     file_type = Column(String, nullable=False)
     subject = Column(String)
-    text_content = Column(Text, nullable=False)
-    vector_db_id = Column(String)  # ChromaDB collection ID
+    content_id = Column(Integer, ForeignKey("document_contents.id"), nullable=False, index=True)
+    version = Column(Integer, default=1, nullable=False)
     upload_date = Column(DateTime, default=datetime.utcnow)
     user_id = Column(Integer, ForeignKey("users.id"))
     
     # Relationships
     user = relationship("User", back_populates="documents")
+    content = relationship("DocumentContent", back_populates="documents")
+    
+    @property
+    def text_content(self) -> str:
+        return self.content.text_content if self.content else ""
+    
+    def read_text(self, start: int = 0, end: Optional[int] = None) -> str:
+        """Characters [start, end) of the document text without loading the rest"""
+        return self.content.read_text(start, end) if self.content else ""
+    
+    @property
+    def vector_db_id(self):
+        return self.content.vector_db_id if self.content else None
+
+class DocumentVersion(Base):
+    __tablename__ = "document_versions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
+    version = Column(Integer, nullable=False)
+    content_hash = Column(String, nullable=False)
+    chunks_added = Column(Integer, default=0)  # Newly embedded chunks
+    chunks_reused = Column(Integer, default=0)  # Chunks whose embeddings were carried over
+    removed_chunk_hashes = Column(JSON)  # Tombstones for chunks dropped by this version
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 class Quiz(Base):
     __tablename__ = "quizzes"
@@ -46,6 +110,10 @@ class Quiz(Base):
 
 class QuizResult(Base):
     __tablename__ = "quiz_results"
+    __table_args__ = (
+        # History, streaks and weekly activity: WHERE user_id = ? [AND taken_at >= ?] ORDER BY taken_at
+        Index("ix_quiz_results_user_taken_at", "user_id", "taken_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -64,15 +132,37 @@ class FlashcardSet(Base):
     
     id = Column(String, primary_key=True)
     document_id = Column(Integer, ForeignKey("documents.id"))
-    flashcards = Column(JSON)  # Store flashcards as JSON
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    cards = relationship("Flashcard", back_populates="flashcard_set", order_by="Flashcard.position")
+
+class Flashcard(Base):
+    __tablename__ = "flashcards"
+    
+    id = Column(String, primary_key=True)
+    set_id = Column(String, ForeignKey("flashcard_sets.id"), nullable=False, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
+    position = Column(Integer, nullable=False, default=0)  # Order within the set
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    difficulty = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    flashcard_set = relationship("FlashcardSet", back_populates="cards")
 
 class FlashcardProgress(Base):
     __tablename__ = "flashcard_progress"
+    __table_args__ = (
+        # Due-card lookups: WHERE user_id = ? AND next_review <= ? ORDER BY next_review
+        Index("ix_flashcard_progress_user_next_review", "user_id", "next_review"),
+        Index("ix_flashcard_progress_user_flashcard", "user_id", "flashcard_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    flashcard_id = Column(String, nullable=False)
+    flashcard_id = Column(String, ForeignKey("flashcards.id"), nullable=False)
     ease_factor = Column(Float, default=2.5)
     interval_days = Column(Integer, default=1)
     next_review = Column(DateTime)
@@ -81,9 +171,13 @@ class FlashcardProgress(Base):
     
     # Relationships
     user = relationship("User", back_populates="flashcard_progress")
+    flashcard = relationship("Flashcard")
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
+    __table_args__ = (
+        Index("ix_chat_history_user_timestamp", "user_id", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -98,6 +192,10 @@ class ChatHistory(Base):
 
 class Summary(Base):
     __tablename__ = "summaries"
+    __table_args__ = (
+        Index("ix_summaries_user_created_at", "user_id", "created_at"),
+        Index("ix_summaries_document_id", "document_id"),
+    )
     
     id = Column(String, primary_key=True)
     document_id = Column(Integer, ForeignKey("documents.id"))
@@ -105,10 +203,15 @@ class Summary(Base):
     summary_text = Column(Text, nullable=False)
     summary_type = Column(String, nullable=False)
     language = Column(String, default="en")
+    source_chunks = Column(JSON)  # Hash and offsets of each chunk the summary was built from
+    is_stale = Column(Boolean, default=False)  # Set when a new document version changes the covered text
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class Podcast(Base):
     __tablename__ = "podcasts"
+    __table_args__ = (
+        Index("ix_podcasts_user_created_at", "user_id", "created_at"),
+    )
     
     id = Column(String, primary_key=True)
     document_id = Column(Integer, ForeignKey("documents.id"))
@@ -119,8 +222,38 @@ class Podcast(Base):
     status = Column(String, default="processing")  # processing, completed, failed
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class PodcastJob(Base):
+    __tablename__ = "podcast_jobs"
+    __table_args__ = (
+        # Workers claim the earliest available job of a status
+        Index("ix_podcast_jobs_status_available_at", "status", "available_at"),
+    )
+    
+    # Durable generation job for a podcast; see services/podcast_jobs.py
+    id = Column(Integer, primary_key=True)
+    podcast_id = Column(String, ForeignKey("podcasts.id"), nullable=False, unique=True)
+    status = Column(String, default="queued", nullable=False)  # queued, running, completed, failed
+    # Queued: when it may start (retries back off); running: when its lease expires unless renewed
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    lease_owner = Column(String)  # Worker holding the lease; every write of a running job checks it
+    heartbeat_at = Column(DateTime)
+    attempts = Column(Integer, default=0, nullable=False)
+    episodes_requested = Column(Integer, nullable=False)
+    episodes_total = Column(Integer)  # Known once the document is split
+    episodes_done = Column(Integer, default=0, nullable=False)
+    stage = Column(String)
+    checkpoint = Column(JSON)  # Finished episodes {"1": {"script": ..., "url": ...}}, kept across restarts
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
 class MindMap(Base):
     __tablename__ = "mindmaps"
+    __table_args__ = (
+        Index("ix_mindmaps_user_created_at", "user_id", "created_at"),
+        Index("ix_mindmaps_document_id", "document_id"),
+    )
     
     id = Column(String, primary_key=True)
     document_id = Column(Integer, ForeignKey("documents.id"))
@@ -128,10 +261,15 @@ class MindMap(Base):
     topic = Column(String, nullable=False)
     nodes = Column(JSON)  # Mind map nodes
     edges = Column(JSON)  # Mind map edges
+    source_chunks = Column(JSON)  # Hash and offsets of each chunk the mind map was built from
+    is_stale = Column(Boolean, default=False)  # Set when a new document version changes the covered text
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class StudyTimetable(Base):
     __tablename__ = "study_timetables"
+    __table_args__ = (
+        Index("ix_study_timetables_user_created_at", "user_id", "created_at"),
+    )
     
     id = Column(String, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -143,6 +281,9 @@ class StudyTimetable(Base):
 
 class TimetableProgress(Base):
     __tablename__ = "timetable_progress"
+    __table_args__ = (
+        Index("ix_timetable_progress_user_timetable_task", "user_id", "timetable_id", "task_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -151,3 +292,75 @@ class TimetableProgress(Base):
     completed = Column(Boolean, default=False)
     hours_studied = Column(Float, default=0.0)
     completion_date = Column(DateTime)
+
+# Progress aggregates, maintained in the same transaction as the activity they count
+# (see utils/progress_stats.py) so dashboards never scan a user's history
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    documents = Column(Integer, default=0, nullable=False)
+    quizzes_taken = Column(Integer, default=0, nullable=False)
+    quiz_score_total = Column(Float, default=0.0, nullable=False)
+    flashcards_studied = Column(Integer, default=0, nullable=False)  # Distinct cards with progress
+    flashcard_reviews = Column(Integer, default=0, nullable=False)
+    chats = Column(Integer, default=0, nullable=False)
+    study_seconds = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UserDailyStats(Base):
+    __tablename__ = "user_daily_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC date
+    quizzes = Column(Integer, default=0, nullable=False)
+    quiz_score_total = Column(Float, default=0.0, nullable=False)
+    flashcard_reviews = Column(Integer, default=0, nullable=False)
+    chats = Column(Integer, default=0, nullable=False)
+    uploads = Column(Integer, default=0, nullable=False)
+    study_seconds = Column(Integer, default=0, nullable=False)  # Streaks count days with study time
+
+class UserSubjectStats(Base):
+    __tablename__ = "user_subject_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    subject = Column(String, primary_key=True)
+    quizzes = Column(Integer, default=0, nullable=False)
+    quiz_score_total = Column(Float, default=0.0, nullable=False)
+
+class ActivityEvent(Base):
+    __tablename__ = "activity_events"
+    __table_args__ = (
+        # Time-windowed per-user queries
+        Index("ix_activity_events_user_occurred_at", "user_id", "occurred_at"),
+    )
+    
+    # Append-only; the daily rollups in user_daily_stats are derived from these rows
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False)  # quiz, flashcard_review, chat, upload
+    occurred_at = Column(DateTime, nullable=False)
+    duration_seconds = Column(Integer, default=0, nullable=False)
+    document_id = Column(Integer)  # No foreign key: events outlive deleted documents
+    value = Column(Float)  # Quiz score
+
+class ChatArchiveSegment(Base):
+    __tablename__ = "chat_archive_segments"
+    __table_args__ = (
+        # Newest-first walk of a user's archive, and the segments before a cursor
+        Index("ix_chat_archive_segments_user_last", "user_id", "last_timestamp", "last_id"),
+    )
+    
+    # One compressed file of a user's chat history rows moved out of chat_history (see utils/chat_archive.py)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    path = Column(String, nullable=False, unique=True)  # Relative to CHAT_ARCHIVE_DIR
+    first_timestamp = Column(DateTime, nullable=False)
+    first_id = Column(Integer, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    raw_bytes = Column(Integer, nullable=False)
+    stored_bytes = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
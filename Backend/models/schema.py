@@ -43,18 +43,39 @@ class DocumentResponse(BaseModel):
     filename: str
     file_type: str
     subject: Optional[str]
-    text_content: str
     upload_date: datetime
     user_id: int
+    version: int = 1
     
     class Config:
         from_attributes = True
 
+class Page(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page; None on the last page
+
+class DocumentPage(Page):
+    items: List[Dict[str, Any]]  # Only the fields requested via ?fields=
+
+class UploadResult(BaseModel):
+    filename: str
+    status: str  # success, failed
+    document: Optional[DocumentResponse] = None
+    error: Optional[str] = None
+
+class BatchUploadResponse(BaseModel):
+    results: List[UploadResult]
+    succeeded: int
+    failed: int
+
 # Quiz Schemas
 class QuizRequest(BaseModel):
     document_id: int
     num_questions: int = Field(default=10, ge=1, le=50)
     difficulty: DifficultyLevel = DifficultyLevel.MEDIUM
+    page_start: Optional[int] = Field(default=None, ge=1)
+    page_end: Optional[int] = Field(default=None, ge=1)
+    section: Optional[str] = None  # e.g. "Chapter 4"
 
 class QuizQuestion(BaseModel):
     id: str
@@ -73,6 +94,7 @@ class QuizSubmissionRequest(BaseModel):
     document_id: int
     quiz_id: str
     answers: Dict[str, str]  # question_id -> answer
+    duration_seconds: Optional[int] = Field(default=None, ge=0)  # Time spent, if the client measured it
 
 class QuizResultResponse(BaseModel):
     quiz_id: str
@@ -104,6 +126,7 @@ class FlashcardStudyRequest(BaseModel):
     user_id: int
     flashcard_id: str
     ease_rating: int = Field(ge=1, le=5)  # 1=hard, 5=easy
+    duration_seconds: Optional[int] = Field(default=None, ge=0)
 
 class FlashcardStudyResponse(BaseModel):
     flashcard_id: str
@@ -116,10 +139,13 @@ class ChatRequest(BaseModel):
     message: str
     document_ids: List[int]
     language: Language = Language.ENGLISH
+    page_start: Optional[int] = Field(default=None, ge=1)
+    page_end: Optional[int] = Field(default=None, ge=1)
+    section: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
-    sources: List[Dict[str, Any]]
+    sources: List[Dict[str, Any]]  # document_id, filename and, when known, page_start/page_end/section
     language: str
 
 # Summary Schemas
@@ -182,6 +208,7 @@ class UserProgressResponse(BaseModel):
     strong_subjects: List[str]
     weekly_activity: Dict[str, int]
     knowledge_heatmap: Dict[str, float]
+    activity_heatmap: Dict[str, int]  # ISO date -> minutes studied
 
 # Important Questions Schema
 class ImportantQuestionsRequest(BaseModel):
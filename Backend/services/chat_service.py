@@ -1,39 +1,67 @@
 from sqlalchemy.orm import Session
-from models.database import ChatHistory, Document
+from models.database import ChatHistory
+from utils.document_cache import document_cache, CachedDocument
+from database.database import db_call
+from database.write_behind import write_behind
+from utils.progress_stats import record_chat
+from datetime import datetime
+from utils.pagination import keyset_paginate, decode_cursor, encode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.chat_archive import chat_archive
 from database.vector_db import VectorDB
 from utils.llm_client import LLMClient
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 class ChatService:
     def __init__(self):
         self.vector_db = VectorDB()
         self.llm_client = LLMClient()
     
-    async def chat_with_documents(self, user_id: int, message: str, document_ids: List[int], language: str, db: Session):
-        """Chat with AI tutor using RAG from documents"""
+    async def chat_with_documents(self, user_id: int, message: str, document_ids: List[int], language: str, db: Session,
+                                  page_start: Optional[int] = None, page_end: Optional[int] = None,
+                                  section: Optional[str] = None):
+        """Chat with AI tutor using RAG from documents, optionally scoped to pages or a section"""
         
         # Get documents
-        documents = db.query(Document).filter(Document.id.in_(document_ids)).all()
+        # Cached snapshots carry the outline, so scoping never touches the database on the event loop
+        documents = [document for document in [
+            await document_cache.get(db, document_id) for document_id in dict.fromkeys(document_ids)
+        ] if document]
         if not documents:
             raise Exception("No documents found")
         
         # Query relevant content from vector databases
         relevant_content = []
+        scoped_documents = 0
         for doc in documents:
             if doc.vector_db_id:
+                try:
+                    where = self.vector_db.document_scope(doc.content.outline, page_start, page_end, section)
+                except LookupError:
+                    # Section only exists in some of the selected documents
+                    continue
+                scoped_documents += 1
                 try:
                     results = self.vector_db.query_documents(
                         doc.vector_db_id, 
                         message, 
-                        n_results=3
+                        n_results=3,
+                        where=where
                     )
                     if results['documents']:
-                        relevant_content.extend(results['documents'][0])
+                        for text, metadata, distance in zip(results['documents'][0], results['metadatas'][0], results['distances'][0]):
+                            relevant_content.append((distance, text, doc, metadata or {}))
                 except:
                     continue
         
+        if section and not scoped_documents:
+            raise Exception(f"Section '{section}' not found in the selected documents")
+        
+        # Keep the closest chunks across all documents
+        relevant_content.sort(key=lambda item: item[0])
+        used_content = relevant_content[:3]  # Limit context size
+        
         # Combine relevant content
-        context = "\n\n".join(relevant_content[:3])  # Limit context size
+        context = "\n\n".join(text for _, text, _, _ in used_content)
         
         # Generate response
         prompt = f"""
@@ -57,26 +85,58 @@ class ChatService:
             message=message,
             response=response,
             document_ids=document_ids,
-            language=language
+            language=language,
+            timestamp=datetime.utcnow()
         )
         
-        db.add(chat_record)
-        db.commit()
+        # Cite before committing, which expires the loaded documents
+        if used_content:
+            sources = [self._cite(doc, metadata) for _, _, doc, metadata in used_content]
+        else:
+            sources = [{"document_id": doc.id, "filename": doc.filename} for doc in documents]
+        
+        await db_call(db, self._save_chat, chat_record, db)
         
         return {
             "response": response,
-            "sources": [{"document_id": doc.id, "filename": doc.filename} for doc in documents],
+            "sources": sources,
             "language": language
         }
     
-    def get_chat_history(self, user_id: int, limit: int, db: Session) -> List[Dict[str, Any]]:
-        """Get chat history for user"""
+    @staticmethod
+    def _save_chat(chat_record: ChatHistory, db: Session):
+        def write(session: Session):
+            session.add(chat_record)
+            record_chat(session, chat_record.user_id, chat_record.timestamp, chat_record.message,
+                        chat_record.response)
+        write_behind.submit(db, chat_record.user_id, write)
+
+    @staticmethod
+    def _cite(doc: CachedDocument, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Source entry pointing at the exact pages and section a chunk came from"""
+        source = {"document_id": doc.id, "filename": doc.filename}
+        for key in ("chunk_index", "page_start", "page_end", "section"):
+            if key in metadata:
+                source[key] = metadata[key]
+        return source
+    
+    def get_chat_history(self, user_id: int, db: Session, limit: int = DEFAULT_PAGE_SIZE,
+                         cursor: Optional[str] = None,
+                         include_archived: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Newest-first page of a user's chat history, plus the next cursor.
         
-        history = db.query(ChatHistory).filter(
-            ChatHistory.user_id == user_id
-        ).order_by(ChatHistory.timestamp.desc()).limit(limit).all()
+        With include_archived, pages continue past the hot table into the
+        archive (every archived row is older than every hot one), using the
+        same cursor.
+        """
+        
+        write_behind.flush_user(user_id)
+        history, next_cursor = keyset_paginate(
+            db.query(ChatHistory).filter(ChatHistory.user_id == user_id),
+            ChatHistory.id, limit, cursor, order_column=ChatHistory.timestamp
+        )
         
-        return [
+        items = [
             {
                 "message": chat.message,
                 "response": chat.response,
@@ -84,4 +144,27 @@ class ChatService:
                 "language": chat.language
             }
             for chat in history
-        ]
\ No newline at end of file
+        ]
+        if not include_archived or next_cursor:
+            return items, next_cursor
+        
+        # Hot rows ran out on this page; fill the rest from the archive segments
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        if history:
+            before = (history[-1].timestamp, history[-1].id)
+        else:
+            before = decode_cursor(cursor, ChatHistory.timestamp, ChatHistory.id) if cursor else None
+        archived, more = chat_archive.page(db, user_id, limit - len(items), before)
+        items.extend(
+            {
+                "message": chat["message"],
+                "response": chat["response"],
+                "timestamp": chat["timestamp"],
+                "language": chat["language"]
+            }
+            for chat in archived
+        )
+        if more:
+            last = (archived[-1]["timestamp"], archived[-1]["id"]) if archived else before
+            next_cursor = encode_cursor(*last)
+        return items, next_cursor
@@ -1,7 +1,12 @@
 from sqlalchemy.orm import Session
-from models.database import FlashcardSet, FlashcardProgress, Document
+from models.database import FlashcardSet, Flashcard, FlashcardProgress
 from utils.llm_client import LLMClient
+from utils.document_digest import document_excerpt
+from utils.document_cache import document_cache
+from database.database import db_call, commit_new
+from database.write_behind import write_behind
 from models.schema import FlashcardStudyRequest, FlashcardStudyResponse
+from utils.progress_stats import record_flashcard_review
 from datetime import datetime, timedelta
 import uuid
 from typing import List, Dict, Any
@@ -14,38 +19,48 @@ class FlashcardService:
         """Generate flashcards from document"""
         
         # Get document
-        document = db.query(Document).filter(Document.id == document_id).first()
+        document = await document_cache.get(db, document_id)
         if not document:
             raise Exception("Document not found")
         
-        # Generate flashcards using LLM
+        # Generate flashcards using LLM from the document's key passages
+        content, _ = await db_call(db, document_excerpt, document, 4000)
         cards_data = await self.llm_client.generate_flashcards(
-            document.text_content[:4000],
+            content,
             num_cards
         )
         
-        # Add unique IDs and scheduling info
-        flashcards = []
-        for card_data in cards_data:
-            flashcard = {
-                "id": str(uuid.uuid4()),
-                "question": card_data["question"],
-                "answer": card_data["answer"],
-                "difficulty": 0,
-                "next_review": datetime.utcnow().isoformat()
-            }
-            flashcards.append(flashcard)
-        
-        # Save flashcard set
+        # Save the set with one row per card
         set_id = str(uuid.uuid4())
         flashcard_set = FlashcardSet(
             id=set_id,
-            document_id=document_id,
-            flashcards=flashcards
+            document_id=document_id
         )
         
-        db.add(flashcard_set)
-        db.commit()
+        # Add unique IDs and scheduling info
+        flashcards = []
+        now = datetime.utcnow()
+        for position, card_data in enumerate(cards_data):
+            card = Flashcard(
+                id=str(uuid.uuid4()),
+                set_id=set_id,
+                document_id=document_id,
+                position=position,
+                question=card_data["question"],
+                answer=card_data["answer"],
+                difficulty=0
+            )
+            db.add(card)
+            flashcards.append({
+                "id": card.id,
+                "question": card.question,
+                "answer": card.answer,
+                "difficulty": 0,
+                "next_review": now.isoformat()
+            })
+        
+        # Cards are pending on the session; committing the set flushes them with it
+        await db_call(db, commit_new, db, flashcard_set)
         
         return {
             "set_id": set_id,
@@ -57,73 +72,92 @@ class FlashcardService:
     def study_flashcard(self, study_request: FlashcardStudyRequest, db: Session) -> FlashcardStudyResponse:
         """Record flashcard study session with spaced repetition algorithm"""
         
-        # Get or create progress record
+        # The SM-2 step builds on the previous review, which may still be queued
+        write_behind.flush_user(study_request.user_id)
         progress = db.query(FlashcardProgress).filter(
             FlashcardProgress.user_id == study_request.user_id,
             FlashcardProgress.flashcard_id == study_request.flashcard_id
         ).first()
         
-        if not progress:
-            progress = FlashcardProgress(
-                user_id=study_request.user_id,
-                flashcard_id=study_request.flashcard_id
-            )
-            db.add(progress)
+        if progress:
+            review_count, interval_days, ease_factor = progress.review_count, progress.interval_days, progress.ease_factor
+        else:
+            if not db.query(Flashcard.id).filter(Flashcard.id == study_request.flashcard_id).first():
+                raise Exception("Flashcard not found")
+            # Column defaults only apply on INSERT, so start from them for the SM-2 math below
+            review_count, interval_days, ease_factor = 0, 1, 2.5
         
         # Update using spaced repetition algorithm (SM-2)
         ease_rating = study_request.ease_rating
         
         if ease_rating >= 3:
-            if progress.review_count == 0:
-                progress.interval_days = 1
-            elif progress.review_count == 1:
-                progress.interval_days = 6
+            if review_count == 0:
+                interval_days = 1
+            elif review_count == 1:
+                interval_days = 6
             else:
-                progress.interval_days = int(progress.interval_days * progress.ease_factor)
+                interval_days = int(interval_days * ease_factor)
             
-            progress.ease_factor = max(1.3, progress.ease_factor + (0.1 - (5 - ease_rating) * (0.08 + (5 - ease_rating) * 0.02)))
+            ease_factor = max(1.3, ease_factor + (0.1 - (5 - ease_rating) * (0.08 + (5 - ease_rating) * 0.02)))
         else:
-            progress.interval_days = 1
-            progress.ease_factor = max(1.3, progress.ease_factor - 0.2)
-        
-        progress.next_review = datetime.utcnow() + timedelta(days=progress.interval_days)
-        progress.last_reviewed = datetime.utcnow()
-        progress.review_count += 1
-        
-        db.commit()
+            interval_days = 1
+            ease_factor = max(1.3, ease_factor - 0.2)
+        
+        reviewed_at = datetime.utcnow()
+        next_review = reviewed_at + timedelta(days=interval_days)
+        
+        def write(session: Session):
+            saved = session.query(FlashcardProgress).filter(
+                FlashcardProgress.user_id == study_request.user_id,
+                FlashcardProgress.flashcard_id == study_request.flashcard_id
+            ).first()
+            new_card = saved is None
+            if new_card:
+                saved = FlashcardProgress(user_id=study_request.user_id, flashcard_id=study_request.flashcard_id)
+                session.add(saved)
+            saved.interval_days = interval_days
+            saved.ease_factor = ease_factor
+            saved.review_count = review_count + 1
+            saved.next_review = next_review
+            saved.last_reviewed = reviewed_at
+            record_flashcard_review(session, study_request.user_id, new_card, reviewed_at,
+                                    study_request.duration_seconds)
+        
+        write_behind.submit(db, study_request.user_id, write)
         
         return FlashcardStudyResponse(
             flashcard_id=study_request.flashcard_id,
-            next_review_date=progress.next_review,
-            interval_days=progress.interval_days
+            next_review_date=next_review,
+            interval_days=interval_days
         )
     
-    def get_cards_for_review(self, user_id: int, db: Session) -> List[Dict[str, Any]]:
-        """Get flashcards due for review"""
+    def get_cards_for_review(self, user_id: int, db: Session, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get flashcards due for review, most overdue first"""
         
+        write_behind.flush_user(user_id)
         now = datetime.utcnow()
         
-        # Get cards due for review
-        progress_records = db.query(FlashcardProgress).filter(
+        # One indexed range scan on (user_id, next_review) joined to the card rows
+        due = db.query(
+            Flashcard.id,
+            Flashcard.question,
+            Flashcard.answer,
+            FlashcardProgress.review_count,
+            FlashcardProgress.interval_days
+        ).join(
+            FlashcardProgress, FlashcardProgress.flashcard_id == Flashcard.id
+        ).filter(
             FlashcardProgress.user_id == user_id,
             FlashcardProgress.next_review <= now
-        ).all()
-        
-        # Get flashcard details
-        review_cards = []
-        for progress in progress_records:
-            # Find the flashcard in sets (this could be optimized with better DB design)
-            flashcard_sets = db.query(FlashcardSet).all()
-            for fset in flashcard_sets:
-                for card in fset.flashcards:
-                    if card['id'] == progress.flashcard_id:
-                        review_cards.append({
-                            "flashcard_id": card['id'],
-                            "question": card['question'],
-                            "answer": card['answer'],
-                            "review_count": progress.review_count,
-                            "last_interval": progress.interval_days
-                        })
-                        break
-        
-        return review_cards
+        ).order_by(FlashcardProgress.next_review).limit(limit).all()
+        
+        return [
+            {
+                "flashcard_id": card.id,
+                "question": card.question,
+                "answer": card.answer,
+                "review_count": card.review_count,
+                "last_interval": card.interval_days
+            }
+            for card in due
+        ]
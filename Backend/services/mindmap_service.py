@@ -1,17 +1,19 @@
 # Debug version of mindmap_service.py
 from sqlalchemy.orm import Session
-from models.database import Document, MindMap
+from models.database import MindMap
 from utils.llm_client import LLMClient
-from typing import Dict, Any, List, Tuple, Set
+from utils.document_cache import document_cache
+from database.database import db_call
+from utils.pagination import keyset_paginate, DEFAULT_PAGE_SIZE
+from database.vector_db import VectorDB
+from typing import Dict, Any, List, Optional, Tuple, Set
 from collections import defaultdict, Counter
 from dataclasses import dataclass
 import uuid
 import math
 import json
 import re
-import numpy as np
 
-from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
 import networkx as nx
 import community as community_louvain
 
@@ -36,31 +38,29 @@ class Edge:
 class MindMapService:
     def __init__(self):
         self.llm_client = LLMClient()
+        self.vector_db = VectorDB()
 
     async def generate_mindmap(self, document_id: int, topic: str, depth: int, db: Session):
         """Generate a hierarchical mind map with controllable depth."""
         print(f"🔍 DEBUG: Starting mindmap generation for document {document_id}")
         
         # 1) Load document
-        document = db.query(Document).filter(Document.id == document_id).first()
+        document = await document_cache.get(db, document_id)
         if not document:
             raise Exception("Document not found")
 
-        raw_text = (document.text_content or "").strip()
-        if not raw_text:
+        # 2) Key terms and their co-occurrence were computed once at ingestion
+        digest = document.content.digest
+        if not digest["chunks"]["count"]:
             raise Exception("Document is empty")
 
         if not topic:
             topic = f"Summary of {document.filename or 'Document'}"
 
-        print(f"📄 Document loaded: {len(raw_text)} characters")
+        print(f"📄 Digest loaded: {digest['chunks']['count']} chunks, {len(digest['key_terms'])} key terms")
 
-        # 2) Preprocess + chunk
-        chunks = self._chunk_text(self._clean_text(raw_text), target_chunk_size=1500, overlap=150)
-        print(f"📝 Created {len(chunks)} chunks")
-
-        # 3) Extract salient terms (TF-IDF) - with detailed logging
-        top_terms = self._score_terms(chunks, top_k=80)
+        # 3) Salient terms (CountVectorizer scores from the digest)
+        top_terms = [(term, score) for term, score in digest["key_terms"]]
         print(f"📊 Extracted {len(top_terms)} terms with scores:")
         for i, (term, score) in enumerate(top_terms[:10]):  # Show top 10
             print(f"  {i+1}. '{term}': {score:.3f}")
@@ -71,15 +71,15 @@ class MindMapService:
                 "nodes": [{"id": "root", "label": topic, "level": 0, "score": 1.0}],
                 "edges": [],
             }
-            return self._persist_and_return(document, topic, mindmap_data, db)
+            return await db_call(db, self._persist_and_return, document, topic, mindmap_data, db)
 
         # 4) Use LLM to extract main topics
-        main_topics = await self._extract_main_topics_with_llm(raw_text, max_topics=8)
+        main_topics = await self._extract_main_topics_with_llm(await db_call(db, document.read_text, 0, 8000), max_topics=8)
         print(f"🤖 LLM extracted topics: {main_topics}")
 
         # 5) Build co-occurrence graph & PageRank
         all_salient_terms = set([t for t, _ in top_terms] + main_topics)
-        G = self._build_cooccurrence_graph(chunks, terms=all_salient_terms)
+        G = self._build_cooccurrence_graph(digest["cooccurrence"], terms=all_salient_terms)
         pr = nx.pagerank(G, weight="weight") if len(G) > 1 else {}
         print(f"🕸️  Graph has {len(G.nodes)} nodes, {len(G.edges)} edges")
         print(f"📈 PageRank scores (top 5): {dict(list(sorted(pr.items(), key=lambda x: x[1], reverse=True)[:5]))}")
@@ -130,7 +130,7 @@ class MindMapService:
         for node_data in mindmap_data['nodes']:
             print(f"    {node_data['label']}: {node_data['score']} ({type(node_data['score'])})")
 
-        return self._persist_and_return(document, topic, mindmap_data, db)
+        return await db_call(db, self._persist_and_return, document, topic, mindmap_data, db)
 
     def _node_to_dict(self, node: Node) -> Dict[str, Any]:
         """Convert Node to dict ensuring score is a proper float"""
@@ -184,24 +184,6 @@ class MindMapService:
         
         return term_score
 
-    # Simplified helper methods for debugging
-    def _clean_text(self, text: str) -> str:
-        return re.sub(r"\s+", " ", text)
-
-    def _chunk_text(self, text: str, target_chunk_size=1500, overlap=150) -> List[str]:
-        sents = re.split(r"(?<=[.!?])\s+", text)
-        chunks, cur, cur_len = [], [], 0
-        for s in sents:
-            if cur_len + len(s) > target_chunk_size and cur:
-                chunks.append(" ".join(cur))
-                tail = cur[-1][-overlap:] if cur else ""
-                cur, cur_len = ([tail] if tail else []), len(tail)
-            cur.append(s)
-            cur_len += len(s)
-        if cur:
-            chunks.append(" ".join(cur))
-        return chunks
-
     async def _extract_main_topics_with_llm(self, text: str, max_topics=8) -> List[str]:
         prompt = f"""Analyze the following text and identify the {max_topics} most important, high-level topics or themes.
         Each topic should be a short, concise phrase (2-4 words).
@@ -222,70 +204,12 @@ class MindMapService:
             print(f"❌ LLM topic extraction failed: {e}")
             return []
 
-    def _score_terms(self, chunks: List[str], top_k=80) -> List[Tuple[str, float]]:
-        print("📊 Scoring terms with CountVectorizer...")
-        try:
-            vectorizer = CountVectorizer(
-                ngram_range=(1, 3),
-                max_df=0.85,
-                min_df=2,
-                stop_words="english",
-                max_features=1200,
-            )
-            X = vectorizer.fit_transform(chunks)
-            scores = np.asarray(X.sum(axis=0)).ravel()
-            terms = vectorizer.get_feature_names_out()
-            
-            print(f"  Vectorizer found {len(terms)} terms")
-            print(f"  Score range: {scores.min():.3f} - {scores.max():.3f}")
-            
-            scored = sorted(zip(terms, scores), key=lambda x: x[1], reverse=True)
-            max_score = scored[0][1] if scored else 1.0
-            scored = [(term, float(score) / max_score) for term, score in scored]
-            
-            print(f"  After normalization, top 3: {scored[:3]}")
-            return scored[:top_k]
-            
-        except Exception as e:
-            print(f"❌ Error in _score_terms: {e}")
-            return self._fallback_term_scoring(chunks, top_k)
-
-    def _fallback_term_scoring(self, chunks: List[str], top_k=50) -> List[Tuple[str, float]]:
-        print("📊 Using fallback term scoring...")
-        word_counts = Counter()
-        stop_words = set(TfidfVectorizer(stop_words="english").get_stop_words())
-        
-        for chunk in chunks:
-            words = re.findall(r"\b[a-zA-Z][a-zA-Z0-9\-]+\b", chunk.lower())
-            for word in words:
-                if len(word) > 3 and word not in stop_words:
-                    word_counts[word] += 1
-        
-        if not word_counts:
-            return []
-        
-        max_count = word_counts.most_common(1)[0][1]
-        scored = [(w, c / max_count) for w, c in word_counts.most_common(top_k)]
-        print(f"  Fallback scoring found {len(scored)} terms")
-        return scored
-
-    def _build_cooccurrence_graph(self, chunks: List[str], terms: Set[str]) -> nx.Graph:
+    def _build_cooccurrence_graph(self, cooccurrence: List[List[Any]], terms: Set[str]) -> nx.Graph:
         G = nx.Graph()
         G.add_nodes_from(list(terms))
-        window = 8
-        
-        edge_count = 0
-        for chunk in chunks:
-            tokens = [t for t in re.findall(r"[a-zA-Z][a-zA-Z0-9\-]+", chunk.lower()) if t in terms]
-            for i, t1 in enumerate(tokens):
-                for j in range(i + 1, min(i + window, len(tokens))):
-                    t2 = tokens[j]
-                    if t1 != t2:
-                        current_weight = G.get_edge_data(t1, t2, {}).get("weight", 0)
-                        G.add_edge(t1, t2, weight=current_weight + 1)
-                        edge_count += 1
-        
-        print(f"🕸️  Built graph with {len(G.nodes)} nodes, {len(G.edges)} edges ({edge_count} total connections)")
+        for t1, t2, weight in cooccurrence:
+            if t1 in terms and t2 in terms:
+                G.add_edge(t1, t2, weight=weight)
         return G
 
     def _calculate_circular_positions(self, count: int, radius: float, center_x=0, center_y=0) -> List[Tuple[float, float]]:
@@ -311,6 +235,7 @@ class MindMapService:
             topic=topic,
             nodes=mindmap_data.get("nodes", []),
             edges=mindmap_data.get("edges", []),
+            source_chunks=self._source_chunks(document),
         )
         db.add(m)
         db.commit()
@@ -328,16 +253,30 @@ class MindMapService:
         print(f"📦 Returning data with {len(result['nodes'])} nodes")
         return result
 
-    def get_user_mindmaps(self, user_id: int, db: Session) -> List[Dict[str, Any]]:
-        """List mind maps overview for a user."""
-        mindmaps = db.query(MindMap).filter(MindMap.user_id == user_id).all()
+    def _source_chunks(self, document):
+        """Mind maps draw on the whole document, so every chunk is a source"""
+        if not document.vector_db_id:
+            return None
+        try:
+            return self.vector_db.chunk_spans(document.vector_db_id)
+        except Exception:
+            return None
+
+    def get_user_mindmaps(self, user_id: int, db: Session, limit: int = DEFAULT_PAGE_SIZE,
+                          cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Newest-first page of a user's mind map overviews, plus the next cursor."""
+        mindmaps, next_cursor = keyset_paginate(
+            db.query(MindMap).filter(MindMap.user_id == user_id),
+            MindMap.id, limit, cursor, order_column=MindMap.created_at
+        )
         return [
             {
                 "mindmap_id": m.id,
                 "document_id": m.document_id,
                 "topic": m.topic,
                 "node_count": len(m.nodes) if m.nodes else 0,
+                "is_stale": bool(m.is_stale),
                 "created_at": m.created_at,
             }
             for m in mindmaps
-        ]
\ No newline at end of file
+        ], next_cursor
\ No newline at end of file
@@ -1,64 +1,572 @@
 from fastapi import UploadFile
 from sqlalchemy.orm import Session
-from models.database import Document, User
+from sqlalchemy.exc import IntegrityError
+from models.database import (
+    Document, DocumentContent, DocumentVersion, Flashcard, FlashcardProgress, FlashcardSet, MindMap, Podcast,
+    PodcastJob, Quiz, QuizResult, Summary, User,
+)
 from database.vector_db import VectorDB
-from utils.document_processor import DocumentProcessor
-from utils.text_splitter import TextSplitter
+from utils.document_processor import DocumentProcessor, ExtractedDocument
+from utils.text_splitter import TextSplitter, TextChunk
+from utils.document_digest import build_digest
+from utils.upload_spool import spool_upload, SpooledUpload
+from utils.text_store import text_store
+from utils.pagination import keyset_paginate, DEFAULT_PAGE_SIZE
+from utils.progress_stats import record_upload, record_document_deleted
+from utils.document_cache import document_cache
+from database.database import SessionLocal, db_call
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import os
+import time
 import uuid
-from typing import List
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+
+# Files of one multi-file upload processed at the same time
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+
+# Columns a document listing can project; text is only served by the per-document text endpoint
+DOCUMENT_LIST_FIELDS = {
+    "id": Document.id,
+    "filename": Document.filename,
+    "file_type": Document.file_type,
+    "subject": Document.subject,
+    "upload_date": Document.upload_date,
+    "user_id": Document.user_id,
+    "version": Document.version,
+    "page_count": DocumentContent.page_count,
+    "text_length": DocumentContent.text_length,
+}
+DEFAULT_DOCUMENT_FIELDS = ["id", "filename", "file_type", "subject", "upload_date", "user_id", "version"]
+
+# One ingest per content hash at a time, so concurrent copies of a new file extract it once
+_content_locks: Dict[str, list] = {}
+
+
+@asynccontextmanager
+async def _content_lock(content_hash: str):
+    entry = _content_locks.setdefault(content_hash, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            _content_locks.pop(content_hash, None)
+
+
+class ChunkDiff:
+    """Chunks removed and added between two versions of a document, with their offsets.
+
+    Spans are the {"hash", "start", "end"} dicts of VectorDB.chunk_spans;
+    removed spans are offsets in the previous text, added ones in the new text.
+    """
+
+    def __init__(self, previous: List[Dict[str, Any]], current: List[Dict[str, Any]]):
+        previous_hashes = {span["hash"] for span in previous}
+        current_hashes = {span["hash"] for span in current}
+        self.removed = previous_hashes - current_hashes
+        self.removed_spans = [span for span in previous if span["hash"] in self.removed]
+        self.added_spans = [span for span in current if span["hash"] not in previous_hashes]
+        # Where each surviving chunk sits in the new text (the first copy, if a chunk repeats)
+        self.moved: Dict[str, Dict[str, Any]] = {}
+        for span in current:
+            self.moved.setdefault(span["hash"], span)
+        self.current_chunks = len(current_hashes)
+        # Bounds of the chunked text of each version, for spans that reach an edge of the document
+        self.previous_bounds = _bounds(previous)
+        self.current_bounds = _bounds(current)
+
+    def changes(self, sources: Optional[List[Any]]) -> bool:
+        """Whether an artifact built from these source chunks saw any of its text change"""
+        # Artifacts from before chunk tracking have unknown sources, so assume they changed
+        if sources is None:
+            return True
+        # Older artifacts stored bare hashes, newer ones spans
+        hashes = [source if isinstance(source, str) else source["hash"] for source in sources]
+        if self.removed.intersection(hashes):
+            return True
+        spans = [source for source in sources
+                 if isinstance(source, dict) and source.get("start") is not None and source.get("end") is not None]
+        if not spans or not self.added_spans and not self.removed_spans:
+            return False
+
+        start, end = min(span["start"] for span in spans), max(span["end"] for span in spans)
+        if any(_overlaps(span, start, end) for span in self.removed_spans if span.get("start") is not None):
+            return True
+
+        # The covered span in the new text runs between its surviving chunks; one that
+        # reached a document edge (a prefix, or the whole text) stays anchored to that edge
+        moved = [self.moved[span["hash"]] for span in spans if self.moved[span["hash"]].get("start") is not None]
+        if not moved:
+            return True
+        new_start = self.current_bounds[0] if start <= self.previous_bounds[0] else min(span["start"] for span in moved)
+        new_end = self.current_bounds[1] if end >= self.previous_bounds[1] else max(span["end"] for span in moved)
+        return any(_overlaps(span, new_start, new_end) for span in self.added_spans if span.get("start") is not None)
+
+
+def _overlaps(span: Dict[str, Any], start: int, end: int) -> bool:
+    return span["start"] < end and span["end"] > start
+
+
+def _bounds(spans: List[Dict[str, Any]]) -> Tuple[int, int]:
+    located = [span for span in spans if span.get("start") is not None]
+    if not located:
+        return 0, 0
+    return min(span["start"] for span in located), max(span["end"] for span in located)
+
 
 class PDFService:
     def __init__(self):
         self.vector_db = VectorDB()
         self.text_splitter = TextSplitter()
         self.doc_processor = DocumentProcessor()
-    
-    async def process_document(self, file: UploadFile, user_id: int, subject: str, db: Session) -> Document:
-        """Process uploaded document and store in database"""
-        
-        # Read file content
-        content = await file.read()
-        
-        # Extract text based on file type
-        text_content, file_type = await self.doc_processor.process_document(content, file.filename)
-        
-        if not text_content.strip():
-            raise Exception("No text content could be extracted from the document")
-        
-        # Create vector database collection
-        collection_name = f"doc_{uuid.uuid4().hex}"
-        collection = self.vector_db.create_collection(collection_name)
-        
-        # Split text into chunks
-        chunks = self.text_splitter.split_text(text_content)
-        
-        # Save document to database
+
+    async def process_documents(self, files: List[UploadFile], user_id: int, subject: str, db: Session,
+                                concurrency: int = UPLOAD_CONCURRENCY) -> List[Dict[str, Any]]:
+        """Process a batch of uploads concurrently, reporting success or failure per file"""
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def process_one(file: UploadFile) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    document = await self.process_document(file, user_id, subject, db, commit=False)
+                    return {"filename": file.filename, "status": "success", "document": document}
+                except Exception as e:
+                    print(f"Error processing {file.filename}: {e}")
+                    return {"filename": file.filename, "status": "failed", "error": str(e)}
+
+        results = await asyncio.gather(*[process_one(file) for file in files])
+
+        # The documents are only added now, so the request session holds no write lock while other
+        # files' contents commit on their own sessions; one transaction saves the whole batch
+        succeeded = [result for result in results if result["status"] == "success"]
+        try:
+            await db_call(db, self._save_documents, [result["document"] for result in succeeded], db)
+        except Exception as e:
+            print(f"Error saving uploaded documents: {e}")
+            for result in succeeded:
+                # Contents this batch ingested would otherwise stay behind with no document
+                await self._release_content(result.pop("document").content_id, db)
+                result.update(status="failed", error=str(e))
+        return results
+
+    async def process_document(self, file: UploadFile, user_id: int, subject: str, db: Session,
+                               commit: bool = True) -> Document:
+        """Process uploaded document and store in database.
+
+        With commit=False the document is returned unsaved for the caller to add;
+        it holds a reference on its content, which _save_documents keeps and a
+        caller that drops the document must give back with _release_content.
+        """
+        started = time.perf_counter()
+
+        # Stream the upload to disk instead of reading it into memory
+        with await spool_upload(file) as upload:
+            content, stats = await self._get_or_ingest_content(upload, db)
+
+        # Save the per-user document pointing at the shared content
         document = Document(
             filename=file.filename,
-            file_type=file_type,
+            file_type=content.file_type,
             subject=subject,
-            text_content=text_content,
-            vector_db_id=collection_name,
+            content_id=content.id,
             user_id=user_id
         )
-        
-        db.add(document)
-        db.commit()
-        db.refresh(document)
+        if commit:
+            try:
+                await db_call(db, self._save_documents, [document], db)
+            except Exception:
+                await self._release_content(document.content_id, db)
+                raise
 
-        # Store chunks in vector database
-        metadatas = [{"chunk_index": i, "document_id": document.id} for i in range(len(chunks))]
-        self.vector_db.add_documents(collection_name, chunks, metadatas)
-        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"{'🆕 Ingested' if stats else '♻️  Reused'} content {content.id} for {file.filename} in {elapsed_ms:.0f} ms")
         return document
-    
-    def get_user_documents(self, user_id: int, db: Session) -> List[Document]:
-        """Get all documents for a user"""
-        return db.query(Document).filter(Document.user_id == user_id).all()
-    
-    def get_all_documents(self, db: Session) -> List[Document]:
-        """Get all documents"""
-        return db.query(Document).all()
+
+    def _save_documents(self, documents: List[Document], db: Session):
+        if not documents:
+            return
+        try:
+            # Each document already holds the content reference taken when it was looked up
+            db.add_all(documents)
+            db.flush()
+            now = datetime.utcnow()
+            for document in documents:
+                record_upload(db, document.user_id, document.id, now)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        for document in documents:
+            db.refresh(document)
+
+    async def create_new_version(self, document_id: int, file: UploadFile, db: Session) -> Dict[str, Any]:
+        """Replace a document with a revised file, embedding only the chunks that changed"""
+        document = await db_call(db, lambda: db.query(Document).filter(Document.id == document_id).first())
+        if not document:
+            raise Exception("Document not found")
+        previous = await db_call(db, lambda: document.content)
+        previous_id = previous.id
+
+        with await spool_upload(file) as upload:
+            if upload.sha256 == previous.content_hash:
+                return {"document_id": document.id, "version": document.version, "changed": False}
+            content, stats = await self._get_or_ingest_content(upload, db, previous=previous)
+        content_id = content.id
+
+        try:
+            # Tombstone chunks that no longer exist and flag artifacts whose text changed
+            diff = ChunkDiff(
+                self.vector_db.chunk_spans(previous.vector_db_id) if previous.vector_db_id else [],
+                self.vector_db.chunk_spans(content.vector_db_id) if content.vector_db_id else []
+            )
+            result = await db_call(db, self._apply_version, document, file.filename, previous, content, stats,
+                                   diff, db)
+        except Exception:
+            await self._release_content(content_id, db)
+            raise
+        await self._drop_unreferenced_content(previous_id, db)
+        return result
+
+    def _apply_version(self, document: Document, filename: str, previous: DocumentContent, content: DocumentContent,
+                       stats: Dict[str, int], diff: "ChunkDiff", db: Session) -> Dict[str, Any]:
+        removed = sorted(diff.removed)
+        current_chunks = diff.current_chunks
+        try:
+            stale_summaries = self._flag_stale(Summary, document.id, diff, db)
+            stale_mindmaps = self._flag_stale(MindMap, document.id, diff, db)
+
+            document.version += 1
+            document.filename = filename
+            document.file_type = content.file_type
+            document.content_id = content.id
+            db.add(DocumentVersion(
+                document_id=document.id,
+                version=document.version,
+                content_hash=content.content_hash,
+                chunks_added=stats.get("added", 0),
+                chunks_reused=stats.get("reused", current_chunks),
+                removed_chunk_hashes=removed
+            ))
+            # The new content's reference was taken when it was looked up
+            self._adjust_ref_count(previous.id, -1, db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        document_cache.invalidate(document.id)
+
+        return {
+            "document_id": document.id,
+            "version": document.version,
+            "changed": True,
+            "chunks_added": stats.get("added", 0),
+            "chunks_reused": stats.get("reused", current_chunks),
+            "chunks_removed": len(removed),
+            "stale_summaries": stale_summaries,
+            "stale_mindmaps": stale_mindmaps
+        }
+
+    async def _get_or_ingest_content(self, upload: SpooledUpload, db: Session,
+                                     previous: Optional[DocumentContent] = None) -> Tuple[DocumentContent, Dict[str, int]]:
+        """Look the upload up by hash, ingesting it only if it has not been seen before.
+
+        The returned content carries one reference for the caller, taken in the
+        same statement as the lookup, so a concurrent delete of its last
+        document cannot remove it before the caller's document is saved.
+        """
+        # Shared content gets its own session so a failed ingest never rolls back
+        # other files of a batch that are pending on the request session
+        content_db = SessionLocal()
+        try:
+            async with _content_lock(upload.sha256):
+                content_id = await db_call(content_db, self._acquire_content, upload.sha256, content_db)
+                stats = {}
+                if content_id is None:
+                    content_id, stats = await self._ingest_content(
+                        upload, content_db, previous.vector_db_id if previous is not None else None
+                    )
+        finally:
+            content_db.close()
+        return await db_call(db, lambda: db.query(DocumentContent).filter(DocumentContent.id == content_id).one()), stats
+
+    @staticmethod
+    def _acquire_content(content_hash: str, db: Session) -> Optional[int]:
+        """Take a reference on stored content by hash and commit it; None if no such content is stored"""
+        try:
+            acquired = db.query(DocumentContent).filter(DocumentContent.content_hash == content_hash).update(
+                {DocumentContent.ref_count: DocumentContent.ref_count + 1}, synchronize_session=False
+            )
+            content_id = db.query(DocumentContent.id).filter(
+                DocumentContent.content_hash == content_hash).scalar() if acquired else None
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return content_id
+
+    async def _release_content(self, content_id: int, db: Session):
+        """Give back a reference taken by _get_or_ingest_content, dropping the content if it was the last"""
+        await db_call(db, self._release_reference, content_id, db)
+        await self._drop_unreferenced_content(content_id, db)
+
+    def _release_reference(self, content_id: int, db: Session):
+        try:
+            self._adjust_ref_count(content_id, -1, db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    async def _ingest_content(self, upload: SpooledUpload, db: Session,
+                              previous_collection: Optional[str] = None) -> Tuple[int, Dict[str, int]]:
+        """Extract, split and embed a file that has not been seen before.
+
+        When a previous version is given, chunks whose text is unchanged keep
+        their existing embeddings and only new chunks are embedded.
+        """
+
+        # Extract text, page boundaries and headings based on file type
+        extracted = await self.doc_processor.process_document(upload.path, upload.filename)
+
+        if not extracted.text.strip():
+            raise Exception("No text content could be extracted from the document")
+
+        # Create vector database collection
+        collection_name = f"doc_{uuid.uuid4().hex}"
+        self.vector_db.create_collection(collection_name)
+
+        # Split text into chunks and digest them once for every later generator
+        chunks = list(self.text_splitter.iter_chunks(extracted.text))
+        digest = await asyncio.to_thread(build_digest, extracted.text, chunks)
+
+        # The text body goes to the compressed blob store, keyed like the content row
+        await asyncio.to_thread(text_store.put, upload.sha256, extracted.text)
+
+        content = DocumentContent(
+            content_hash=upload.sha256,
+            file_type=extracted.file_type,
+            text_length=len(extracted.text),
+            vector_db_id=collection_name,
+            page_count=extracted.page_count or None,
+            outline=extracted.outline(),
+            digest=digest,
+            ref_count=1  # The uploader's reference
+        )
+        try:
+            content_id = await db_call(db, self._insert_content, content, db)
+        except Exception:
+            await db_call(db, self._discard_ingest, collection_name, upload.sha256, db)
+            raise
+        if content_id is None:
+            # Another worker process stored the same file first; use its copy
+            self.vector_db.delete_collection(collection_name)
+            content_id = await db_call(db, self._acquire_content, upload.sha256, db)
+            if content_id is None:
+                raise Exception("The document was deleted while it was being stored, please upload it again")
+            return content_id, {}
+
+        # Store chunks with their position, pages and section for citations and scoped retrieval
+        metadatas = [self._chunk_metadata(chunk, extracted, content_id) for chunk in chunks]
+        previous_embeddings = {}
+        if previous_collection:
+            try:
+                previous_embeddings = self.vector_db.get_embeddings_by_hash(previous_collection)
+            except Exception as e:
+                print(f"⚠️  Could not read previous embeddings, re-embedding everything: {e}")
+
+        reused = [i for i, metadata in enumerate(metadatas) if metadata["chunk_hash"] in previous_embeddings]
+        fresh = [i for i, metadata in enumerate(metadatas) if metadata["chunk_hash"] not in previous_embeddings]
+        try:
+            self.vector_db.add_documents(
+                collection_name,
+                [chunks[i].text for i in reused],
+                [metadatas[i] for i in reused],
+                embeddings=[previous_embeddings[metadatas[i]["chunk_hash"]] for i in reused]
+            )
+            self.vector_db.add_documents(
+                collection_name,
+                [chunks[i].text for i in fresh],
+                [metadatas[i] for i in fresh]
+            )
+        except Exception:
+            await db_call(db, self._delete_content, content_id, db)
+            await db_call(db, self._discard_ingest, collection_name, upload.sha256, db)
+            raise
+
+        return content_id, {"added": len(fresh), "reused": len(reused)}
+
+    @staticmethod
+    def _chunk_metadata(chunk: TextChunk, extracted: ExtractedDocument, content_id: int) -> Dict[str, Any]:
+        metadata = {
+            "chunk_index": chunk.index,
+            "chunk_hash": hashlib.sha256(chunk.text.encode("utf-8")).hexdigest(),
+            "content_id": content_id,
+            "start": chunk.start,
+            "end": chunk.end,
+        }
+        if extracted.page_offsets:
+            metadata["page_start"] = extracted.page_at(chunk.start)
+            metadata["page_end"] = extracted.page_at(max(chunk.start, chunk.end - 1))
+        section_path = extracted.section_path_at(chunk.start)
+        if section_path:
+            # Chroma metadata values must be scalars
+            metadata["section"] = section_path[0]
+            metadata["section_path"] = " > ".join(section_path)
+        return metadata
+
+    @staticmethod
+    def _insert_content(content: DocumentContent, db: Session) -> Optional[int]:
+        """Commit a new content row, or return None if its hash is already stored"""
+        db.add(content)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return None
+        except Exception:
+            db.rollback()
+            raise
+        return content.id
+
+    def _discard_ingest(self, collection_name: str, content_hash: str, db: Session):
+        """Remove the collection and text blob of an ingest that stored no content row"""
+        self.vector_db.delete_collection(collection_name)
+        try:
+            # The blob is keyed by hash, so it may belong to a row another process committed
+            owned = db.query(DocumentContent.id).filter(DocumentContent.content_hash == content_hash).first() is None
+        except Exception:
+            db.rollback()
+            owned = False
+        if owned:
+            text_store.delete(content_hash)
+
+    @staticmethod
+    def _delete_content(content_id: int, db: Session):
+        db.query(DocumentContent).filter(DocumentContent.id == content_id).delete(synchronize_session=False)
+        db.commit()
+
+    @staticmethod
+    def _adjust_ref_count(content_id: int, delta: int, db: Session):
+        db.query(DocumentContent).filter(DocumentContent.id == content_id).update(
+            {DocumentContent.ref_count: DocumentContent.ref_count + delta}, synchronize_session=False
+        )
+
+    async def _drop_unreferenced_content(self, content_id: int, db: Session):
+        """Delete content, its collection and its text once no document references it"""
+        dropped = await db_call(db, self._delete_unreferenced, content_id, db)
+        if dropped is None:
+            return
+        content_hash, collection_name = dropped
+        if collection_name:
+            self.vector_db.delete_collection(collection_name)
+        # The blob is keyed by hash: an upload of the same file may have stored it again meanwhile
+        async with _content_lock(content_hash):
+            if await db_call(db, lambda: db.query(DocumentContent.id).filter(
+                    DocumentContent.content_hash == content_hash).first()) is None:
+                text_store.delete(content_hash)
+                document_cache.forget_content(content_hash)
+
+    @staticmethod
+    def _delete_unreferenced(content_id: int, db: Session) -> Optional[Tuple[str, Optional[str]]]:
+        """Delete a content row unless something references it; returns its hash and collection if deleted"""
+        content = db.query(DocumentContent.content_hash, DocumentContent.vector_db_id).filter(
+            DocumentContent.id == content_id).first()
+        if content is None:
+            return None
+        # Only delete if no upload took a reference in the meantime
+        deleted = db.query(DocumentContent).filter(
+            DocumentContent.id == content_id,
+            DocumentContent.ref_count <= 0
+        ).delete(synchronize_session=False)
+        db.commit()
+        return (content.content_hash, content.vector_db_id) if deleted else None
+
+    @staticmethod
+    def _flag_stale(model, document_id: int, diff: "ChunkDiff", db: Session) -> int:
+        """Mark artifacts of a document stale if the new version changed the text they were built from"""
+        stale = 0
+        for artifact in db.query(model).filter(model.document_id == document_id, model.is_stale.isnot(True)).all():
+            if diff.changes(artifact.source_chunks):
+                artifact.is_stale = True
+                stale += 1
+        return stale
+
+    async def delete_document(self, document_id: int, db: Session) -> bool:
+        """Delete a user's document and its generated artifacts, dropping the shared content once unreferenced"""
+        content_id = await db_call(db, self._delete_document, document_id, db)
+        if content_id is None:
+            return False
+        await self._drop_unreferenced_content(content_id, db)
+        return True
+
+    def _delete_document(self, document_id: int, db: Session) -> Optional[int]:
+        """Delete the document row and its artifacts, releasing its content reference; returns the content id"""
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            return None
+
+        content_id = document.content_id
+        self._delete_dependents(document_id, db)
+        db.delete(document)
+        self._adjust_ref_count(content_id, -1, db)
+        record_document_deleted(db, document.user_id)
+        db.commit()
+        document_cache.invalidate(document_id)
+        return content_id
+
+    @staticmethod
+    def _delete_dependents(document_id: int, db: Session):
+        """Delete a document's artifacts in the caller's transaction; quiz results stay as history"""
+        quiz_ids = db.query(Quiz.id).filter(Quiz.document_id == document_id).scalar_subquery()
+        db.query(QuizResult).filter(
+            (QuizResult.document_id == document_id) | QuizResult.quiz_id.in_(quiz_ids)
+        ).update({QuizResult.document_id: None, QuizResult.quiz_id: None}, synchronize_session=False)
+
+        set_ids = db.query(FlashcardSet.id).filter(FlashcardSet.document_id == document_id).scalar_subquery()
+        card_ids = db.query(Flashcard.id).filter(
+            (Flashcard.document_id == document_id) | Flashcard.set_id.in_(set_ids)
+        ).scalar_subquery()
+        podcast_ids = db.query(Podcast.id).filter(Podcast.document_id == document_id).scalar_subquery()
+        # Children before parents, so foreign keys hold at every step
+        for query in (
+            db.query(FlashcardProgress).filter(FlashcardProgress.flashcard_id.in_(card_ids)),
+            db.query(Flashcard).filter((Flashcard.document_id == document_id) | Flashcard.set_id.in_(set_ids)),
+            db.query(FlashcardSet).filter(FlashcardSet.document_id == document_id),
+            db.query(Quiz).filter(Quiz.document_id == document_id),
+            db.query(Summary).filter(Summary.document_id == document_id),
+            db.query(MindMap).filter(MindMap.document_id == document_id),
+            # A job still running loses its lease and stops at its next write
+            db.query(PodcastJob).filter(PodcastJob.podcast_id.in_(podcast_ids)),
+            db.query(Podcast).filter(Podcast.document_id == document_id),
+            db.query(DocumentVersion).filter(DocumentVersion.document_id == document_id),
+        ):
+            query.delete(synchronize_session=False)
+
+    def list_documents(self, db: Session, user_id: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE,
+                       cursor: Optional[str] = None,
+                       fields: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Newest-first page of document metadata, selecting only the requested columns"""
+        fields = fields or DEFAULT_DOCUMENT_FIELDS
+        unknown = [field for field in fields if field not in DOCUMENT_LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. "
+                             f"Available: {', '.join(DOCUMENT_LIST_FIELDS)}")
+
+        # The id is always selected because the cursor is built from it
+        selected = list(dict.fromkeys(["id"] + fields))
+        query = db.query(*[DOCUMENT_LIST_FIELDS[field].label(field) for field in selected])
+        if any(DOCUMENT_LIST_FIELDS[field].class_ is DocumentContent for field in selected):
+            query = query.join(DocumentContent, Document.content_id == DocumentContent.id)
+        if user_id is not None:
+            query = query.filter(Document.user_id == user_id)
+
+        rows, next_cursor = keyset_paginate(query, Document.id, limit, cursor)
+        return [{field: getattr(row, field) for field in fields} for row in rows], next_cursor
 
     def get_document_by_id(self, document_id: int, db: Session) -> Document:
         """Get document by ID"""
@@ -0,0 +1,286 @@
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+import asyncio
+import os
+import socket
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database.database import SessionLocal, db_call
+from models.database import Podcast, PodcastJob
+
+# Podcast generation runs as durable jobs in podcast_jobs, claimed by workers in every server process
+PODCAST_WORKERS = int(os.getenv("PODCAST_WORKERS", "2"))  # Concurrent jobs per process
+# A running job whose worker stops heartbeating is taken over once its lease expires
+PODCAST_JOB_LEASE_SECONDS = int(os.getenv("PODCAST_JOB_LEASE_SECONDS", "60"))
+PODCAST_JOB_HEARTBEAT_SECONDS = int(os.getenv("PODCAST_JOB_HEARTBEAT_SECONDS", "15"))
+# Idle workers look for jobs queued by other processes this often
+PODCAST_JOB_POLL_SECONDS = float(os.getenv("PODCAST_JOB_POLL_SECONDS", "5"))
+PODCAST_JOB_MAX_ATTEMPTS = int(os.getenv("PODCAST_JOB_MAX_ATTEMPTS", "3"))
+PODCAST_JOB_RETRY_SECONDS = int(os.getenv("PODCAST_JOB_RETRY_SECONDS", "30"))
+
+ACTIVE = ("queued", "running")
+
+
+class LeaseLostError(Exception):
+    """The job's lease expired and another worker may have taken it over"""
+
+
+class JobLease:
+    """A claimed job as seen by the worker running it.
+
+    Finished episodes are checkpointed, so a job resumed after a crash or
+    restart skips them. Every write goes through the runner and only lands
+    while this lease is still the job's current one.
+    """
+
+    def __init__(self, runner: "PodcastJobRunner", db: Session, job: PodcastJob):
+        self.runner = runner
+        self.db = db
+        self.token = job.lease_owner
+        self.id = job.id
+        self.podcast_id = job.podcast_id
+        self.attempts = job.attempts
+        self.episodes_requested = job.episodes_requested
+        self.episodes_total = job.episodes_total
+        self.checkpoint: Dict[str, Dict[str, str]] = dict(job.checkpoint or {})
+
+    def episode(self, number: int) -> Optional[Dict[str, str]]:
+        """Checkpointed {"script", "url"} of an episode finished by an earlier attempt"""
+        return self.checkpoint.get(str(number))
+
+    async def progress(self, stage: str, episodes_total: Optional[int] = None):
+        if episodes_total is not None:
+            self.episodes_total = episodes_total
+        await db_call(self.db, self.runner._fenced, self, {"stage": stage, "episodes_total": self.episodes_total})
+
+    async def save_episode(self, number: int, script: str, url: str):
+        """Checkpoint a finished episode and publish the episodes finished so far on the podcast"""
+        await db_call(self.db, self.runner._save_episode, self, number, {"script": script, "url": url})
+
+    def episodes(self) -> List[Dict[str, str]]:
+        return _ordered(self.checkpoint)
+
+
+def _ordered(checkpoint: Dict[str, Dict[str, str]]) -> List[Dict[str, str]]:
+    return [checkpoint[number] for number in sorted(checkpoint, key=int)]
+
+
+Handler = Callable[[JobLease], Awaitable[Any]]
+
+
+class PodcastJobRunner:
+    """Claims queued podcast jobs from the database and runs them under renewable leases.
+
+    A claim is a conditional UPDATE, so two workers (in any process) never
+    both win one job. The worker renews the lease every heartbeat; if it
+    dies, the job is claimed again once the lease runs out and resumes from
+    its checkpoint. A worker that loses its lease stops, and its later
+    writes are rejected, so a job is never published twice.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, workers: int = PODCAST_WORKERS,
+                 lease_seconds: int = PODCAST_JOB_LEASE_SECONDS,
+                 heartbeat_seconds: int = PODCAST_JOB_HEARTBEAT_SECONDS,
+                 poll_seconds: float = PODCAST_JOB_POLL_SECONDS, max_attempts: int = PODCAST_JOB_MAX_ATTEMPTS,
+                 retry_seconds: int = PODCAST_JOB_RETRY_SECONDS):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.lease = timedelta(seconds=lease_seconds)
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._handler: Optional[Handler] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.leases_lost = 0
+
+    @staticmethod
+    def enqueue(db: Session, podcast_id: str, episodes: int) -> PodcastJob:
+        """Add a job for podcast_id to the session; it is queued once the caller commits"""
+        job = PodcastJob(podcast_id=podcast_id, episodes_requested=episodes, status="queued",
+                         available_at=datetime.utcnow(), stage="Queued")
+        db.add(job)
+        return job
+
+    def wake(self):
+        """Have an idle worker of this process check for jobs now rather than at its next poll"""
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self, handler: Handler):
+        """Start the workers on the running event loop"""
+        self._handler = handler
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; jobs they were running are handed back to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            db = self.session_factory()
+            try:
+                lease = await db_call(db, self._claim, db)
+                if lease is not None:
+                    await self._run(lease)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                lease = None
+                print(f"❌ Podcast worker error: {e}")
+            finally:
+                db.close()
+
+            if lease is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    def _claim(self, db: Session) -> Optional[JobLease]:
+        now = datetime.utcnow()
+        candidates = db.query(PodcastJob.id).filter(
+            PodcastJob.status.in_(ACTIVE), PodcastJob.available_at <= now
+        ).order_by(PodcastJob.available_at).limit(self.workers).all()
+
+        for job_id, in candidates:
+            token = f"{self.owner}/{uuid4().hex[:12]}"
+            # Loses (updates nothing) if another worker claimed the job since the SELECT
+            claimed = db.query(PodcastJob).filter(
+                PodcastJob.id == job_id, PodcastJob.status.in_(ACTIVE), PodcastJob.available_at <= now
+            ).update({
+                "status": "running",
+                "lease_owner": token,
+                "available_at": now + self.lease,
+                "heartbeat_at": now,
+                "attempts": PodcastJob.attempts + 1,
+                "started_at": func.coalesce(PodcastJob.started_at, now),
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                continue
+
+            lease = JobLease(self, db, db.get(PodcastJob, job_id))
+            if lease.attempts > self.max_attempts:
+                # Its workers kept dying mid-run (e.g. the process was killed), so it would only die again
+                self._finish_failed(lease, "worker stopped during every attempt")
+                continue
+            print(f"🎙️  Claimed podcast job {lease.id} (attempt {lease.attempts})")
+            return lease
+        return None
+
+    async def _run(self, lease: JobLease):
+        self.running += 1
+        work = asyncio.ensure_future(self._handler(lease))
+        try:
+            while True:
+                done, _ = await asyncio.wait({work}, timeout=self.heartbeat_seconds)
+                if done:
+                    break
+                if not await db_call(lease.db, self._renew, lease):
+                    work.cancel()
+                    raise LeaseLostError()
+            work.result()
+            await db_call(lease.db, self._complete, lease)
+            self.completed += 1
+        except LeaseLostError:
+            self.leases_lost += 1
+            print(f"⚠️  Lost the lease on podcast job {lease.id}; another worker owns it now")
+        except asyncio.CancelledError:
+            work.cancel()
+            await db_call(lease.db, self._release, lease)
+            raise
+        except Exception as e:
+            await db_call(lease.db, self._fail, lease, e)
+        finally:
+            self.running -= 1
+
+    def _fenced(self, lease: JobLease, values: Dict[str, Any], podcast_values: Optional[Dict[str, Any]] = None):
+        """Write a running job (and its podcast) if lease is still its current one; each write renews it"""
+        now = datetime.utcnow()
+        db = lease.db
+        updated = db.query(PodcastJob).filter(
+            PodcastJob.id == lease.id, PodcastJob.status == "running", PodcastJob.lease_owner == lease.token
+        ).update({"available_at": now + self.lease, "heartbeat_at": now, **values}, synchronize_session=False)
+        if not updated:
+            db.rollback()
+            raise LeaseLostError()
+        if podcast_values:
+            db.query(Podcast).filter(Podcast.id == lease.podcast_id).update(podcast_values, synchronize_session=False)
+        db.commit()
+
+    def _save_episode(self, lease: JobLease, number: int, episode: Dict[str, str]):
+        """Add an episode to the stored checkpoint.
+
+        Saves of concurrent episodes reach the database in any order, so each
+        merges into what is stored rather than writing the worker's copy.
+        """
+        stored = lease.db.query(PodcastJob.checkpoint).filter(PodcastJob.id == lease.id).scalar()
+        checkpoint = {**(stored or {}), str(number): episode}
+        self._fenced(lease, {"checkpoint": checkpoint, "episodes_done": len(checkpoint)},
+                     {"episodes": [saved["url"] for saved in _ordered(checkpoint)]})
+        lease.checkpoint = checkpoint
+
+    def _renew(self, lease: JobLease) -> bool:
+        try:
+            self._fenced(lease, {})
+            return True
+        except LeaseLostError:
+            return False
+
+    def _complete(self, lease: JobLease):
+        episodes = lease.episodes()
+        script = "\n\n".join(episode["script"] for episode in episodes)
+        self._fenced(lease, {"status": "completed", "stage": "Completed", "lease_owner": None,
+                             "finished_at": datetime.utcnow(), "error": None}, {
+            "status": "completed",
+            "script_content": script[:10000],
+            "episodes": [episode["url"] for episode in episodes],
+        })
+        print(f"✅ Podcast job {lease.id} completed with {len(episodes)} episode(s)")
+
+    def _fail(self, lease: JobLease, error: Exception):
+        if lease.attempts >= self.max_attempts:
+            self._finish_failed(lease, str(error))
+            return
+        delay = self.retry_seconds * lease.attempts
+        self._fenced(lease, {"status": "queued", "lease_owner": None, "error": str(error),
+                             "stage": f"Retrying in {delay}s after an error",
+                             "available_at": datetime.utcnow() + timedelta(seconds=delay)})
+        self.retried += 1
+        print(f"⚠️  Podcast job {lease.id} failed (attempt {lease.attempts}), retrying in {delay}s: {error}")
+
+    def _finish_failed(self, lease: JobLease, error: str):
+        self._fenced(lease, {"status": "failed", "stage": "Failed", "lease_owner": None, "error": error,
+                             "finished_at": datetime.utcnow()}, {"status": f"failed: {error}"})
+        self.failed += 1
+        print(f"❌ Podcast job {lease.id} failed: {error}")
+
+    def _release(self, lease: JobLease):
+        """Hand an interrupted job straight back to the queue; shutting down does not use up an attempt"""
+        try:
+            self._fenced(lease, {"status": "queued", "lease_owner": None, "stage": "Queued (interrupted)",
+                                 "available_at": datetime.utcnow(), "attempts": PodcastJob.attempts - 1})
+        except LeaseLostError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": len(self._tasks), "running": self.running, "completed": self.completed,
+                "failed": self.failed, "retried": self.retried, "leases_lost": self.leases_lost}
+
+
+podcast_jobs = PodcastJobRunner()
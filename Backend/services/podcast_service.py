@@ -1,31 +1,43 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from uuid import uuid4
 from sqlalchemy.orm import Session
-from models.database import Podcast, Document, User
+from models.database import Podcast, PodcastJob, Document, User
 from datetime import datetime
+from typing import Optional
+
+from database.database import BACKEND_DIR, db_call
+from services.podcast_jobs import JobLease, podcast_jobs
+from utils.document_cache import document_cache
+from utils.pagination import keyset_paginate, DEFAULT_PAGE_SIZE
 
 # Import LLM + TTS clients
 from utils.llm_client import llm_client
 from utils.tts_client import tts_client
+from utils.text_splitter import TextSplitter
+
+# Episode audio is written here and served by the /static mount
+STATIC_DIR = os.getenv("STATIC_DIR", os.path.join(BACKEND_DIR, "static"))
+STATIC_BASE_URL = os.getenv("STATIC_BASE_URL", "http://localhost:8000/static")
 
+# One episode per ~3000 characters of source text
+episode_splitter = TextSplitter(chunk_size=750, chunk_overlap=0)
 
-def chunk_text(text, max_chars=3000):
-    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+# gTTS calls are blocking network round trips; this many run at once across all podcasts
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))
+_tts_executor = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
 
 
 class PodcastService:
     def __init__(self):
-        # ✅ Directly point to your static folder
-        self.STATIC_DIR = r"C:\Users\wwwya\OneDrive\Desktop\New folder\Backend\static"
-        os.makedirs(self.STATIC_DIR, exist_ok=True)
-
-        # Base URL served by FastAPI static mount
-        self.BASE_URL = "http://localhost:8000/static"
+        os.makedirs(STATIC_DIR, exist_ok=True)
 
     def create_podcast_task(
         self, user_id: int, document_ids: list[int],
         episodes: int, language: str, topic: str, db: Session
     ):
+        """Create the podcast and queue its generation job in one commit"""
         podcast_id = str(uuid4())
 
         document = db.query(Document).filter(Document.id.in_(document_ids)).first()
@@ -45,78 +57,104 @@ class PodcastService:
             created_at=datetime.utcnow()
         )
         db.add(podcast)
+        podcast_jobs.enqueue(db, podcast_id, episodes)
         db.commit()
-        db.refresh(podcast)
-
-        import asyncio
-        asyncio.create_task(self.generate_podcast(podcast, document, db, episodes))
-
-        return podcast.id
-
-    def create_podcast(self, document, user, db: Session, episodes: int = 5):
-        podcast_id = str(uuid4())
-
-        podcast = Podcast(
-            id=podcast_id,
-            document_id=document.id,
-            user_id=user.id,
-            script_content="",
-            status="processing",
-            created_at=datetime.utcnow(),
-            episodes=[]
-        )
-        db.add(podcast)
-        db.commit()
-        db.refresh(podcast)
-
-        import asyncio
-        asyncio.create_task(self.generate_podcast(podcast, document, db, episodes))
 
-        return podcast
-
-    async def generate_podcast(self, podcast: Podcast, document, db: Session, episodes: int):
+        return podcast_id
+
+    async def generate_podcast(self, job: JobLease):
+        """Job handler: script and record the episodes concurrently, publishing each as it finishes.
+
+        Scripts are written in parallel under the LLM limiter and recorded on
+        the TTS pool, so one episode is recorded while the next is scripted.
+        """
+        document_id = await db_call(job.db, lambda: job.db.query(Podcast.document_id).filter(
+            Podcast.id == job.podcast_id).scalar())
+        document = await document_cache.get(job.db, document_id)
+        if not document:
+            raise Exception("Document not found")
+
+        # Only read and split as much of the document as there are episodes
+        chunks = [chunk.text for chunk in await asyncio.to_thread(
+            episode_splitter.first_chunks, document.content.iter_text(), job.episodes_requested)]
+        total = len(chunks)
+        counts = {"scripting": 0, "recording": 0}
+
+        async def report():
+            await job.progress(f"Scripting {counts['scripting']}, recording {counts['recording']}, "
+                               f"{len(job.checkpoint)} of {total} episodes done", total)
+
+        async def produce(i: int, chunk: str):
+            counts["scripting"] += 1
+            await report()
+            prompt = f"Summarize in under 200 words for podcast episode {i}:\n\n{chunk}"
+            resp = await llm_client.generate_response(prompt)
+            counts["scripting"] -= 1
+
+            counts["recording"] += 1
+            await report()
+            mp3_filename = f"{job.podcast_id}_ep{i}.mp3"
+            # Off the event loop, so the worker keeps heartbeating while gTTS runs
+            await asyncio.get_running_loop().run_in_executor(
+                _tts_executor, tts_client.text_to_speech, resp, os.path.join(STATIC_DIR, mp3_filename))
+            counts["recording"] -= 1
+
+            # Full URL so frontend can play it
+            await job.save_episode(i, resp, f"{STATIC_BASE_URL}/{mp3_filename}")
+
+        # Episodes finished before a restart are already checkpointed
+        tasks = [asyncio.create_task(produce(i, chunk))
+                 for i, chunk in enumerate(chunks, start=1) if not job.episode(i)]
         try:
-            chunks = chunk_text(document.text_content, max_chars=3000)
-            chunks = chunks[:episodes]
-
-            all_scripts = []
-            episode_files = []
-
-            for i, chunk in enumerate(chunks, start=1):
-                prompt = f"Summarize in under 200 words for podcast episode {i}:\n\n{chunk}"
-                resp = await llm_client.generate_response(prompt)
-                all_scripts.append(resp)
-
-                mp3_filename = f"{podcast.id}_ep{i}.mp3"
-                mp3_path = os.path.join(self.STATIC_DIR, mp3_filename)
-
-                # ✅ Save audio file in static directory
-                tts_client.text_to_speech(resp, mp3_path)
-
-                # ✅ Full URL so frontend can play it
-                episode_files.append(f"{self.BASE_URL}/{mp3_filename}")
-
-            final_script = "\n\n".join(all_scripts)
-            podcast.script_content = final_script[:10000]
-            podcast.episodes = episode_files
-            podcast.status = "completed"
-            db.commit()
-
-        except Exception as e:
-            podcast.status = f"failed: {str(e)}"
-            db.commit()
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # The job is retried from its checkpoint, so stop the episodes still in flight
+            for task in tasks:
+                task.cancel()
+            raise
 
     def get_task_status(self, task_id: str, db: Session):
         podcast = db.query(Podcast).filter(Podcast.id == task_id).first()
         if not podcast:
             return {"task_id": task_id, "status": "not_found"}
 
-        return {
+        status = {
             "task_id": podcast.id,
             "status": podcast.status,
             "episodes": podcast.episodes,
             "script": podcast.script_content if podcast.status == "completed" else None
         }
-
-    def get_user_podcasts(self, user_id: int, db: Session):
-        return db.query(Podcast).filter(Podcast.user_id == user_id).all()
+        job = db.query(PodcastJob).filter(PodcastJob.podcast_id == task_id).first()
+        if job:
+            total = job.episodes_total or job.episodes_requested
+            percent = round(100 * job.episodes_done / total) if total else 0
+            status["progress"] = {
+                "state": job.status,
+                "stage": job.stage,
+                "episodes_done": job.episodes_done,
+                "episodes_total": total,
+                "percent": 100 if job.status == "completed" else percent,
+                "attempts": job.attempts,
+                "last_heartbeat": job.heartbeat_at,
+                "error": job.error,
+            }
+        return status
+
+    def get_user_podcasts(self, user_id: int, db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None):
+        """Newest-first page of a user's podcasts (scripts via /podcast-status), plus the next cursor"""
+        podcasts, next_cursor = keyset_paginate(
+            db.query(Podcast).filter(Podcast.user_id == user_id),
+            Podcast.id, limit, cursor, order_column=Podcast.created_at
+        )
+        return [
+            {
+                "id": p.id,
+                "document_id": p.document_id,
+                "user_id": p.user_id,
+                "episodes": p.episodes or [],
+                "language": p.language,
+                "status": p.status,
+                "created_at": p.created_at
+            }
+            for p in podcasts
+        ], next_cursor
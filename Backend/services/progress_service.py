@@ -1,135 +1,86 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
-from models.database import QuizResult, FlashcardProgress, Document, User, ChatHistory
-from datetime import datetime, timedelta
+from models.database import QuizResult, FlashcardProgress, UserStats, UserDailyStats, UserSubjectStats
+from datetime import date, datetime, timedelta
 from typing import Dict, Any, List
+from database.database import db_call
+from database.write_behind import write_behind
+from utils.progress_stats import get_stats, get_daily_stats, get_subject_stats, activity_streak, activity_window
+
+HEATMAP_DAYS = 84  # Twelve weeks of daily study minutes
 
 class ProgressService:
     
     async def get_user_progress(self, user_id: int, db: Session) -> Dict[str, Any]:
         """Get comprehensive user progress"""
+        return await db_call(db, self._user_progress, user_id, db)
+    
+    async def get_dashboard_data(self, user_id: int, db: Session) -> Dict[str, Any]:
+        """Get dashboard data"""
+        return await db_call(db, self._dashboard_data, user_id, db)
+    
+    async def update_quiz_progress(self, user_id: int, document_id: int, quiz_result: Dict, db: Session):
+        """Update progress after quiz completion"""
         
-        # Basic stats
-        total_docs = db.query(Document).filter(Document.user_id == user_id).count()
-        total_quizzes = db.query(QuizResult).filter(QuizResult.user_id == user_id).count()
-        
-        # Average quiz score
-        avg_score_result = db.query(func.avg(QuizResult.score)).filter(
-            QuizResult.user_id == user_id
-        ).scalar()
-        avg_score = float(avg_score_result) if avg_score_result else 0.0
-        
-        # Flashcard stats
-        flashcard_count = db.query(FlashcardProgress).filter(
-            FlashcardProgress.user_id == user_id
-        ).count()
-        
-        # Study streak
-        study_streak = await self._calculate_study_streak(user_id, db)
-        
-        # Subject analysis
-        weak_subjects, strong_subjects = await self._analyze_subjects(user_id, db)
-        
-        # Weekly activity
-        weekly_activity = await self._get_weekly_activity(user_id, db)
+        # This method can be used to trigger additional analytics
+        # or update user streaks, achievements, etc.
         
-        # Knowledge heatmap
-        knowledge_heatmap = await self._generate_knowledge_heatmap(user_id, db)
+        # For now, just update study streak if score is above threshold
+        if quiz_result.get("score", 0) >= 60:
+            await db_call(db, self._update_study_streak, user_id, db)
+    
+    def _user_progress(self, user_id: int, db: Session) -> Dict[str, Any]:
+        write_behind.flush_user(user_id)
+        # Everything comes from the maintained aggregates, never the raw history
+        stats = get_stats(db, user_id)
+        subjects = get_subject_stats(db, user_id)
+        weak_subjects, strong_subjects = self._analyze_subjects(subjects)
+        today = datetime.utcnow().date()
+        daily = get_daily_stats(db, user_id, today - timedelta(days=HEATMAP_DAYS - 1), today)
         
         return {
             "user_id": user_id,
-            "total_documents": total_docs,
-            "quizzes_taken": total_quizzes,
-            "average_score": round(avg_score, 2),
-            "flashcards_studied": flashcard_count,
-            "study_streak": study_streak,
+            "total_documents": stats.documents,
+            "quizzes_taken": stats.quizzes_taken,
+            "average_score": round(stats.quiz_score_total / stats.quizzes_taken, 2) if stats.quizzes_taken else 0.0,
+            "flashcards_studied": stats.flashcards_studied,
+            "study_streak": activity_streak(db, user_id, today),
             "weak_subjects": weak_subjects,
             "strong_subjects": strong_subjects,
-            "weekly_activity": weekly_activity,
-            "knowledge_heatmap": knowledge_heatmap
+            "weekly_activity": self._get_weekly_activity(daily, today),
+            "knowledge_heatmap": self._generate_knowledge_heatmap(subjects),
+            "activity_heatmap": {day.day.isoformat(): day.study_seconds // 60 for day in daily}
         }
     
-    async def get_dashboard_data(self, user_id: int, db: Session) -> Dict[str, Any]:
+    def _dashboard_data(self, user_id: int, db: Session) -> Dict[str, Any]:
         """Get dashboard data"""
+        write_behind.flush_user(user_id)
+        stats = get_stats(db, user_id)
         
-        # Recent performance
-        recent_quizzes = db.query(QuizResult).filter(
+        # Recent performance (last ten rows of the (user_id, taken_at) index)
+        recent_quizzes = db.query(QuizResult.score).filter(
             QuizResult.user_id == user_id
         ).order_by(desc(QuizResult.taken_at)).limit(10).all()
         
-        # Study recommendations
-        recommendations = await self._generate_recommendations(user_id, db)
-        
-        # Upcoming reviews (flashcards)
-        upcoming_reviews = db.query(FlashcardProgress).filter(
+        # Upcoming reviews (flashcards); depends on the clock, so counted on the (user_id, next_review) index
+        upcoming_reviews = db.query(func.count(FlashcardProgress.id)).filter(
             FlashcardProgress.user_id == user_id,
             FlashcardProgress.next_review <= datetime.utcnow() + timedelta(days=1)
-        ).count()
+        ).scalar()
         
         return {
             "recent_quiz_scores": [r.score for r in recent_quizzes],
-            "recommendations": recommendations,
+            "recommendations": self._generate_recommendations(user_id, db),
             "cards_due_today": upcoming_reviews,
-            "total_study_time": await self._calculate_study_time(user_id, db)
+            "total_study_time": self._calculate_study_time(stats)
         }
     
-    async def update_quiz_progress(self, user_id: int, document_id: int, quiz_result: Dict, db: Session):
-        """Update progress after quiz completion"""
-        
-        # This method can be used to trigger additional analytics
-        # or update user streaks, achievements, etc.
-        
-        # For now, just update study streak if score is above threshold
-        if quiz_result.get("score", 0) >= 60:
-            await self._update_study_streak(user_id, db)
-    
-    async def _calculate_study_streak(self, user_id: int, db: Session) -> int:
-        """Calculate current study streak"""
-        
-        # Get all quiz dates
-        quiz_dates = db.query(func.date(QuizResult.taken_at)).filter(
-            QuizResult.user_id == user_id
-        ).distinct().order_by(desc(func.date(QuizResult.taken_at))).all()
-        
-        if not quiz_dates:
-            return 0
-        
-        streak = 0
-        current_date = datetime.now().date()
-        
-        for quiz_date_tuple in quiz_dates:
-            quiz_date = quiz_date_tuple[0]
-            expected_date = current_date - timedelta(days=streak)
-            
-            if quiz_date == expected_date:
-                streak += 1
-            elif quiz_date == expected_date - timedelta(days=1) and streak == 0:
-                # Allow for yesterday if today hasn't been studied yet
-                streak += 1
-            else:
-                break
-        
-        return streak
-    
-    async def _analyze_subjects(self, user_id: int, db: Session) -> tuple[List[str], List[str]]:
+    def _analyze_subjects(self, subjects: List[UserSubjectStats]) -> tuple[List[str], List[str]]:
         """Analyze performance by subject"""
         
-        # Get quiz results with document subjects
-        results = db.query(QuizResult, Document.subject).join(
-            Document, QuizResult.document_id == Document.id
-        ).filter(QuizResult.user_id == user_id).all()
-        
-        subject_scores = {}
-        for result, subject in results:
-            if subject:
-                if subject not in subject_scores:
-                    subject_scores[subject] = []
-                subject_scores[subject].append(result.score)
-        
-        # Calculate average scores per subject
         subject_averages = {
-            subject: sum(scores) / len(scores)
-            for subject, scores in subject_scores.items()
+            s.subject: s.quiz_score_total / s.quizzes
+            for s in subjects if s.quizzes
         }
         
         # Sort by performance
@@ -140,82 +91,58 @@ class ProgressService:
         
         return weak_subjects, strong_subjects
     
-    async def _get_weekly_activity(self, user_id: int, db: Session) -> Dict[str, int]:
-        """Get weekly study activity"""
+    def _get_weekly_activity(self, daily: List[UserDailyStats], today: date) -> Dict[str, int]:
+        """Quizzes, flashcard reviews and chats per day over the last week, from the daily rollup"""
         
-        week_ago = datetime.now() - timedelta(days=7)
-        
-        # Count activities by day
-        quiz_activity = db.query(
-            func.date(QuizResult.taken_at).label('date'),
-            func.count(QuizResult.id).label('count')
-        ).filter(
-            QuizResult.user_id == user_id,
-            QuizResult.taken_at >= week_ago
-        ).group_by(func.date(QuizResult.taken_at)).all()
-        
-        # Convert to dict with day names
         activity = {}
         for i in range(7):
-            date = (datetime.now() - timedelta(days=i)).date()
-            day_name = date.strftime("%A")
-            activity[day_name] = 0
+            activity[(today - timedelta(days=i)).strftime("%A")] = 0
         
-        for date, count in quiz_activity:
-            day_name = date.strftime("%A")
-            if day_name in activity:
-                activity[day_name] = count
+        for day in daily:
+            if day.day > today - timedelta(days=7):
+                activity[day.day.strftime("%A")] = day.quizzes + day.flashcard_reviews + day.chats
         
         return activity
     
-    async def _generate_knowledge_heatmap(self, user_id: int, db: Session) -> Dict[str, float]:
+    def _generate_knowledge_heatmap(self, subjects: List[UserSubjectStats]) -> Dict[str, float]:
         """Generate knowledge heatmap by topic/subject"""
         
         # This is a simplified version - in reality, you'd analyze
         # performance across different topics within documents
-        
-        results = db.query(QuizResult, Document.subject).join(
-            Document, QuizResult.document_id == Document.id
-        ).filter(QuizResult.user_id == user_id).all()
-        
-        heatmap = {}
-        for result, subject in results:
-            if subject:
-                heatmap[subject] = heatmap.get(subject, 0) + result.score
+        heatmap = {s.subject: s.quiz_score_total for s in subjects}
         
         # Normalize scores
-        if heatmap:
+        if heatmap and max(heatmap.values()):
             max_score = max(heatmap.values())
             heatmap = {k: v/max_score for k, v in heatmap.items()}
         
         return heatmap
     
-    async def _generate_recommendations(self, user_id: int, db: Session) -> List[str]:
+    def _generate_recommendations(self, user_id: int, db: Session) -> List[str]:
         """Generate study recommendations"""
         
         recommendations = []
         
         # Check recent performance
-        recent_avg = db.query(func.avg(QuizResult.score)).filter(
-            QuizResult.user_id == user_id,
-            QuizResult.taken_at >= datetime.now() - timedelta(days=7)
-        ).scalar()
+        today = datetime.utcnow().date()
+        week = activity_window(db, user_id, today - timedelta(days=6), today)
+        recent_avg = week["quiz_score_total"] / week["quizzes"] if week["quizzes"] else None
         
         if recent_avg and recent_avg < 60:
             recommendations.append("Focus on reviewing weak areas from recent quizzes")
             recommendations.append("Try studying with flashcards for better retention")
         
         # Check flashcard reviews
-        overdue_cards = db.query(FlashcardProgress).filter(
+        overdue_cards = db.query(func.count(FlashcardProgress.id)).filter(
             FlashcardProgress.user_id == user_id,
-            FlashcardProgress.next_review < datetime.now()
-        ).count()
+            FlashcardProgress.next_review < datetime.utcnow()
+        ).scalar()
         
         if overdue_cards > 10:
             recommendations.append(f"You have {overdue_cards} flashcards due for review")
         
         # Check study consistency
-        streak = await self._calculate_study_streak(user_id, db)
+        streak = activity_streak(db, user_id, today)
         if streak == 0:
             recommendations.append("Start a study streak by taking a quiz today!")
         elif streak >= 7:
@@ -223,24 +150,13 @@ class ProgressService:
         
         return recommendations[:5]  # Limit to 5 recommendations
     
-    async def _calculate_study_time(self, user_id: int, db: Session) -> int:
+    def _calculate_study_time(self, stats: UserStats) -> int:
         """Estimate total study time in minutes"""
         
-        # Rough estimation based on activities
-        quiz_count = db.query(QuizResult).filter(QuizResult.user_id == user_id).count()
-        flashcard_sessions = db.query(FlashcardProgress).filter(
-            FlashcardProgress.user_id == user_id
-        ).count()
-        chat_sessions = db.query(ChatHistory).filter(
-            ChatHistory.user_id == user_id
-        ).count()
-        
-        # Rough estimates: 5 min per quiz, 1 min per flashcard review, 3 min per chat
-        total_minutes = (quiz_count * 5) + (flashcard_sessions * 1) + (chat_sessions * 3)
-        
-        return total_minutes
+        # Summed from the activity events (client-measured where available)
+        return stats.study_seconds // 60
     
-    async def _update_study_streak(self, user_id: int, db: Session):
+    def _update_study_streak(self, user_id: int, db: Session):
         """Update study streak (called after successful quiz)"""
-        # This is handled in _calculate_study_streak method
+        # Streaks are derived from the daily rollups written by utils.progress_stats
         pass
@@ -1,26 +1,42 @@
 from sqlalchemy.orm import Session
-from models.database import Document, Quiz, QuizResult
+from models.database import Quiz, QuizResult
 from utils.llm_client import LLMClient
+from database.vector_db import VectorDB
+from utils.document_digest import document_excerpt
+from utils.document_cache import document_cache, CachedDocument
+from database.database import db_call, commit_new
 from models.schema import QuizSubmissionRequest, QuizResultResponse
+from utils.pagination import keyset_paginate, DEFAULT_PAGE_SIZE
+from utils.progress_stats import record_quiz
+from datetime import datetime
 import uuid
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 class QuizService:
     def __init__(self):
         self.llm_client = LLMClient()
+        self.vector_db = VectorDB()
     
-    async def generate_quiz_from_document(self, document_id: int, num_questions: int, difficulty: str, db: Session):
-        """Generate quiz questions from document"""
+    async def generate_quiz_from_document(self, document_id: int, num_questions: int, difficulty: str, db: Session,
+                                          page_start: Optional[int] = None, page_end: Optional[int] = None,
+                                          section: Optional[str] = None):
+        """Generate quiz questions from document, optionally scoped to pages or a section"""
         
         # Get document
-        document = db.query(Document).filter(Document.id == document_id).first()
+        document = await document_cache.get(db, document_id)
         if not document:
             raise Exception("Document not found")
         
+        if page_start or page_end or section:
+            content = (await db_call(db, self._scoped_content, document, page_start, page_end, section))[:4000]
+        else:
+            # The most representative passages rather than just the opening pages
+            content, _ = await db_call(db, document_excerpt, document, 4000)
+        
         # Generate questions using LLM
         questions = await self.llm_client.generate_quiz_questions(
-            document.text_content[:4000],  # Limit content size
+            content,  # Limit content size
             num_questions,
             difficulty
         )
@@ -38,8 +54,7 @@ class QuizService:
             difficulty=difficulty
         )
         
-        db.add(quiz)
-        db.commit()
+        await db_call(db, commit_new, db, quiz)
         
         return {
             "quiz_id": quiz_id,
@@ -48,6 +63,21 @@ class QuizService:
             "created_at": quiz.created_at
         }
     
+    def _scoped_content(self, document: CachedDocument, page_start: Optional[int], page_end: Optional[int],
+                        section: Optional[str]) -> str:
+        """Text of the chunks that fall inside the requested pages or section"""
+        try:
+            where = self.vector_db.document_scope(document.content.outline, page_start, page_end, section)
+        except LookupError as e:
+            raise Exception(str(e))
+        chunks = self.vector_db.get_chunks(document.vector_db_id, where)
+        if not chunks:
+            raise Exception("No content found for the requested pages or section")
+        # Chunks overlap, so read the covered span once instead of joining chunk texts
+        start = min(chunk["start"] for chunk in chunks)
+        end = max(chunk["end"] for chunk in chunks)
+        return document.read_text(start, end)
+    
     def evaluate_quiz(self, submission: QuizSubmissionRequest, db: Session) -> QuizResultResponse:
         """Evaluate quiz submission and return results"""
         
@@ -83,17 +113,21 @@ class QuizService:
         # Generate suggestions based on performance
         suggestions = self._generate_suggestions(score, incorrect_answers)
         
-        # Save result
+        # Save result and roll it into the user's progress aggregates in the same transaction
+        taken_at = datetime.utcnow()
         result = QuizResult(
             user_id=submission.user_id,
             document_id=submission.document_id,
             quiz_id=submission.quiz_id,
             score=score,
             total_questions=total_questions,
-            answers=submission.answers
+            answers=submission.answers,
+            taken_at=taken_at
         )
         
         db.add(result)
+        record_quiz(db, submission.user_id, submission.document_id, score, total_questions, taken_at,
+                    submission.duration_seconds)
         db.commit()
         
         return QuizResultResponse(
@@ -105,9 +139,13 @@ class QuizService:
             suggestions=suggestions
         )
     
-    def get_quiz_history(self, user_id: int, db: Session) -> List[Dict[str, Any]]:
-        """Get quiz history for user"""
-        results = db.query(QuizResult).filter(QuizResult.user_id == user_id).all()
+    def get_quiz_history(self, user_id: int, db: Session, limit: int = DEFAULT_PAGE_SIZE,
+                         cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Newest-first page of a user's quiz results, plus the next cursor"""
+        results, next_cursor = keyset_paginate(
+            db.query(QuizResult).filter(QuizResult.user_id == user_id),
+            QuizResult.id, limit, cursor, order_column=QuizResult.taken_at
+        )
         return [
             {
                 "quiz_id": result.quiz_id,
@@ -117,19 +155,19 @@ class QuizService:
                 "taken_at": result.taken_at
             }
             for result in results
-        ]
+        ], next_cursor
     
     async def generate_important_questions(self, document_id: int, pyq_document_id: int, num_questions: int, db: Session):
         """Generate important questions based on content and PYQs"""
         
-        document = db.query(Document).filter(Document.id == document_id).first()
+        document = await document_cache.get(db, document_id)
         if not document:
             raise Exception(f"Main document with ID {document_id} not found.")
-        pyq_doc = db.query(Document).filter(Document.id == pyq_document_id).first() if pyq_document_id else None
+        pyq_doc = await document_cache.get(db, pyq_document_id) if pyq_document_id else None
         
-        context = document.text_content
+        context, _ = await db_call(db, document_excerpt, document, 6000)
         if pyq_doc:
-            context += f"\n\nPrevious Year Questions:\n{pyq_doc.text_content}"
+            context += f"\n\nPrevious Year Questions:\n{await db_call(db, pyq_doc.read_text, 0, 6000)}"
         
         questions = await self.llm_client.generate_quiz_questions(
             context[:6000],
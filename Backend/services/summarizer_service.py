@@ -1,24 +1,35 @@
 from sqlalchemy.orm import Session
-from models.database import Document, Summary
+from models.database import Summary
 from utils.llm_client import LLMClient
+from database.vector_db import VectorDB
+from utils.document_digest import document_excerpt
+from utils.document_cache import document_cache, CachedDocument
+from database.database import db_call, commit_new
+from utils.pagination import keyset_paginate, DEFAULT_PAGE_SIZE
+from sqlalchemy import func
 import uuid
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
 class SummarizerService:
     def __init__(self):
         self.llm_client = LLMClient()
+        self.vector_db = VectorDB()
     
     async def generate_summary(self, document_id: int, summary_type: str, language: str, db: Session):
         """Generate summary from document"""
         
         # Get document
-        document = db.query(Document).filter(Document.id == document_id).first()
+        document = await document_cache.get(db, document_id)
         if not document:
             raise Exception("Document not found")
         
+        # Long documents are summarized from their most representative passages
+        source_limit = 40000
+        content, passage_spans = await db_call(db, document_excerpt, document, source_limit)
+        
         # Generate summary
         summary_text = await self.llm_client.generate_summary(
-            document.text_content[:40000],
+            content,
             summary_type,
             language
         )
@@ -31,11 +42,11 @@ class SummarizerService:
             user_id=document.user_id,
             summary_text=summary_text,
             summary_type=summary_type,
-            language=language
+            language=language,
+            source_chunks=passage_spans if passage_spans is not None else await db_call(db, self._source_chunks, document, source_limit)
         )
         
-        db.add(summary)
-        db.commit()
+        await db_call(db, commit_new, db, summary)
         
         return {
             "summary_id": summary_id,
@@ -46,20 +57,39 @@ class SummarizerService:
             "created_at": summary.created_at
         }
     
-    def get_user_summaries(self, user_id: int, db: Session) -> List[Dict[str, Any]]:
-        """Get all summaries for user"""
+    def _source_chunks(self, document: CachedDocument, end: int):
+        """Hashes and offsets of the chunks covering the summarized text, used for staleness checks"""
+        if not document.vector_db_id:
+            return None
+        try:
+            return self.vector_db.chunk_spans(document.vector_db_id, end=end)
+        except Exception:
+            return None
+    
+    def get_user_summaries(self, user_id: int, db: Session, limit: int = DEFAULT_PAGE_SIZE,
+                           cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Newest-first page of a user's summaries with previews, plus the next cursor"""
         
-        summaries = db.query(Summary).filter(Summary.user_id == user_id).all()
+        # Only the preview is read, never the full summary text
+        summaries, next_cursor = keyset_paginate(
+            db.query(
+                Summary.id, Summary.document_id, Summary.summary_type, Summary.language,
+                Summary.is_stale, Summary.created_at,
+                func.substr(Summary.summary_text, 1, 201).label("preview")
+            ).filter(Summary.user_id == user_id),
+            Summary.id, limit, cursor, order_column=Summary.created_at
+        )
         
         return [
             {
                 "summary_id": s.id,
                 "document_id": s.document_id,
-                "summary_text": s.summary_text[:200] + "..." if len(s.summary_text) > 200 else s.summary_text,
+                "summary_text": s.preview[:200] + "..." if len(s.preview) > 200 else s.preview,
                 "summary_type": s.summary_type,
                 "language": s.language,
+                "is_stale": bool(s.is_stale),
                 "created_at": s.created_at
             }
             for s in summaries
-        ]
+        ], next_cursor
 
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from models.database import StudyTimetable, TimetableProgress
 from models.schema import TimetableRequest, TimetableProgressRequest
+from database.database import db_call, commit_new
 from datetime import datetime, timedelta, timezone
 import uuid
 from typing import Dict, Any, List
@@ -55,8 +56,7 @@ class TimetableService:
             crash_course=request.crash_course
         )
         
-        db.add(timetable)
-        db.commit()
+        await db_call(db, commit_new, db, timetable)
         
         return {
             "timetable_id": timetable_id,
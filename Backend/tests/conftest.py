@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+# Tests import the app's packages the way main.py does, from the Backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Every store points at a scratch directory before database.database creates the engine
+_scratch = tempfile.mkdtemp(prefix="rexy_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ["TEXT_STORE_DIR"] = os.path.join(_scratch, "text_store")
+os.environ["CHAT_ARCHIVE_DIR"] = os.path.join(_scratch, "chat_archive")
+os.environ["CHROMA_DB_PATH"] = os.path.join(_scratch, "chroma_db")
+os.environ.setdefault("GROQ_API_KEY", "test")
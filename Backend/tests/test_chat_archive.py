@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from models.database import ChatHistory
+from utils.chat_archive import ChatArchive
+
+
+def rows(message: str):
+    return [ChatHistory(id=i, user_id=7, message=f"{message} {i}", response="r", document_ids=[], language="en",
+                        timestamp=datetime(2024, 1, 1, 0, i)) for i in (1, 2)]
+
+
+def test_segments_of_the_same_rows_never_overwrite_each_other(tmp_path):
+    archive = ChatArchive(root=str(tmp_path), level=3)
+    first = archive.write_segment(7, rows("first"))
+    second = archive.write_segment(7, rows("second"))
+
+    assert first.path != second.path
+    assert (first.first_id, first.last_id) == (second.first_id, second.last_id) == (1, 2)
+    assert [row["message"] for row in archive.read_segment(first.path)] == ["first 1", "first 2"]
+    assert [row["message"] for row in archive.read_segment(second.path)] == ["second 1", "second 2"]
@@ -0,0 +1,51 @@
+from services.pdf_service import ChunkDiff
+
+
+def spans(*chunks):
+    """Spans of consecutive 10-character chunks with the given hashes"""
+    return [{"hash": chunk, "start": i * 10, "end": i * 10 + 9} for i, chunk in enumerate(chunks)]
+
+
+PREVIOUS = spans("a", "b", "c", "d", "e")
+
+
+def test_unchanged_sources_stay_fresh():
+    diff = ChunkDiff(PREVIOUS, spans("a", "b", "c", "d", "e"))
+    assert not diff.changes(PREVIOUS[1:3])
+
+
+def test_removed_source_chunk_is_a_change():
+    diff = ChunkDiff(PREVIOUS, spans("a", "c", "d", "e"))
+    assert diff.changes(PREVIOUS[1:3])
+    assert not diff.changes(PREVIOUS[3:])
+
+
+def test_chunk_added_inside_the_covered_span_is_a_change():
+    diff = ChunkDiff(PREVIOUS, spans("a", "b", "new", "c", "d", "e"))
+    assert diff.changes(PREVIOUS[1:3])
+    assert diff.changes([PREVIOUS[0], PREVIOUS[4]])  # passages either side of the insertion
+    assert not diff.changes(PREVIOUS[3:])
+    assert not diff.changes(PREVIOUS[:2])
+
+
+def test_chunk_removed_between_passages_is_a_change():
+    diff = ChunkDiff(PREVIOUS, spans("a", "b", "d", "e"))
+    assert diff.changes([PREVIOUS[1], PREVIOUS[3]])
+
+
+def test_spans_at_a_document_edge_cover_text_added_there():
+    diff = ChunkDiff(PREVIOUS, spans("new", "a", "b", "c", "d", "e"))
+    assert diff.changes(PREVIOUS[:2])  # a prefix summary
+    assert not diff.changes(PREVIOUS[1:3])
+
+    diff = ChunkDiff(PREVIOUS, spans("a", "b", "c", "d", "e", "new"))
+    assert diff.changes(PREVIOUS)  # a mind map of the whole document
+    assert not diff.changes(PREVIOUS[:2])
+
+
+def test_untracked_and_hash_only_sources():
+    diff = ChunkDiff(PREVIOUS, spans("a", "b", "new", "c", "d", "e"))
+    assert diff.changes(None)
+    # Hashes alone carry no offsets, so only removals can be seen
+    assert not diff.changes(["b", "c"])
+    assert ChunkDiff(PREVIOUS, spans("a", "c")).changes(["b"])
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from database.database import SessionLocal, init_db
+from models.database import Document, DocumentContent, User
+from services.pdf_service import PDFService
+from utils.text_store import text_store
+
+CONTENT_HASH = "3" * 64
+
+
+@pytest.fixture
+def db():
+    init_db()
+    session = SessionLocal()
+    if session.get(User, 1) is None:
+        session.add(User(id=1, name="student", email="student@example.com"))
+    content = DocumentContent(content_hash=CONTENT_HASH, file_type="pdf", text_length=5, ref_count=1)
+    session.add(Document(id=301, filename="notes.pdf", file_type="pdf", content=content, user_id=1))
+    session.commit()
+    text_store.put(CONTENT_HASH, "notes")
+    content_id = content.id
+    yield session
+    session.rollback()
+    session.query(Document).filter(Document.content_id == content_id).delete()
+    session.query(DocumentContent).filter(DocumentContent.content_hash == CONTENT_HASH).delete()
+    session.commit()
+    session.close()
+    text_store.delete(CONTENT_HASH)
+
+
+def acquire():
+    with SessionLocal() as session:
+        return PDFService._acquire_content(CONTENT_HASH, session)
+
+
+def test_upload_reference_taken_before_a_delete_keeps_the_content(db):
+    service = PDFService()
+    content_id = acquire()  # An upload of the same file looks the content up...
+    assert asyncio.run(service.delete_document(301, db))  # ...and its last document is deleted meanwhile
+
+    db.expire_all()
+    assert db.get(DocumentContent, content_id).ref_count == 1
+    assert text_store.exists(CONTENT_HASH)
+
+    document = Document(filename="copy.pdf", file_type="pdf", content_id=content_id, user_id=1)
+    service._save_documents([document], db)
+    db.expire_all()
+    assert db.get(DocumentContent, content_id).ref_count == 1
+
+
+def test_delete_before_the_lookup_makes_the_upload_ingest_again(db):
+    service = PDFService()
+    assert asyncio.run(service.delete_document(301, db))
+
+    assert acquire() is None
+    assert db.query(DocumentContent).filter(DocumentContent.content_hash == CONTENT_HASH).count() == 0
+    assert not text_store.exists(CONTENT_HASH)
+
+
+def test_released_reference_drops_the_content(db):
+    service = PDFService()
+    content_id = acquire()
+    assert asyncio.run(service.delete_document(301, db))
+    asyncio.run(service._release_content(content_id, db))
+
+    db.expire_all()
+    assert db.get(DocumentContent, content_id) is None
+    assert not text_store.exists(CONTENT_HASH)
@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from database.database import SessionLocal, init_db
+from models.database import (
+    Document, DocumentContent, DocumentVersion, Flashcard, FlashcardProgress, FlashcardSet, MindMap, Podcast,
+    PodcastJob, Quiz, QuizResult, Summary, User,
+)
+from services.pdf_service import PDFService
+
+ARTIFACTS = [Quiz, Summary, MindMap, Podcast, PodcastJob, FlashcardSet, Flashcard, FlashcardProgress, DocumentVersion]
+
+
+@pytest.fixture
+def db():
+    init_db()
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def add_document(db, document_id: int, content: DocumentContent) -> Document:
+    document = Document(id=document_id, filename=f"notes{document_id}.pdf", file_type="pdf", content=content,
+                        user_id=1)
+    prefix = f"d{document_id}"
+    db.add_all([
+        document,
+        Quiz(id=f"{prefix}-quiz", document_id=document_id, questions=[]),
+        QuizResult(user_id=1, document_id=document_id, quiz_id=f"{prefix}-quiz", score=80, total_questions=5),
+        Summary(id=f"{prefix}-summary", document_id=document_id, user_id=1, summary_text="s", summary_type="brief"),
+        MindMap(id=f"{prefix}-map", document_id=document_id, user_id=1, topic="t"),
+        Podcast(id=f"{prefix}-podcast", document_id=document_id, user_id=1, status="processing"),
+        PodcastJob(podcast_id=f"{prefix}-podcast", status="queued", available_at=datetime.utcnow(),
+                   episodes_requested=1),
+        FlashcardSet(id=f"{prefix}-set", document_id=document_id),
+        Flashcard(id=f"{prefix}-card", set_id=f"{prefix}-set", document_id=document_id, position=0,
+                  question="q", answer="a"),
+        FlashcardProgress(user_id=1, flashcard_id=f"{prefix}-card"),
+        DocumentVersion(document_id=document_id, version=2, content_hash="1" * 64),
+    ])
+    return document
+
+
+def test_delete_document_removes_its_artifacts(db):
+    if db.get(User, 1) is None:
+        db.add(User(id=1, name="student", email="student@example.com"))
+    content = DocumentContent(content_hash="2" * 64, file_type="pdf", ref_count=2)
+    add_document(db, 101, content)
+    add_document(db, 102, content)
+    db.commit()
+
+    assert asyncio.run(PDFService().delete_document(101, db))
+
+    for model in ARTIFACTS:
+        assert db.query(model).count() == 1, model.__name__
+    assert db.query(Quiz.document_id).scalar() == 102
+    # Scores stay in the user's history, detached from the deleted quiz
+    assert {quiz_id for quiz_id, in db.query(QuizResult.quiz_id)} == {None, "d102-quiz"}
+    assert db.get(DocumentContent, content.id).ref_count == 1
@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from database.database import SessionLocal, init_db
+from models.database import DocumentContent
+from utils import document_digest
+from utils.document_digest import DIGEST_VERSION, digest_excerpt, ensure_digest, merge_ranges
+from utils.text_store import text_store
+
+TEXT = "".join(chr(ord("a") + i % 26) for i in range(200))
+
+
+class Content:
+    text_length = len(TEXT)
+
+    def __init__(self):
+        self.reads = []
+
+    def read_text(self, start=0, end=None):
+        return TEXT[start:end]
+
+    def read_ranges(self, ranges):
+        self.reads.append(list(ranges))
+        return [TEXT[start:end] for start, end in ranges]
+
+
+def passage(start, end):
+    return {"start": start, "end": end, "chunk_hash": f"{start}-{end}"}
+
+
+@pytest.mark.parametrize("ranges, merged", [
+    ([], []),
+    ([(10, 20), (0, 5)], [(0, 5), (10, 20)]),
+    ([(0, 10), (5, 15)], [(0, 15)]),
+    ([(0, 10), (10, 15)], [(0, 15)]),
+    ([(0, 30), (5, 10), (40, 50)], [(0, 30), (40, 50)]),
+])
+def test_merge_ranges(ranges, merged):
+    assert merge_ranges(ranges) == merged
+
+
+def test_overlapping_passages_are_read_once():
+    content = Content()
+    excerpt, sources = digest_excerpt(content, {"passages": [passage(20, 40), passage(30, 50), passage(80, 90)]}, 60)
+
+    assert content.reads == [[(20, 50), (80, 90)]]
+    assert excerpt == TEXT[20:50] + "\n\n" + TEXT[80:90]
+    assert [source["hash"] for source in sources] == ["20-40", "30-50", "80-90"]
+
+
+def test_budget_counts_overlapping_text_once():
+    content = Content()
+    # Separately the passages take 62 characters; together they cover 40
+    excerpt, sources = digest_excerpt(content, {"passages": [passage(0, 30), passage(8, 40)]}, 45)
+
+    assert excerpt == TEXT[0:40]
+    assert len(sources) == 2
+
+
+@pytest.fixture
+def undigested_content():
+    init_db()
+    content_hash = "4" * 64
+    body = "Photosynthesis converts light energy into chemical energy. " * 40
+    text_store.put(content_hash, body)
+    with SessionLocal() as db:
+        content = DocumentContent(content_hash=content_hash, file_type="pdf", text_length=len(body), ref_count=1)
+        db.add(content)
+        db.commit()
+        content_id = content.id
+    yield content_id
+    with SessionLocal() as db:
+        db.query(DocumentContent).filter(DocumentContent.id == content_id).delete()
+        db.commit()
+    text_store.delete(content_hash)
+
+
+def test_missing_digest_is_built_once_outside_the_readers_session(undigested_content, monkeypatch):
+    builds = []
+    build_digest = document_digest.build_digest
+    monkeypatch.setattr(document_digest, "build_digest", lambda *args: builds.append(1) or build_digest(*args))
+
+    def read():
+        with SessionLocal() as db:
+            content = db.get(DocumentContent, undigested_content)
+            digest = ensure_digest(content)
+            assert not db.dirty  # The reader's session has nothing of the build to commit
+            return digest
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        digests = list(pool.map(lambda _: read(), range(4)))
+
+    assert builds == [1]
+    assert all(digest == digests[0] and digest["version"] == DIGEST_VERSION for digest in digests)
+    with SessionLocal() as db:
+        assert db.get(DocumentContent, undigested_content).digest == digests[0]
@@ -0,0 +1,56 @@
+from utils import document_processor
+from utils.document_processor import _PageRangeResult, _extract_pdf_page_range, _pdf_headings
+
+
+def page_range(short_lines, size_chars):
+    return _PageRangeResult([], short_lines, size_chars, [], None, None)
+
+
+def test_running_header_is_dropped_across_page_ranges():
+    # Ten pages split over two workers; "Biology Notes" heads every page
+    results = [
+        page_range([(page, 0, 14.0, "Biology Notes") for page in range(0, 5)]
+                   + [(0, 20, 18.0, "1. Cells"), (3, 20, 18.0, "2. Tissues")], {10.0: 5000, 14.0: 65}),
+        page_range([(page, 0, 14.0, "Biology Notes") for page in range(5, 10)]
+                   + [(7, 20, 18.0, "3. Organs")], {10.0: 5000, 14.0: 65}),
+    ]
+    headings = _pdf_headings(results, [page * 100 for page in range(10)])
+    assert [(h.title, h.level, h.offset) for h in headings] == [
+        ("1. Cells", 1, 20), ("2. Tissues", 1, 320), ("3. Organs", 1, 720),
+    ]
+
+
+def test_chapter_title_repeated_on_following_pages_is_one_heading():
+    results = [page_range([(0, 0, 18.0, "Genetics"), (1, 0, 18.0, "Genetics"), (2, 0, 18.0, "Genetics"),
+                           (9, 0, 18.0, "Evolution"), (10, 0, 18.0, "Evolution")], {10.0: 20000})]
+    headings = _pdf_headings(results, [page * 100 for page in range(20)])
+    assert [h.title for h in headings] == ["Genetics", "Evolution"]
+
+
+def test_body_size_is_measured_over_the_whole_document():
+    # The second range is mostly large type (e.g. slides); its 16pt lines are still headings of the document
+    results = [
+        page_range([(0, 0, 16.0, "Introduction")], {10.0: 9000, 16.0: 12}),
+        page_range([(1, 0, 16.0, "Summary")], {16.0: 900, 10.0: 100}),
+    ]
+    headings = _pdf_headings(results, [0, 1000])
+    assert [h.title for h in headings] == ["Introduction", "Summary"]
+
+
+class PDF(list):
+    def close(self):
+        pass
+
+
+def test_page_with_only_a_watermark_is_left_for_ocr(monkeypatch):
+    body = "Mitochondria are the site of aerobic respiration in the cell."
+    pages = PDF([[(body, 10.0)], [("CONFIDENTIAL", 24.0), ("12", 10.0)], []])
+    monkeypatch.setattr(document_processor.fitz, "open", lambda *args, **kwargs: pages)
+    monkeypatch.setattr(document_processor, "_page_lines", lambda page: page)
+
+    result = _extract_pdf_page_range("notes.pdf", 0, 3)
+
+    assert result.scanned == [1, 2]
+    assert result.pages == [body + "\n", "", ""]
+    assert all(line[0] == 0 for line in result.short_lines)
+    assert result.size_chars == {10.0: len(body)}
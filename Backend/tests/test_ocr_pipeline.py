@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from utils import ocr_pipeline as ocr
+from utils.ocr_pipeline import OCRPipeline
+
+
+def test_cache_key_depends_on_language_and_size_limit(monkeypatch):
+    english = ocr._cache_key("digest")
+    monkeypatch.setattr(ocr, "OCR_LANG", "deu")
+    german = ocr._cache_key("digest")
+    monkeypatch.setattr(ocr, "OCR_MAX_SIDE", 1200)
+
+    assert len({english, german, ocr._cache_key("digest")}) == 3
+
+
+def test_cached_text_is_read_back_from_disk(tmp_path):
+    asyncio.run(OCRPipeline(cache_dir=str(tmp_path))._cache_put("ab" * 32, "page text"))
+
+    assert asyncio.run(OCRPipeline(cache_dir=str(tmp_path))._cache_get("ab" * 32)) == "page text"
+    assert asyncio.run(OCRPipeline(cache_dir=str(tmp_path))._cache_get("cd" * 32)) is None
+
+
+def test_empty_image_file_is_rejected(tmp_path):
+    path = tmp_path / "scan.png"
+    path.write_bytes(b"")
+
+    with pytest.raises(Exception, match="empty"):
+        asyncio.run(OCRPipeline(cache_dir=str(tmp_path)).ocr_image_file(str(path)))
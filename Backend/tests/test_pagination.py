@@ -0,0 +1,67 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.database import SessionLocal, init_db
+from models.database import ChatHistory, Document, Podcast, User
+from utils.pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_paginate
+
+STARTED = datetime(2026, 3, 1, 9, 30, 15, 250000)
+
+
+@pytest.mark.parametrize("value, row_id, order_column, id_column", [
+    (1042, 1042, Document.id, Document.id),
+    (STARTED, 7, ChatHistory.timestamp, ChatHistory.id),
+    (STARTED, str(uuid.uuid4()), Podcast.created_at, Podcast.id),
+])
+def test_cursor_round_trip(value, row_id, order_column, id_column):
+    assert decode_cursor(encode_cursor(value, row_id), order_column, id_column) == (value, row_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    encode_cursor("abc", 1),                       # Not a datetime
+    encode_cursor(1700000000, 1),
+    encode_cursor(STARTED, "1"),                   # String id for an integer column
+    encode_cursor(STARTED, True),
+    "not a cursor",
+])
+def test_forged_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, ChatHistory.timestamp, ChatHistory.id)
+
+
+def test_integer_cursor_for_a_uuid_id_is_rejected():
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(encode_cursor(STARTED, 5), Podcast.created_at, Podcast.id)
+
+
+@pytest.fixture
+def podcasts():
+    init_db()
+    db = SessionLocal()
+    if db.get(User, 1) is None:
+        db.add(User(id=1, name="student", email="student@example.com"))
+    # Pairs share a timestamp, so the id breaks the tie
+    ids = [str(uuid.uuid4()) for _ in range(7)]
+    db.add_all([Podcast(id=podcast_id, user_id=1, status="completed", created_at=STARTED + timedelta(minutes=i // 2))
+                for i, podcast_id in enumerate(ids)])
+    db.commit()
+    yield db, ids
+    db.query(Podcast).filter(Podcast.id.in_(ids)).delete()
+    db.commit()
+    db.close()
+
+
+def test_pages_of_uuid_rows_cover_every_row_once(podcasts):
+    db, ids = podcasts
+    query = db.query(Podcast).filter(Podcast.id.in_(ids))
+    seen, cursor = [], None
+    while True:
+        page, cursor = keyset_paginate(query, Podcast.id, 3, cursor, order_column=Podcast.created_at)
+        seen.extend(page)
+        if cursor is None:
+            break
+
+    assert sorted(podcast.id for podcast in seen) == sorted(ids)
+    assert [podcast.created_at for podcast in seen] == sorted((podcast.created_at for podcast in seen), reverse=True)
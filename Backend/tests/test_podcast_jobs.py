@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.database import SessionLocal, init_db
+from models.database import Podcast, PodcastJob, User
+from services.podcast_jobs import PodcastJobRunner
+
+
+@pytest.fixture
+def lease():
+    init_db()
+    db = SessionLocal()
+    if db.get(User, 1) is None:
+        db.add(User(id=1, name="student", email="student@example.com"))
+    db.add(Podcast(id="checkpoint-podcast", user_id=1, status="processing"))
+    db.add(PodcastJob(podcast_id="checkpoint-podcast", status="queued", episodes_requested=3,
+                      available_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.commit()
+    runner = PodcastJobRunner(lambda: db, workers=1)
+    claimed = runner._claim(db)
+    yield claimed
+    db.query(PodcastJob).filter(PodcastJob.podcast_id == "checkpoint-podcast").delete()
+    db.query(Podcast).filter(Podcast.id == "checkpoint-podcast").delete()
+    db.commit()
+    db.close()
+
+
+def stored(lease):
+    lease.db.expire_all()
+    job = lease.db.get(PodcastJob, lease.id)
+    return job, lease.db.get(Podcast, lease.podcast_id)
+
+
+def test_saves_landing_out_of_order_keep_every_episode(lease):
+    # Episode 2's save reaches the database first, then episode 1's from a worker copy that predates it
+    lease.runner._save_episode(lease, 2, {"script": "two", "url": "ep2.mp3"})
+    lease.checkpoint = {}
+    lease.runner._save_episode(lease, 1, {"script": "one", "url": "ep1.mp3"})
+
+    job, podcast = stored(lease)
+    assert sorted(job.checkpoint) == ["1", "2"]
+    assert job.episodes_done == 2
+    assert podcast.episodes == ["ep1.mp3", "ep2.mp3"]
+    assert [episode["script"] for episode in lease.episodes()] == ["one", "two"]
+
+
+def test_concurrent_saves(lease):
+    async def save_all():
+        await asyncio.gather(*(lease.save_episode(number, f"script {number}", f"ep{number}.mp3")
+                               for number in (3, 1, 2)))
+
+    asyncio.run(save_all())
+    job, podcast = stored(lease)
+    assert job.episodes_done == 3
+    assert podcast.episodes == ["ep1.mp3", "ep2.mp3", "ep3.mp3"]
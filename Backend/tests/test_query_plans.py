@@ -0,0 +1,86 @@
+"""The SQL the services actually send must be answered from an index.
+
+Each test runs a service call against a freshly migrated SQLite database,
+records every SELECT it executes and checks EXPLAIN QUERY PLAN for each.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from database.database import SessionLocal, engine, init_db
+from services.chat_service import ChatService
+from services.flashcard_service import FlashcardService
+from services.pdf_service import PDFService
+from services.progress_service import ProgressService
+from services.quiz_service import QuizService
+from utils.pagination import encode_cursor
+
+TIME_CURSOR = encode_cursor(datetime(2026, 1, 1), 1000)
+ID_CURSOR = encode_cursor(1000, 1000)
+
+
+@pytest.fixture(scope="module")
+def db():
+    init_db()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def captured():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(engine, "before_cursor_execute", capture)
+
+
+def assert_indexed(db, statements):
+    assert statements, "the service call ran no queries"
+    connection = db.connection()
+    for statement, parameters in statements:
+        plan = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        # "SCAN t" reads every row; "SEARCH t USING INDEX" and "SCAN t USING COVERING INDEX" do not
+        scans = [detail for detail in plan if detail.startswith("SCAN ") and "USING" not in detail]
+        assert not scans, f"{statement}\n  plan: {plan}"
+        assert any("USING" in detail for detail in plan), f"{statement}\n  plan: {plan}"
+
+
+@pytest.mark.parametrize("cursor", [None, ID_CURSOR])
+@pytest.mark.parametrize("fields", [None, ["id", "filename", "page_count", "text_length"]])
+def test_list_documents(db, captured, cursor, fields):
+    PDFService().list_documents(db, user_id=1, limit=20, cursor=cursor, fields=fields)
+    assert_indexed(db, captured)
+
+
+def test_cards_due(db, captured):
+    FlashcardService().get_cards_for_review(1, db)
+    assert_indexed(db, captured)
+
+
+@pytest.mark.parametrize("cursor", [None, TIME_CURSOR])
+def test_chat_history_pages(db, captured, cursor):
+    ChatService().get_chat_history(1, db, limit=20, cursor=cursor, include_archived=True)
+    assert_indexed(db, captured)
+
+
+@pytest.mark.parametrize("cursor", [None, TIME_CURSOR])
+def test_quiz_history_pages(db, captured, cursor):
+    QuizService().get_quiz_history(1, db, limit=20, cursor=cursor)
+    assert_indexed(db, captured)
+
+
+def test_progress(db, captured):
+    ProgressService()._user_progress(1, db)
+    assert_indexed(db, captured)
+
+
+def test_dashboard(db, captured):
+    ProgressService()._dashboard_data(1, db)
+    assert_indexed(db, captured)
@@ -0,0 +1,110 @@
+from itertools import islice
+
+import pytest
+
+from utils.text_splitter import TextSplitter, count_tokens, heading_level
+
+
+@pytest.mark.parametrize("line, level", [
+    ("# Overview", 1),
+    ("### Worked examples", 3),
+    ("Chapter 4 Genetics", 1),
+    ("1. Introduction", 1),
+    ("4.2 Cell Division", 2),
+    ("4.2. Cell division in plants", 2),
+    ("12.1.3 Mitosis and Meiosis", 3),
+    ("CELL DIVISION", 1),
+    ("THE FRENCH REVOLUTION", 1),
+])
+def test_headings(line, level):
+    assert heading_level(line) == level
+
+
+@pytest.mark.parametrize("line", [
+    # Body text that starts with a number
+    "2 The results show that the",
+    "1945 World War II ended in Europe and",
+    "3. The results show that the",
+    "4.2 The enzyme binds to the substrate and then releases it once the reaction is complete",
+    # Short capitalised words rather than titles
+    "DNA",
+    "I AM",
+    # Sentences
+    "The cell divides.",
+    "CELL DIVISION:",
+    "",
+])
+def test_body_text(line):
+    assert heading_level(line) is None
+
+
+SECTION = " ".join(f"Enzymes lower the activation energy of reaction {i}." for i in range(40))
+
+
+def test_chunks_stay_within_the_token_budget_and_index_the_source():
+    text = f"# Enzymes\n\n{SECTION}\n\n{SECTION}\n"
+    chunks = list(TextSplitter(chunk_size=60, chunk_overlap=12).iter_chunks(text))
+
+    assert len(chunks) > 2
+    assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert chunk.text == text[chunk.start:chunk.end]
+        assert chunk.token_count == count_tokens(chunk.text) <= 60
+
+
+def test_consecutive_chunks_overlap_by_whole_sentences():
+    chunks = list(TextSplitter(chunk_size=60, chunk_overlap=12).iter_chunks(SECTION))
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.start < chunk.start < previous.end  # Overlap carried over...
+        assert count_tokens(SECTION, chunk.start, previous.end) <= 12  # ...within the overlap budget
+        assert SECTION[chunk.start - 2:chunk.start] == ". "  # ...starting on a sentence
+
+
+def test_headings_start_a_chunk_without_overlap():
+    text = f"# Enzymes\n{SECTION}\n# Hormones\nHormones are chemical messengers.\n"
+    chunks = list(TextSplitter(chunk_size=60, chunk_overlap=12).iter_chunks(text))
+
+    hormones = [chunk for chunk in chunks if "Hormones" in chunk.text]
+    assert len(hormones) == 1 and hormones[0].text.startswith("# Hormones")
+    assert chunks[0].text.startswith("# Enzymes")
+
+
+def test_a_full_enough_chunk_ends_at_a_paragraph():
+    first = " ".join(["Cells divide by mitosis."] * 10)  # 50 tokens
+    text = f"{first}\n\nMeiosis halves the chromosome count."
+    chunks = list(TextSplitter(chunk_size=60, chunk_overlap=0).iter_chunks(text))
+
+    assert [chunk.text for chunk in chunks] == [first, "Meiosis halves the chromosome count."]
+
+
+def test_run_on_text_is_cut_at_the_token_budget():
+    text = " ".join(f"cell{i}" for i in range(250))
+    chunks = list(TextSplitter(chunk_size=100, chunk_overlap=0).iter_chunks(text))
+
+    assert [chunk.token_count for chunk in chunks] == [100, 100, 50]
+    assert " ".join(chunk.text for chunk in chunks) == text
+
+
+@pytest.mark.parametrize("text", ["", "   ", "\n\n\t\n"])
+def test_empty_and_blank_text_has_no_chunks(text):
+    assert list(TextSplitter().iter_chunks(text)) == []
+
+
+def blocks_of(text: str, size: int, read: list):
+    for start in range(0, len(text), size):
+        read.append(start)
+        yield text[start:start + size]
+
+
+@pytest.mark.parametrize("separator", ["\n\n", "\n", " "])
+def test_first_chunks_match_a_full_split_and_read_only_a_prefix(separator):
+    text = separator.join(f"Sentence {i} is about enzymes and the substrates they bind." for i in range(2000))
+    splitter = TextSplitter(chunk_size=100, chunk_overlap=0)
+    read = []
+
+    chunks = splitter.first_chunks(blocks_of(text, 1000, read), 3)
+
+    assert chunks == list(islice(splitter.iter_chunks(text), 3))
+    if separator != " ":
+        assert len(read) < len(text) // 1000 // 4
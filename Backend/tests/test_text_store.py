@@ -0,0 +1,68 @@
+import pytest
+
+from utils.text_store import TextStore
+
+TEXT = "".join(chr(ord("a") + i % 26) for i in range(50))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TextStore(root=str(tmp_path), block_chars=8)
+
+
+@pytest.mark.parametrize("start, end", [(0, None), (0, 8), (7, 9), (3, 30), (16, 24), (45, None), (40, 999),
+                                        (20, 20), (30, 10)])
+def test_ranges_read_back_across_block_boundaries(store, start, end):
+    store.put("k", TEXT)
+
+    assert store.read("k", start, end) == TEXT[start:end]
+    assert "".join(store.iter_range("k", start, end)) == TEXT[start:end]
+
+
+def test_several_ranges_at_once(store):
+    store.put("k", TEXT)
+    ranges = [(0, 5), (6, 17), (40, None), (10, 12)]
+
+    assert store.length("k") == len(TEXT)
+    assert store.read_ranges("k", ranges) == [TEXT[start:end] for start, end in ranges]
+
+
+def test_empty_text(store):
+    store.put("k", "")
+
+    assert store.length("k") == 0
+    assert store.read("k") == ""
+    assert store.read_ranges("k", [(0, None), (0, 5)]) == ["", ""]
+    assert list(store.iter_range("k")) == []
+
+
+def test_non_bmp_characters_at_block_edges(store):
+    # Offsets are in characters, so 4-byte UTF-8 emoji and CJK extension characters straddle nothing
+    text = "abcdefg\U0001F9EC\U0001F9EBhijklm\U00020000" + "n" * 9 + "\U0001F52C"
+    store.put("k", text)
+
+    assert store.read("k") == text
+    for start in range(len(text)):
+        for end in (start + 1, start + 2, start + 9):
+            assert store.read("k", start, end) == text[start:end]
+    assert list(store.iter_range("k", 7, 9)) == ["\U0001F9EC", "\U0001F9EB"]
+
+
+def test_missing_blob(store):
+    assert not store.exists("missing")
+    with pytest.raises(FileNotFoundError):
+        store.read("missing")
+    with pytest.raises(FileNotFoundError):
+        list(store.iter_range("missing"))
+    store.delete("missing")  # Deleting twice is harmless
+
+
+def test_deleted_blob_is_gone_even_after_its_index_was_cached(store):
+    store.put("k", TEXT)
+    assert store.read("k", 0, 3) == "abc"
+
+    store.delete("k")
+
+    assert not store.exists("k")
+    with pytest.raises(FileNotFoundError):
+        store.read("k")
@@ -0,0 +1,103 @@
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from database.database import create_db_engine
+from database.write_behind import WriteBehindQueue
+from models.database import Base, ChatHistory, User
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'write_behind.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with factory() as db:
+        db.add_all([User(id=i, name=f"user{i}", email=f"user{i}@example.com") for i in (1, 2)])
+        db.commit()
+    yield factory
+    engine.dispose()
+
+
+def chat(user_id: int, message: str):
+    def write(db):
+        db.add(ChatHistory(user_id=user_id, message=message, response="r", document_ids=[], language="en",
+                           timestamp=datetime.utcnow()))
+    return write
+
+
+def messages(factory, user_id: int):
+    with factory() as db:
+        return [row.message for row in
+                db.query(ChatHistory).filter(ChatHistory.user_id == user_id).order_by(ChatHistory.id)]
+
+
+def test_writes_commit_in_submission_order(session_factory):
+    queue = WriteBehindQueue(session_factory, enabled=True, interval_ms=20, max_batch=3)
+    with session_factory() as db:
+        for i in range(10):
+            queue.submit(db, 1 + i % 2, chat(1 + i % 2, f"m{i}"))
+    assert queue.flush()
+    queue.stop()
+
+    assert messages(session_factory, 1) == ["m0", "m2", "m4", "m6", "m8"]
+    assert messages(session_factory, 2) == ["m1", "m3", "m5", "m7", "m9"]
+
+
+def test_reader_sees_its_own_writes(session_factory):
+    # The interval is far longer than the test; only the waiting reader can trigger the commit
+    queue = WriteBehindQueue(session_factory, enabled=True, interval_ms=60_000)
+    with session_factory() as db:
+        queue.submit(db, 1, chat(1, "hello"))
+        assert messages(session_factory, 1) == []
+        assert queue.flush_user(1)
+        assert messages(session_factory, 1) == ["hello"]
+        assert queue.flush_user(2)  # Nothing queued for this user
+    queue.stop()
+
+
+def test_stop_drains_the_queue_and_later_writes_apply_inline(session_factory):
+    queue = WriteBehindQueue(session_factory, enabled=True, interval_ms=60_000)
+    with session_factory() as db:
+        for i in range(5):
+            queue.submit(db, 1, chat(1, f"m{i}"))
+        queue.stop()
+        assert messages(session_factory, 1) == [f"m{i}" for i in range(5)]
+
+        queue.submit(db, 1, chat(1, "after stop"))
+    assert messages(session_factory, 1)[-1] == "after stop"
+    assert queue.stats()["pending"] == 0
+
+
+def test_flusher_survives_a_batch_it_cannot_open_a_session_for(session_factory):
+    sessions = iter([RuntimeError("database is down")])
+
+    def flaky_factory():
+        error = next(sessions, None)
+        if error is not None:
+            raise error
+        return session_factory()
+
+    queue = WriteBehindQueue(flaky_factory, enabled=True, interval_ms=10)
+    with session_factory() as db:
+        queue.submit(db, 1, chat(1, "lost"))
+        assert queue.flush_user(1)
+        queue.submit(db, 1, chat(1, "kept"))
+        assert queue.flush_user(1)
+    queue.stop()
+
+    assert messages(session_factory, 1) == ["kept"]
+    assert queue.stats()["failed"] == 1
+
+
+def test_flush_gives_up_after_the_timeout(session_factory):
+    release = threading.Event()
+    queue = WriteBehindQueue(session_factory, enabled=True, interval_ms=0, flush_timeout=0.05)
+    with session_factory() as db:
+        queue.submit(db, 1, lambda session: release.wait(5))
+        assert not queue.flush_user(1)
+    release.set()
+    queue.stop()
+    assert queue.stats()["pending"] == 0
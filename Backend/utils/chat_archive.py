@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+import json
+import os
+import threading
+
+import zstandard as zstd
+from sqlalchemy.orm import Session
+
+from models.database import ChatArchiveSegment, ChatHistory
+
+# Chat history older than this many days moves out of the hot table; 0 keeps everything hot
+CHAT_RETENTION_DAYS = int(os.getenv("CHAT_RETENTION_DAYS", "90"))
+# Archived conversations are zstd-compressed JSON lines, one file per segment of a user's history
+CHAT_ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR", "./chat_archive")
+CHAT_ARCHIVE_LEVEL = int(os.getenv("CHAT_ARCHIVE_LEVEL", "19"))
+CHAT_ARCHIVE_SEGMENT_ROWS = int(os.getenv("CHAT_ARCHIVE_SEGMENT_ROWS", "2000"))
+# Decompressed segments kept so paging through one does not decompress it per page
+CHAT_ARCHIVE_CACHE_SEGMENTS = int(os.getenv("CHAT_ARCHIVE_CACHE_SEGMENTS", "16"))
+
+Key = Tuple[datetime, int]  # (timestamp, id), the chat history sort key
+
+
+class ChatArchive:
+    """Compressed segment files of archived chat history, indexed by chat_archive_segments"""
+
+    def __init__(self, root: str = CHAT_ARCHIVE_DIR, level: int = CHAT_ARCHIVE_LEVEL,
+                 cache_segments: int = CHAT_ARCHIVE_CACHE_SEGMENTS):
+        self.root = root
+        self.level = level
+        self.cache_segments = cache_segments
+        self._segments: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def write_segment(self, user_id: int, rows: List[ChatHistory]) -> ChatArchiveSegment:
+        """Write rows (oldest first) to a new segment file; returns its unsaved index row"""
+        first, last = rows[0], rows[-1]
+        # Named by its id range plus a unique token: two archivers racing on one range write separate
+        # files, and only the one whose index row commits is ever read
+        path = f"{user_id % 256:02x}/{user_id}/{first.id}-{last.id}-{uuid4().hex}.jsonl.zst"
+        raw = "".join(
+            json.dumps({
+                "id": row.id,
+                "message": row.message,
+                "response": row.response,
+                "document_ids": row.document_ids,
+                "language": row.language,
+                "timestamp": row.timestamp.isoformat(),
+            }, ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode("utf-8")
+        data = zstd.ZstdCompressor(level=self.level).compress(raw)
+
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # O_EXCL never overwrites a segment; the file is only referenced once its index row commits
+        fd = os.open(full_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(data)
+                out.flush()
+                # The hot rows are deleted once this commits, so the file must be on disk first
+                os.fsync(out.fileno())
+        except BaseException:
+            os.unlink(full_path)
+            raise
+
+        return ChatArchiveSegment(
+            user_id=user_id, path=path,
+            first_timestamp=first.timestamp, first_id=first.id,
+            last_timestamp=last.timestamp, last_id=last.id,
+            row_count=len(rows), raw_bytes=len(raw), stored_bytes=len(data),
+        )
+
+    def read_segment(self, path: str) -> List[Dict[str, Any]]:
+        """Rows of a segment file, oldest first"""
+        with self._lock:
+            rows = self._segments.get(path)
+            if rows is not None:
+                self._segments.move_to_end(path)
+                return rows
+
+        with open(os.path.join(self.root, path), "rb") as f:
+            raw = zstd.ZstdDecompressor().decompressobj().decompress(f.read())
+        rows = []
+        for line in raw.decode("utf-8").splitlines():
+            row = json.loads(line)
+            row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+            rows.append(row)
+
+        with self._lock:
+            self._segments[path] = rows
+            while len(self._segments) > self.cache_segments:
+                self._segments.popitem(last=False)
+        return rows
+
+    def page(self, db: Session, user_id: int, limit: int,
+             before: Optional[Key] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        """Newest-first archived rows of a user older than `before`, and whether more follow"""
+        segments = db.query(ChatArchiveSegment).filter(ChatArchiveSegment.user_id == user_id)
+        if before:
+            segments = segments.filter(ChatArchiveSegment.first_timestamp <= before[0])
+        segments = segments.order_by(ChatArchiveSegment.last_timestamp.desc(), ChatArchiveSegment.last_id.desc())
+
+        rows: List[Dict[str, Any]] = []
+        for segment in segments.yield_per(16):
+            # Segments do not overlap in practice, but stay correct if a late write made them
+            if len(rows) > limit and (segment.last_timestamp, segment.last_id) < _key(rows[limit]):
+                break
+            rows.extend(row for row in self.read_segment(segment.path) if before is None or _key(row) < before)
+            rows.sort(key=_key, reverse=True)
+        return rows[:limit], len(rows) > limit
+
+
+def _key(row: Dict[str, Any]) -> Key:
+    return row["timestamp"], row["id"]
+
+
+chat_archive = ChatArchive()
+
+
+def archive_chat_history(db: Session, older_than: datetime, user_id: Optional[int] = None,
+                         segment_rows: int = CHAT_ARCHIVE_SEGMENT_ROWS) -> Dict[str, int]:
+    """Move chat history from before older_than into archive segments, committing per segment"""
+    users = db.query(ChatHistory.user_id).filter(ChatHistory.timestamp < older_than, ChatHistory.user_id.isnot(None))
+    if user_id is not None:
+        users = users.filter(ChatHistory.user_id == user_id)
+    users = [user for user, in users.distinct().all()]
+
+    totals = {"users": len(users), "segments": 0, "rows": 0, "raw_bytes": 0, "stored_bytes": 0}
+    for user in users:
+        while True:
+            rows = db.query(ChatHistory).filter(
+                ChatHistory.user_id == user, ChatHistory.timestamp < older_than
+            ).order_by(ChatHistory.timestamp, ChatHistory.id).limit(segment_rows).all()
+            if not rows:
+                break
+            segment = chat_archive.write_segment(user, rows)
+            db.add(segment)
+            db.query(ChatHistory).filter(ChatHistory.id.in_([row.id for row in rows])).delete(
+                synchronize_session=False)
+            totals["segments"] += 1
+            totals["rows"] += segment.row_count
+            totals["raw_bytes"] += segment.raw_bytes
+            totals["stored_bytes"] += segment.stored_bytes
+            db.commit()
+            db.expunge_all()
+            if len(rows) < segment_rows:
+                break
+    return totals
+
+
+def retention_cutoff(days: int = CHAT_RETENTION_DAYS, now: Optional[datetime] = None) -> Optional[datetime]:
+    """Timestamp before which chat history is archived, or None when retention is off"""
+    if days <= 0:
+        return None
+    return (now or datetime.utcnow()) - timedelta(days=days)
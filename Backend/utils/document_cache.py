@@ -0,0 +1,206 @@
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import os
+import sys
+import threading
+import time
+
+from sqlalchemy.orm import Session, joinedload
+
+from database.database import db_call
+from models.database import Document, DocumentContent
+from utils.document_digest import ensure_digest
+from utils.text_store import text_store
+
+# Process-wide read-through cache of document rows and text reads, evicted least recently used by size
+DOCUMENT_CACHE_MAX_BYTES = int(os.getenv("DOCUMENT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Other worker processes never see this one's invalidations, so entries also expire
+DOCUMENT_CACHE_TTL = float(os.getenv("DOCUMENT_CACHE_TTL", "300"))
+# Reads larger than this (e.g. a whole book for a podcast) are served but not kept
+DOCUMENT_CACHE_MAX_ENTRY_BYTES = int(os.getenv("DOCUMENT_CACHE_MAX_ENTRY_BYTES", str(DOCUMENT_CACHE_MAX_BYTES // 8)))
+
+_MISSING = object()
+
+
+class CachedContent:
+    """Detached, read-only copy of a DocumentContent row; text reads go through the cache"""
+
+    __slots__ = ("id", "content_hash", "file_type", "text_length", "vector_db_id", "page_count", "outline", "digest")
+
+    def __init__(self, content: DocumentContent):
+        for name in self.__slots__:
+            setattr(self, name, getattr(content, name))
+
+    @property
+    def text_content(self) -> str:
+        return document_cache.read_text(self.content_hash)
+
+    def read_text(self, start: int = 0, end: Optional[int] = None) -> str:
+        return document_cache.read_text(self.content_hash, start, end)
+
+    def read_ranges(self, ranges: List[Tuple[int, Optional[int]]]) -> List[str]:
+        return document_cache.read_ranges(self.content_hash, ranges)
+
+    def iter_text(self, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        # Streaming reads stay streaming rather than filling the cache
+        return text_store.iter_range(self.content_hash, start, end)
+
+
+class CachedDocument:
+    """Detached, read-only copy of a Document and its content, safe to share between requests.
+
+    Offers the attributes and read methods the generators use on Document;
+    anything that writes must load the ORM row instead.
+    """
+
+    __slots__ = ("id", "filename", "file_type", "subject", "content_id", "version", "upload_date", "user_id",
+                 "content")
+
+    def __init__(self, document: Document):
+        for name in self.__slots__[:-1]:
+            setattr(self, name, getattr(document, name))
+        self.content = CachedContent(document.content)
+
+    @property
+    def text_content(self) -> str:
+        return self.content.text_content
+
+    def read_text(self, start: int = 0, end: Optional[int] = None) -> str:
+        return self.content.read_text(start, end)
+
+    @property
+    def vector_db_id(self):
+        return self.content.vector_db_id
+
+
+def _json_size(value: Any) -> int:
+    return len(json.dumps(value)) if value else 0
+
+
+class DocumentCache:
+    """LRU over document snapshots (by id) and text reads (by content hash and range).
+
+    Text is keyed by content hash, which never changes meaning, so only
+    document entries need invalidating when a document is revised or deleted.
+    """
+
+    def __init__(self, max_bytes: int = DOCUMENT_CACHE_MAX_BYTES, ttl: float = DOCUMENT_CACHE_TTL,
+                 max_entry_bytes: int = DOCUMENT_CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[tuple, Tuple[Any, int, float]]" = OrderedDict()  # key -> (value, size, expires)
+        self._bytes = 0
+        self._hits = {"document": 0, "text": 0}
+        self._misses = {"document": 0, "text": 0}
+        self._evictions = 0
+        self._generation = 0  # Bumped by invalidate(), so a load racing it does not cache the old row
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: tuple) -> Any:
+        kind = "document" if key[0] == "document" else "text"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits[kind] += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+            self._misses[kind] += 1
+            return _MISSING
+
+    def _store(self, key: tuple, value: Any, size: int, generation: Optional[int] = None):
+        if size > self.max_entry_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def _remove(self, key: tuple):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def load(self, db: Session, document_id: int) -> Optional[CachedDocument]:
+        """The document from the cache, or from one joined query that is then cached (blocking)"""
+        cached = self._lookup(("document", document_id))
+        return self._load(db, document_id) if cached is _MISSING else cached
+
+    async def get(self, db: Session, document_id: int) -> Optional[CachedDocument]:
+        """Cached document, touching the database (on the DB pool) only on a miss"""
+        cached = self._lookup(("document", document_id))
+        return await db_call(db, self._load, db, document_id) if cached is _MISSING else cached
+
+    def _load(self, db: Session, document_id: int) -> Optional[CachedDocument]:
+        generation = self._generation
+        document = db.query(Document).options(
+            joinedload(Document.content).undefer(DocumentContent.outline).undefer(DocumentContent.digest)
+        ).filter(Document.id == document_id).first()
+        if not document:
+            return None
+        # Snapshots always carry a current digest, so excerpts never write
+        ensure_digest(document.content)
+        snapshot = CachedDocument(document)
+        size = 1024 + _json_size(snapshot.content.outline) + _json_size(snapshot.content.digest)
+        self._store(("document", document_id), snapshot, size, generation)
+        return snapshot
+
+    def read_text(self, content_hash: str, start: int = 0, end: Optional[int] = None) -> str:
+        key = ("text", content_hash, start, end)
+        text = self._lookup(key)
+        if text is _MISSING:
+            text = text_store.read(content_hash, start, end)
+            self._store(key, text, sys.getsizeof(text))
+        return text
+
+    def read_ranges(self, content_hash: str, ranges: List[Tuple[int, Optional[int]]]) -> List[str]:
+        key = ("ranges", content_hash, tuple(map(tuple, ranges)))
+        texts = self._lookup(key)
+        if texts is _MISSING:
+            texts = text_store.read_ranges(content_hash, ranges)
+            self._store(key, texts, sum(sys.getsizeof(text) for text in texts))
+        return texts
+
+    def invalidate(self, document_id: int):
+        """Forget a document after it is revised or deleted (call after the commit)"""
+        with self._lock:
+            self._generation += 1
+            if ("document", document_id) in self._entries:
+                self._remove(("document", document_id))
+
+    def forget_content(self, content_hash: str):
+        """Drop cached text of content that was deleted from the text store"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] != "document" and key[1] == content_hash]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                kind: {
+                    "hits": self._hits[kind],
+                    "misses": self._misses[kind],
+                    "hit_rate": round(self._hits[kind] / (self._hits[kind] + self._misses[kind]), 4)
+                    if self._hits[kind] + self._misses[kind] else None,
+                }
+                for kind in ("document", "text")
+            }
+            stats.update(entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes,
+                         evictions=self._evictions)
+            return stats
+
+
+document_cache = DocumentCache()
@@ -0,0 +1,256 @@
+from typing import Dict, Any, Iterator, List, Tuple, Optional, Iterable
+from collections import Counter
+from contextlib import contextmanager
+import hashlib
+import re
+import threading
+import numpy as np
+
+from sklearn.feature_extraction.text import CountVectorizer, ENGLISH_STOP_WORDS
+from sqlalchemy.orm import undefer
+from sqlalchemy.orm.attributes import set_committed_value
+
+from database.database import SessionLocal
+from models.database import DocumentContent
+from utils.text_splitter import TextSplitter, TextChunk
+
+# Bump when the digest layout or scoring changes; older digests are rebuilt on read or by `manage.py backfill-digests`
+DIGEST_VERSION = 1
+DIGEST_TOP_TERMS = 80
+DIGEST_MAX_PASSAGES = 64
+DIGEST_MAX_EDGES = 600
+COOCCURRENCE_WINDOW = 8
+
+_WORD_RE = re.compile(r"[a-zA-Z][a-zA-Z0-9\-]+")
+_DEVANAGARI_RE = re.compile(r"[ऀ-ॿ]")
+_LATIN_RE = re.compile(r"[A-Za-z]")
+# Frequent function words that tell the supported Devanagari languages apart
+_MARATHI_MARKERS = {"आहे", "आणि", "आहेत", "होते", "त्या", "करून", "म्हणजे", "नाही"}
+_HINDI_MARKERS = {"है", "और", "हैं", "था", "के", "की", "में", "नहीं"}
+
+# One digest build per content row at a time, so concurrent readers of old content build it once
+_digest_locks: Dict[int, list] = {}
+_digest_locks_guard = threading.Lock()
+
+
+def _clean_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text)
+
+
+def _term_matrix(texts: List[str]):
+    """Chunk-by-term count matrix and its vocabulary, or None if the text is too small to vectorize"""
+    try:
+        vectorizer = CountVectorizer(
+            ngram_range=(1, 3),
+            max_df=0.85,
+            min_df=2,
+            stop_words="english",
+            max_features=1200,
+        )
+        return vectorizer.fit_transform(texts), vectorizer.get_feature_names_out()
+    except ValueError:
+        # Single-chunk documents leave nothing between min_df and max_df
+        return None
+
+
+def _fallback_counts(texts: List[str]) -> List[Counter]:
+    return [
+        Counter(word for word in (w.lower() for w in _WORD_RE.findall(text))
+                if len(word) > 3 and word not in ENGLISH_STOP_WORDS)
+        for text in texts
+    ]
+
+
+def score_terms(texts: List[str], top_k: int = DIGEST_TOP_TERMS) -> Tuple[List[Tuple[str, float]], List[float]]:
+    """Key terms with scores normalized to the top term, plus a key-term coverage score per text"""
+    matrix = _term_matrix(texts)
+    if matrix is not None:
+        X, terms = matrix
+        totals = np.asarray(X.sum(axis=0)).ravel()
+        order = np.argsort(-totals, kind="stable")[:top_k]
+        max_total = float(totals[order[0]]) if len(order) else 1.0
+        key_terms = [(str(terms[i]), float(totals[i]) / max_total) for i in order]
+        weights = np.array([score for _, score in key_terms])
+        coverage = (X[:, order] > 0).astype(np.float64) @ weights
+        return key_terms, [float(value) for value in np.asarray(coverage).ravel()]
+
+    counts = _fallback_counts(texts)
+    total = sum(counts, Counter())
+    if not total:
+        return [], [0.0] * len(texts)
+    max_count = total.most_common(1)[0][1]
+    key_terms = [(word, count / max_count) for word, count in total.most_common(top_k)]
+    weights = dict(key_terms)
+    coverage = [sum(weights.get(word, 0.0) for word in chunk_counts) for chunk_counts in counts]
+    return key_terms, coverage
+
+
+def cooccurrence_edges(texts: Iterable[str], terms: Iterable[str],
+                       window: int = COOCCURRENCE_WINDOW) -> List[List[Any]]:
+    """Weighted [term, term, count] pairs for terms appearing within `window` tokens of each other"""
+    vocabulary = set(terms)
+    longest = max((term.count(" ") + 1 for term in vocabulary), default=1)
+    weights: Counter = Counter()
+    for text in texts:
+        words = [w.lower() for w in _WORD_RE.findall(text)]
+        # Key terms are 1-3 word n-grams; take the longest match at each position
+        tokens, i = [], 0
+        while i < len(words):
+            for n in range(min(longest, len(words) - i), 0, -1):
+                candidate = " ".join(words[i:i + n]) if n > 1 else words[i]
+                if candidate in vocabulary:
+                    tokens.append(candidate)
+                    i += n
+                    break
+            else:
+                i += 1
+        for i, first in enumerate(tokens):
+            for second in tokens[i + 1:i + window]:
+                if first != second:
+                    weights[(first, second) if first < second else (second, first)] += 1
+    return [[first, second, weight] for (first, second), weight in weights.most_common(DIGEST_MAX_EDGES)]
+
+
+def guess_language(text: str, sample_chars: int = 20000) -> str:
+    """Cheap script and function-word guess among the app's languages ("en", "hi", "mr")"""
+    sample = text[:sample_chars]
+    devanagari = len(_DEVANAGARI_RE.findall(sample))
+    latin = len(_LATIN_RE.findall(sample))
+    if not devanagari and not latin:
+        return "unknown"
+    if devanagari > latin:
+        words = sample.split()
+        marathi = sum(word in _MARATHI_MARKERS for word in words)
+        hindi = sum(word in _HINDI_MARKERS for word in words)
+        return "mr" if marathi > hindi else "hi"
+    return "en"
+
+
+def build_digest(text: str, chunks: List[TextChunk]) -> Dict[str, Any]:
+    """Everything generators need about a document, computed once at ingestion"""
+    texts = [_clean_text(chunk.text) for chunk in chunks]
+    key_terms, coverage = score_terms(texts)
+    token_counts = [chunk.token_count for chunk in chunks]
+
+    # Most representative chunks first, so callers can take as many as fit their budget
+    ranked = sorted(range(len(chunks)), key=lambda i: (-coverage[i], i))[:DIGEST_MAX_PASSAGES]
+    passages = [
+        {
+            "chunk_index": chunks[i].index,
+            "start": chunks[i].start,
+            "end": chunks[i].end,
+            "score": round(coverage[i], 4),
+            "chunk_hash": hashlib.sha256(chunks[i].text.encode("utf-8")).hexdigest(),
+        }
+        for i in ranked
+    ]
+
+    return {
+        "version": DIGEST_VERSION,
+        "language": guess_language(text),
+        "chunks": {
+            "count": len(chunks),
+            "total_tokens": sum(token_counts),
+            "avg_tokens": round(sum(token_counts) / len(chunks), 1) if chunks else 0,
+            "max_tokens": max(token_counts, default=0),
+        },
+        "key_terms": [[term, round(score, 4)] for term, score in key_terms],
+        "cooccurrence": cooccurrence_edges(texts, (term for term, _ in key_terms)),
+        "passages": passages,
+    }
+
+
+def is_current(digest: Optional[Dict[str, Any]]) -> bool:
+    return bool(digest) and digest.get("version") == DIGEST_VERSION
+
+
+@contextmanager
+def _digest_lock(content_id: int) -> Iterator[None]:
+    with _digest_locks_guard:
+        entry = _digest_locks.setdefault(content_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _digest_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _digest_locks.pop(content_id, None)
+
+
+def build_and_save_digest(content_id: int) -> Optional[Dict[str, Any]]:
+    """Build and commit the digest of a DocumentContent row in a session of its own (None if the row is gone)"""
+    with _digest_lock(content_id), SessionLocal() as db:
+        content = db.query(DocumentContent).options(undefer(DocumentContent.digest)).filter(
+            DocumentContent.id == content_id).first()
+        if content is None:
+            return None
+        if is_current(content.digest):
+            # Another reader built it while this one waited
+            return content.digest
+        text = content.text_content or ""
+        content.digest = build_digest(text, list(TextSplitter().iter_chunks(text)))
+        db.commit()
+        print(f"🧾 Built digest for content {content_id}")
+        return content.digest
+
+
+def ensure_digest(content) -> Dict[str, Any]:
+    """Digest of a DocumentContent row, building it for content ingested before digests existed.
+
+    The build commits in its own session, never the caller's; `manage.py
+    backfill-digests` builds them all ahead of time.
+    """
+    if is_current(content.digest):
+        return content.digest
+    digest = build_and_save_digest(content.id)
+    if digest is None:
+        raise Exception("Document not found")
+    # Already committed, so the caller's session must not see it as a pending change
+    set_committed_value(content, "digest", digest)
+    return digest
+
+
+def document_excerpt(document, limit: int) -> Tuple[str, Optional[List[Dict[str, Any]]]]:
+    """digest_excerpt for a Document, building its digest first if needed"""
+    return digest_excerpt(document.content, ensure_digest(document.content), limit)
+
+
+def merge_ranges(ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sorted [start, end) ranges with overlapping and touching ones joined"""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def digest_excerpt(content, digest: Dict[str, Any], limit: int) -> Tuple[str, Optional[List[Dict[str, Any]]]]:
+    """Up to `limit` characters of the document's most representative passages, in reading order.
+
+    Short documents are returned whole. Only the blocks holding the selected
+    passages are read from the text store. Returns the excerpt and the
+    {"hash", "start", "end"} of the chunks it was taken from, or None when
+    the excerpt is the text prefix.
+    """
+    if content.text_length <= limit or not digest.get("passages"):
+        return content.read_text(0, limit), None
+
+    selected, ranges = [], []
+    for passage in digest["passages"]:
+        # Neighbouring chunks overlap, so a passage may add only part of its length
+        merged = merge_ranges(ranges + [(passage["start"], passage["end"])])
+        if sum(end - start for start, end in merged) + 2 * (len(merged) - 1) > limit:
+            continue
+        selected.append(passage)
+        ranges = merged
+    if not selected:
+        return content.read_text(0, limit), None
+
+    selected.sort(key=lambda passage: passage["start"])
+    excerpt = "\n\n".join(content.read_ranges(ranges))
+    return excerpt, [{"hash": passage["chunk_hash"], "start": passage["start"], "end": passage["end"]}
+                     for passage in selected]
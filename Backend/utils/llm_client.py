@@ -1,11 +1,16 @@
 from langchain_groq import ChatGroq
 from langchain_community.embeddings import HuggingFaceEmbeddings
+import asyncio
 import os
 import json
 from typing import List, Dict, Any
 from dotenv import load_dotenv
 from pathlib import Path
 
+# Concurrent Groq requests per process; callers beyond this wait their turn rather than hit rate limits
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+llm_limiter = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
 class LLMClient:
     def __init__(self):
         # Explicitly load .env from the parent directory (Backend)
@@ -38,7 +43,9 @@ class LLMClient:
         full_prompt = f"{context}\n\n{prompt}" if context else prompt
         
         try:
-            response = self.client.invoke(full_prompt)
+            # Awaited rather than invoked, so the event loop keeps serving while Groq responds
+            async with llm_limiter:
+                response = await self.client.ainvoke(full_prompt)
             return response.content
         except Exception as e:
             raise Exception(f"Error generating response: {str(e)}")
@@ -0,0 +1,182 @@
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Union
+import asyncio
+import hashlib
+import io
+import mmap
+import os
+import time
+
+# Tesseract runs in its own bounded pool so OCR never competes with the event loop
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", str(os.cpu_count() or 1)))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+# Longest image side handed to Tesseract; larger scans are downscaled first
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2500"))
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "./ocr_cache")
+OCR_MEMORY_CACHE_ENTRIES = int(os.getenv("OCR_MEMORY_CACHE_ENTRIES", "512"))
+
+
+def _otsu_threshold(image: Image.Image) -> int:
+    """Pick the grey level that best separates ink from paper"""
+    histogram = image.histogram()[:256]
+    total = sum(histogram)
+    sum_all = sum(level * count for level, count in enumerate(histogram))
+    sum_bg, weight_bg = 0.0, 0
+    best_level, best_variance = 127, 0.0
+    for level, count in enumerate(histogram):
+        weight_bg += count
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += level * count
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        variance = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def preprocess_for_ocr(image: Image.Image, max_side: int = OCR_MAX_SIDE) -> Image.Image:
+    """Greyscale, downscale and binarize an image before OCR"""
+    image = image.convert("L")
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side))
+    threshold = _otsu_threshold(image)
+    return image.point(lambda p: 255 if p > threshold else 0, mode="1")
+
+
+def rasterize_pdf_page(page, dpi: int = OCR_DPI) -> bytes:
+    """Render a PyMuPDF page to a preprocessed PNG ready for OCR"""
+    pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+    buffer = io.BytesIO()
+    preprocess_for_ocr(image).save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _ocr_worker(source: Union[bytes, str], lang: str, max_side: int) -> str:
+    """Worker: preprocess and OCR a single image given as bytes or a file path"""
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+        prepared = preprocess_for_ocr(image, max_side)
+    return pytesseract.image_to_string(prepared, lang=lang)
+
+
+def _cache_key(image_digest: str) -> str:
+    """Cache key of an image's text; the same image read with another language or size limit differs"""
+    return hashlib.sha256(f"{image_digest}:{OCR_LANG}:{OCR_MAX_SIDE}".encode()).hexdigest()
+
+
+def _hash_file(path: str) -> str:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap cannot map an empty file, and there is nothing to OCR in it anyway
+            raise Exception(f"Image file is empty: {path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return hashlib.sha256(mapped).hexdigest()
+
+
+class OCRPipeline:
+    def __init__(self, max_workers: int = OCR_MAX_WORKERS, cache_dir: str = OCR_CACHE_DIR):
+        self.max_workers = max(1, max_workers)
+        self.cache_dir = cache_dir
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._memory_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Keep the pool's input queue short instead of pickling every page up front
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers * 2)
+        return self._semaphore
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def _read_cache_file(self, key: str) -> Optional[str]:
+        try:
+            with open(self._cache_path(key), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_cache_file(self, key: str, text: str):
+        path = self._cache_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    async def _cache_get(self, key: str) -> Optional[str]:
+        if key in self._memory_cache:
+            self._memory_cache.move_to_end(key)
+            return self._memory_cache[key]
+        text = await asyncio.to_thread(self._read_cache_file, key)
+        if text is not None:
+            self._remember(key, text)
+        return text
+
+    async def _cache_put(self, key: str, text: str):
+        await asyncio.to_thread(self._write_cache_file, key, text)
+        self._remember(key, text)
+
+    def _remember(self, key: str, text: str):
+        self._memory_cache[key] = text
+        self._memory_cache.move_to_end(key)
+        while len(self._memory_cache) > OCR_MEMORY_CACHE_ENTRIES:
+            self._memory_cache.popitem(last=False)
+
+    async def _run_ocr(self, key: str, source: Union[bytes, str]) -> str:
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            text = await loop.run_in_executor(
+                self._get_executor(), _ocr_worker, source, OCR_LANG, OCR_MAX_SIDE
+            )
+        await self._cache_put(key, text)
+        return text
+
+    async def _ocr_cached(self, key: str, source: Union[bytes, str]) -> str:
+        cached = await self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run_ocr(key, source))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def ocr_image(self, image_bytes: bytes) -> str:
+        """OCR one image, reusing cached or in-flight results for identical images"""
+        return await self._ocr_cached(_cache_key(hashlib.sha256(image_bytes).hexdigest()), image_bytes)
+
+    async def ocr_image_file(self, path: str) -> str:
+        """OCR an image on disk; the worker opens the file itself"""
+        key = _cache_key(await asyncio.to_thread(_hash_file, path))
+        return await self._ocr_cached(key, path)
+
+    async def ocr_images(self, images: List[bytes]) -> List[str]:
+        """OCR many images concurrently, returning texts in input order"""
+        started = time.perf_counter()
+        texts = await asyncio.gather(*[self.ocr_image(image) for image in images])
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(f"🔎 OCR'd {len(images)} image(s) in {elapsed:.2f}s ({len(images) / elapsed:.1f} pages/s)")
+        return list(texts)
+
+
+ocr_pipeline = OCRPipeline()
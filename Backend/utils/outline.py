@@ -0,0 +1,13 @@
+from typing import Any, Dict, List, Optional
+
+
+def find_section(outline: List[Dict[str, Any]], query: str) -> Optional[Dict[str, Any]]:
+    """Find the outline entry best matching a section name such as 'chapter 4'"""
+    query = " ".join(query.lower().split())
+    if not query:
+        return None
+    matches = [entry for entry in outline or [] if query in " ".join(entry["title"].lower().split())]
+    if not matches:
+        return None
+    # Prefer the outermost, then earliest, match
+    return min(matches, key=lambda entry: (entry["level"], entry["start"]))
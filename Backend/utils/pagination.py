@@ -0,0 +1,88 @@
+from typing import Any, List, Optional, Tuple, Union
+from datetime import datetime
+from sqlalchemy import and_, or_
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursorError(Exception):
+    """Raised for cursors that were not produced by encode_cursor"""
+
+
+def encode_cursor(value: Any, row_id: Union[int, str]) -> str:
+    """Opaque cursor for the position just after (value, row_id)"""
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    raw = json.dumps([value, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _matches_column(column, value: Any) -> bool:
+    try:
+        expected = column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return True
+    if expected is float:
+        expected = (int, float)
+    # bool is an int subclass, but JSON true is never a valid id or sort value
+    return isinstance(value, expected) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str, order_column=None, id_column=None) -> Tuple[Any, Union[int, str]]:
+    """(value, row_id) of a cursor, checked against the types of the columns it will be compared with"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+    except Exception:
+        raise InvalidCursorError("Invalid pagination cursor")
+    # Integer ids for most tables, UUID strings for generated artifacts
+    if isinstance(row_id, bool) or not isinstance(row_id, (int, str)):
+        raise InvalidCursorError("Invalid pagination cursor")
+    # A forged value of the wrong type would otherwise compare as an empty (or wrong) page
+    if (id_column is not None and not _matches_column(id_column, row_id)) or \
+            (order_column is not None and order_column is not id_column and not _matches_column(order_column, value)):
+        raise InvalidCursorError("Invalid pagination cursor")
+    return value, row_id
+
+
+def keyset_query(query, id_column, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                 order_column=None):
+    """`query` restricted to the page after cursor, newest first, with one extra row to detect a next page"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    order_column = order_column if order_column is not None else id_column
+
+    if cursor:
+        value, row_id = decode_cursor(cursor, order_column, id_column)
+        if order_column is id_column:
+            query = query.filter(id_column < row_id)
+        else:
+            # The leading <= gives the planner an index range to seek into; the OR alone would scan from the top
+            query = query.filter(and_(order_column <= value, or_(order_column < value, id_column < row_id)))
+
+    order_by = [order_column.desc()] if order_column is id_column else [order_column.desc(), id_column.desc()]
+    return query.order_by(*order_by).limit(limit + 1)
+
+
+def keyset_paginate(query, id_column, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                    order_column=None) -> Tuple[List[Any], Optional[str]]:
+    """Newest-first page of `query` ordered by (order_column, id_column), plus the next cursor.
+
+    Seeks past the cursor with an indexed range condition instead of OFFSET,
+    so every page costs the same no matter how deep it is. The query must
+    select id_column and order_column (as entities or whole models).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    order_column = order_column if order_column is not None else id_column
+    rows = keyset_query(query, id_column, limit, cursor, order_column).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, order_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
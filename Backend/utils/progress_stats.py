@@ -0,0 +1,277 @@
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models.database import (
+    ActivityEvent, Document, FlashcardProgress, QuizResult, UserDailyStats, UserStats, UserSubjectStats,
+)
+
+# Per-user activity log and progress aggregates. The record_* helpers run
+# inside the caller's transaction, before its commit: they append to
+# activity_events and fold the same events into the per-user and per-day
+# rollups, so readers never touch the raw history.
+# Counters are bumped with `col = col + n` in SQL, never read-modify-write,
+# so concurrent requests for the same user cannot lose updates.
+
+# Study time estimates for events the client did not time
+QUIZ_SECONDS_PER_QUESTION = int(os.getenv("QUIZ_SECONDS_PER_QUESTION", "45"))
+FLASHCARD_REVIEW_SECONDS = int(os.getenv("FLASHCARD_REVIEW_SECONDS", "20"))
+READING_WORDS_PER_MINUTE = int(os.getenv("READING_WORDS_PER_MINUTE", "200"))
+# A tab left open should not count as an afternoon of study
+MAX_EVENT_SECONDS = int(os.getenv("MAX_EVENT_SECONDS", "3600"))
+
+# Event kind -> (UserStats counter, UserDailyStats counter)
+EVENT_COUNTERS = {
+    "quiz": ("quizzes_taken", "quizzes"),
+    "flashcard_review": ("flashcard_reviews", "flashcard_reviews"),
+    "chat": ("chats", "chats"),
+    "upload": ("documents", "uploads"),
+}
+
+_UPSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+
+def _bump(db: Session, model, keys: Dict[str, Any], increments: Dict[str, Any], assignments: Optional[Dict] = None):
+    """Add increments to the row identified by keys, creating a zero row first if needed"""
+    upsert = _UPSERTS.get(db.get_bind().dialect.name)
+    if upsert is not None:
+        db.execute(upsert(model).values(**keys).on_conflict_do_nothing())
+    elif db.get(model, tuple(keys.values())) is None:
+        db.add(model(**keys))
+        db.flush()
+
+    values = {getattr(model, column): getattr(model, column) + amount for column, amount in increments.items()}
+    values.update(assignments or {})
+    db.query(model).filter(*[getattr(model, key) == value for key, value in keys.items()]).update(
+        values, synchronize_session=False
+    )
+
+
+def activity_event(user_id: int, kind: str, occurred_at: datetime, duration_seconds: int = 0,
+                   document_id: Optional[int] = None, value: Optional[float] = None) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "kind": kind,
+        "occurred_at": occurred_at,
+        "duration_seconds": max(0, min(int(duration_seconds), MAX_EVENT_SECONDS)),
+        "document_id": document_id,
+        "value": value,
+    }
+
+
+def _rollup(events: List[Dict[str, Any]]):
+    """Per-user and per-(user, day) increments for a batch of events"""
+    totals: Dict[int, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    daily: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    for event in events:
+        total_column, daily_column = EVENT_COUNTERS[event["kind"]]
+        user_totals = totals[event["user_id"]]
+        day_totals = daily[(event["user_id"], event["occurred_at"].date())]
+        user_totals[total_column] += 1
+        day_totals[daily_column] += 1
+        user_totals["study_seconds"] += event["duration_seconds"]
+        day_totals["study_seconds"] += event["duration_seconds"]
+        if event["kind"] == "quiz":
+            user_totals["quiz_score_total"] += event["value"] or 0
+            day_totals["quiz_score_total"] += event["value"] or 0
+    return totals, daily
+
+
+def record_events(db: Session, events: List[Dict[str, Any]]):
+    """Append events (see activity_event) with one bulk insert and fold them into the rollups"""
+    events = [event for event in events if event["user_id"] is not None]
+    if not events:
+        return
+    if "activity_batch" in db.info:
+        db.info["activity_batch"].extend(events)
+        return
+    db.execute(insert(ActivityEvent), events)
+
+    totals, daily = _rollup(events)
+    # Sorted so concurrent batches lock rows in the same order
+    for user_id in sorted(totals):
+        _bump(db, UserStats, {"user_id": user_id}, totals[user_id], {UserStats.updated_at: datetime.utcnow()})
+    for user_id, day in sorted(daily):
+        _bump(db, UserDailyStats, {"user_id": user_id, "day": day}, daily[(user_id, day)])
+
+
+@contextmanager
+def batched_events(db: Session):
+    """Collect the events recorded inside the block and write them together at its end"""
+    if "activity_batch" in db.info:
+        yield
+        return
+    db.info["activity_batch"] = []
+    try:
+        yield
+    finally:
+        events = db.info.pop("activity_batch")
+    record_events(db, events)
+
+
+def record_quiz(db: Session, user_id: Optional[int], document_id: Optional[int], score: float,
+                total_questions: int, taken_at: datetime, duration_seconds: Optional[int] = None):
+    if user_id is None:
+        return
+    if duration_seconds is None:
+        duration_seconds = total_questions * QUIZ_SECONDS_PER_QUESTION
+    record_events(db, [activity_event(user_id, "quiz", taken_at, duration_seconds, document_id, score)])
+
+    subject = db.query(Document.subject).filter(Document.id == document_id).scalar() if document_id else None
+    if subject:
+        _bump(db, UserSubjectStats, {"user_id": user_id, "subject": subject},
+              {"quizzes": 1, "quiz_score_total": score})
+
+
+def record_flashcard_review(db: Session, user_id: Optional[int], new_card: bool, reviewed_at: datetime,
+                            duration_seconds: Optional[int] = None):
+    if user_id is None:
+        return
+    if duration_seconds is None:
+        duration_seconds = FLASHCARD_REVIEW_SECONDS
+    record_events(db, [activity_event(user_id, "flashcard_review", reviewed_at, duration_seconds)])
+    if new_card:
+        _bump(db, UserStats, {"user_id": user_id}, {"flashcards_studied": 1})
+
+
+def reading_seconds(*texts: str) -> int:
+    words = sum(len(text.split()) for text in texts if text)
+    return round(words * 60 / READING_WORDS_PER_MINUTE)
+
+
+def record_chat(db: Session, user_id: Optional[int], at: datetime, message: str = "", response: str = ""):
+    record_events(db, [activity_event(user_id, "chat", at, reading_seconds(message, response))])
+
+
+def record_upload(db: Session, user_id: Optional[int], document_id: Optional[int], at: datetime):
+    record_events(db, [activity_event(user_id, "upload", at, document_id=document_id)])
+
+
+def record_document_deleted(db: Session, user_id: Optional[int]):
+    if user_id is None:
+        return
+    _bump(db, UserStats, {"user_id": user_id}, {"documents": -1}, {UserStats.updated_at: datetime.utcnow()})
+
+
+def get_stats(db: Session, user_id: int) -> UserStats:
+    """The user's aggregate row, or an all-zero one for users with no activity yet"""
+    stats = db.get(UserStats, user_id)
+    if stats is None:
+        stats = UserStats(user_id=user_id, documents=0, quizzes_taken=0, quiz_score_total=0.0,
+                          flashcards_studied=0, flashcard_reviews=0, chats=0, study_seconds=0)
+    return stats
+
+
+def get_daily_stats(db: Session, user_id: int, since: date, until: Optional[date] = None) -> List[UserDailyStats]:
+    query = db.query(UserDailyStats).filter(UserDailyStats.user_id == user_id, UserDailyStats.day >= since)
+    if until is not None:
+        query = query.filter(UserDailyStats.day <= until)
+    return query.order_by(UserDailyStats.day).all()
+
+
+def activity_window(db: Session, user_id: int, since: date, until: date) -> Dict[str, float]:
+    """Summed daily rollups for [since, until]; one indexed range read over at most one row per day"""
+    columns = ("quizzes", "quiz_score_total", "flashcard_reviews", "chats", "uploads", "study_seconds")
+    row = db.query(*[func.coalesce(func.sum(getattr(UserDailyStats, column)), 0) for column in columns]).filter(
+        UserDailyStats.user_id == user_id, UserDailyStats.day >= since, UserDailyStats.day <= until
+    ).one()
+    return dict(zip(columns, row))
+
+
+def get_subject_stats(db: Session, user_id: int) -> List[UserSubjectStats]:
+    return db.query(UserSubjectStats).filter(UserSubjectStats.user_id == user_id).all()
+
+
+def activity_streak(db: Session, user_id: int, today: Optional[date] = None) -> int:
+    """Consecutive days with study time ending today, or yesterday if nothing is logged today yet.
+
+    Walks the daily rows newest first and stops at the first gap, so the
+    cost is the length of the streak, not the size of the history.
+    """
+    today = today or datetime.utcnow().date()
+    days = db.query(UserDailyStats.day).filter(
+        UserDailyStats.user_id == user_id, UserDailyStats.day <= today, UserDailyStats.study_seconds > 0
+    ).order_by(UserDailyStats.day.desc()).yield_per(64)
+
+    streak, expected = 0, None
+    for (day,) in days:
+        if expected is None and day < today - timedelta(days=1):
+            break
+        if expected is not None and day != expected:
+            break
+        streak += 1
+        expected = day - timedelta(days=1)
+    return streak
+
+
+def _as_date(value) -> date:
+    # func.date() returns ISO strings on SQLite and dates on PostgreSQL
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def rebuild_stats(db: Session, user_id: Optional[int] = None) -> int:
+    """Recompute every aggregate (for all users or one); returns users rebuilt.
+
+    Activity counters and study time come from activity_events; the current
+    document count, distinct flashcards and per-subject scores from their own tables.
+    """
+    def scoped(query, column):
+        return query.filter(column == user_id) if user_id is not None else query.filter(column.isnot(None))
+
+    for model in (UserStats, UserDailyStats, UserSubjectStats):
+        scoped(db.query(model), model.user_id).delete(synchronize_session=False)
+
+    users: Dict[int, Dict[str, Any]] = defaultdict(lambda: {
+        "documents": 0, "quizzes_taken": 0, "quiz_score_total": 0.0, "flashcards_studied": 0,
+        "flashcard_reviews": 0, "chats": 0, "study_seconds": 0,
+    })
+    daily: Dict[tuple, Dict[str, Any]] = defaultdict(lambda: {
+        "quizzes": 0, "quiz_score_total": 0.0, "flashcard_reviews": 0, "chats": 0, "uploads": 0, "study_seconds": 0,
+    })
+
+    event_day = func.date(ActivityEvent.occurred_at)
+    for uid, day, kind, count, seconds, value in scoped(db.query(
+            ActivityEvent.user_id, event_day, ActivityEvent.kind, func.count(ActivityEvent.id),
+            func.sum(ActivityEvent.duration_seconds), func.sum(ActivityEvent.value)
+    ), ActivityEvent.user_id).group_by(ActivityEvent.user_id, event_day, ActivityEvent.kind):
+        total_column, daily_column = EVENT_COUNTERS[kind]
+        day_totals = daily[(uid, _as_date(day))]
+        if kind != "upload":  # The document total is the current count, below
+            users[uid][total_column] += count
+        day_totals[daily_column] += count
+        users[uid]["study_seconds"] += int(seconds or 0)
+        day_totals["study_seconds"] += int(seconds or 0)
+        if kind == "quiz":
+            users[uid]["quiz_score_total"] += float(value or 0)
+            day_totals["quiz_score_total"] += float(value or 0)
+
+    for uid, count in scoped(db.query(Document.user_id, func.count(Document.id)), Document.user_id).group_by(
+            Document.user_id):
+        users[uid]["documents"] = count
+
+    for uid, count in scoped(db.query(FlashcardProgress.user_id, func.count(FlashcardProgress.id)),
+                             FlashcardProgress.user_id).group_by(FlashcardProgress.user_id):
+        users[uid]["flashcards_studied"] = count
+
+    subjects = scoped(db.query(
+        QuizResult.user_id, Document.subject, func.count(QuizResult.id), func.sum(QuizResult.score)
+    ).join(Document, QuizResult.document_id == Document.id), QuizResult.user_id).filter(
+        Document.subject.isnot(None), Document.subject != ""
+    ).group_by(QuizResult.user_id, Document.subject).all()
+
+    db.bulk_insert_mappings(UserStats, [{"user_id": uid, **values} for uid, values in users.items()])
+    db.bulk_insert_mappings(UserDailyStats, [
+        {"user_id": uid, "day": day, **values} for (uid, day), values in daily.items()
+    ])
+    db.bulk_insert_mappings(UserSubjectStats, [
+        {"user_id": uid, "subject": subject, "quizzes": count, "quiz_score_total": float(total or 0)}
+        for uid, subject, count, total in subjects
+    ])
+    return len(users)
@@ -1,41 +1,226 @@
-from typing import List
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+from collections import deque
+from itertools import islice
 import re
 
+# Rough token estimate: words and individual punctuation marks
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_LINE_RE = re.compile(r"[^\n]*\n?")
+_SENTENCE_END_RE = re.compile(r"[.!?]+[\"')\]]*\s+")
+_HEADING_RE = re.compile(
+    r"(?P<md>#{1,6})\s+\S.*"                                                # Markdown heading
+    r"|(?i:chapter|unit|section|part|module|lecture)\s+[\dIVXLC]+\b.*"      # Chapter 4 ...
+    # "4." or "4.2" but not a bare "2 The" or a year; the title is checked in heading_level
+    r"|(?P<num>\d{1,3}(?:\.\d+){1,3}\.?|\d{1,3}\.)\s+(?P<title>[A-Z].*)"    # 4.2 Cell Division
+    r"|(?P<caps>[A-Z][A-Z0-9 ,&:'()/\-]{2,})"                                 # ALL CAPS TITLE
+)
+MAX_HEADING_CHARS = 80
+MAX_NUMBERED_TITLE_WORDS = 10
+MIN_CAPS_HEADING_WORDS = 2  # Of two or more letters, so acronyms and shouted phrases ("DNA", "I AM") are body text
+# A title ending in one of these runs on into the next line, so it is the start of a sentence
+_CONTINUATION_WORDS = {
+    "a", "an", "the", "and", "or", "but", "of", "to", "in", "on", "at", "by", "for", "with", "from", "as",
+    "that", "which", "is", "are", "was", "were", "be", "its", "their",
+}
+
+
+def count_tokens(text: str, start: int = 0, end: Optional[int] = None) -> int:
+    """Approximate token count of text[start:end] without slicing it"""
+    return sum(1 for _ in _TOKEN_RE.finditer(text, start, len(text) if end is None else end))
+
+
+def heading_level(line: str) -> Optional[int]:
+    """Return the outline level of a heading-like line, or None for body text"""
+    line = line.strip()
+    if not line or len(line) > MAX_HEADING_CHARS:
+        return None
+    match = _HEADING_RE.fullmatch(line)
+    if not match:
+        return None
+    if match.group("md"):
+        return len(match.group("md"))
+    if line[-1] in ".,;:!?":
+        return None
+    if match.group("num"):
+        words = match.group("title").split()
+        if len(words) > MAX_NUMBERED_TITLE_WORDS or words[-1] in _CONTINUATION_WORDS:
+            return None
+        return match.group("num").rstrip(".").count(".") + 1
+    if match.group("caps") and len(re.findall(r"[A-Z]{2,}", line)) < MIN_CAPS_HEADING_WORDS:
+        return None
+    return 1
+
+
+@dataclass
+class TextChunk:
+    index: int
+    text: str
+    start: int  # Offset of the chunk in the source text
+    end: int
+    token_count: int
+
+
+@dataclass
+class _Unit:
+    start: int
+    end: int
+    tokens: int
+    heading: bool = False
+
+
 class TextSplitter:
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, chunk_size: int = 256, chunk_overlap: int = 48):
+        """Sizes are measured in tokens"""
         self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
-    
+        self.chunk_overlap = min(chunk_overlap, chunk_size // 2)
+
     def split_text(self, text: str) -> List[str]:
         """Split text into overlapping chunks"""
-        if not text or len(text) <= self.chunk_size:
-            return [text]
-        
-        chunks = []
-        start = 0
-        
-        while start < len(text):
-            # Find chunk end
-            end = start + self.chunk_size
-            
-            if end >= len(text):
-                chunks.append(text[start:])
+        return [chunk.text for chunk in self.iter_chunks(text)]
+
+    def iter_chunks(self, text: str) -> Iterator[TextChunk]:
+        """Lazily yield chunks in a single pass over the text.
+
+        Headings always start a new chunk, paragraphs are preferred split
+        points once a chunk is reasonably full, and otherwise chunks end on
+        sentence boundaries.
+        """
+        if not text or not text.strip():
+            return
+
+        current: "deque[_Unit]" = deque()
+        current_tokens = 0
+        index = 0
+        body_units = 0
+
+        def emit() -> TextChunk:
+            nonlocal index
+            chunk = TextChunk(
+                index=index,
+                text=text[current[0].start:current[-1].end],
+                start=current[0].start,
+                end=current[-1].end,
+                token_count=current_tokens,
+            )
+            index += 1
+            return chunk
+
+        for unit, new_paragraph in self._iter_units(text):
+            if unit.heading and body_units:
+                # New section: flush without carrying overlap across the heading
+                yield emit()
+                current.clear()
+                current_tokens = body_units = 0
+            elif (new_paragraph and body_units and current_tokens >= self.chunk_size * 0.7) or \
+                    (current and current_tokens + unit.tokens > self.chunk_size):
+                yield emit()
+                while current and (current_tokens > self.chunk_overlap or
+                                   current_tokens + unit.tokens > self.chunk_size):
+                    dropped = current.popleft()
+                    current_tokens -= dropped.tokens
+                    body_units -= not dropped.heading
+
+            current.append(unit)
+            current_tokens += unit.tokens
+            body_units += not unit.heading
+
+        if current:
+            yield emit()
+
+    def first_chunks(self, blocks: Iterable[str], count: int) -> List[TextChunk]:
+        """The first `count` chunks of a text given as consecutive blocks (e.g. text_store.iter_range).
+
+        Reads only as many blocks as those chunks need. The text read so far
+        is chunked up to its last line break, at most once per doubling of
+        its length; the last two chunks of that prefix can still change with
+        more text (the final one runs on, the one before may have been cut by
+        a partial sentence), so they are never returned until the text ends.
+        """
+        if count <= 0:
+            return []
+        parts: List[str] = []
+        length, next_try = 0, 0
+        for block in blocks:
+            parts.append(block)
+            length += len(block)
+            if length < next_try:
+                continue
+            next_try = 2 * length
+            text = "".join(parts)
+            cut = text.rfind("\n\n") + 1 or text.rfind("\n") + 1
+            chunks = list(islice(self.iter_chunks(text[:cut]), count + 2)) if cut else []
+            if len(chunks) == count + 2:
+                return chunks[:count]
+        return list(islice(self.iter_chunks("".join(parts)), count))
+
+    def _iter_units(self, text: str) -> Iterator[tuple]:
+        """Yield (unit, starts_new_paragraph) for every heading and sentence"""
+        paragraph_start = None
+        paragraph_end = 0
+        new_paragraph = True
+
+        for line in _LINE_RE.finditer(text):
+            if line.start() == line.end():
                 break
-            
-            # Try to split at sentence boundary
-            chunk = text[start:end]
-            
-            # Look for sentence ending near the chunk boundary
-            sentence_endings = ['. ', '! ', '? ', '\n\n']
-            best_split = end
-            
-            for ending in sentence_endings:
-                last_occurrence = chunk.rfind(ending)
-                if last_occurrence > self.chunk_size * 0.7:  # Don't split too early
-                    best_split = start + last_occurrence + len(ending)
-                    break
-            
-            chunks.append(text[start:best_split])
-            start = best_split - self.chunk_overlap
-        
-        return [chunk.strip() for chunk in chunks if chunk.strip()]
\ No newline at end of file
+            stripped = line.group().strip()
+            if not stripped:
+                if paragraph_start is not None:
+                    yield from self._iter_sentences(text, paragraph_start, paragraph_end, new_paragraph)
+                    paragraph_start = None
+                new_paragraph = True
+                continue
+
+            if heading_level(stripped) is not None:
+                if paragraph_start is not None:
+                    yield from self._iter_sentences(text, paragraph_start, paragraph_end, new_paragraph)
+                    paragraph_start = None
+                start, end = self._trim(text, line.start(), line.end())
+                yield _Unit(start, end, count_tokens(text, start, end), heading=True), True
+                new_paragraph = True
+                continue
+
+            if paragraph_start is None:
+                paragraph_start = line.start()
+            paragraph_end = line.end()
+
+        if paragraph_start is not None:
+            yield from self._iter_sentences(text, paragraph_start, paragraph_end, new_paragraph)
+
+    def _iter_sentences(self, text: str, start: int, end: int, new_paragraph: bool) -> Iterator[tuple]:
+        sentence_start = start
+        for match in _SENTENCE_END_RE.finditer(text, start, end):
+            yield from self._sentence_units(text, sentence_start, match.end(), new_paragraph)
+            new_paragraph = False
+            sentence_start = match.end()
+        if sentence_start < end:
+            yield from self._sentence_units(text, sentence_start, end, new_paragraph)
+
+    def _sentence_units(self, text: str, start: int, end: int, new_paragraph: bool) -> Iterator[tuple]:
+        start, end = self._trim(text, start, end)
+        if start >= end:
+            return
+        tokens = count_tokens(text, start, end)
+        if tokens <= self.chunk_size:
+            yield _Unit(start, end, tokens), new_paragraph
+            return
+
+        # Run-on "sentence" (tables, OCR output): cut it every chunk_size tokens
+        piece_start, piece_tokens = start, 0
+        for token in _TOKEN_RE.finditer(text, start, end):
+            if piece_tokens == self.chunk_size:
+                piece_start, piece_end = self._trim(text, piece_start, token.start())
+                yield _Unit(piece_start, piece_end, piece_tokens), new_paragraph
+                new_paragraph = False
+                piece_start, piece_tokens = token.start(), 0
+            piece_tokens += 1
+        piece_start, piece_end = self._trim(text, piece_start, end)
+        yield _Unit(piece_start, piece_end, piece_tokens), new_paragraph
+
+    @staticmethod
+    def _trim(text: str, start: int, end: int) -> tuple:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
@@ -0,0 +1,171 @@
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import json
+import os
+import struct
+import tempfile
+import threading
+
+import zstandard as zstd
+
+# Extracted text lives outside the database as independently compressed zstd frames
+TEXT_STORE_DIR = os.getenv("TEXT_STORE_DIR", "./text_store")
+TEXT_STORE_BLOCK_CHARS = int(os.getenv("TEXT_STORE_BLOCK_CHARS", "65536"))
+TEXT_STORE_LEVEL = int(os.getenv("TEXT_STORE_LEVEL", "9"))
+TEXT_STORE_INDEX_CACHE = int(os.getenv("TEXT_STORE_INDEX_CACHE", "512"))
+
+# The block index is written as a zstd skippable frame, so a blob is still a valid
+# multi-frame .zst file (`zstd -d` restores the text). Its last 4 bytes hold the index length.
+_SKIPPABLE_MAGIC = 0x184D2A50
+_INDEX_VERSION = 1
+
+
+class TextStore:
+    """Compressed, block-addressable blobs of document text keyed by content hash"""
+
+    def __init__(self, root: str = TEXT_STORE_DIR, block_chars: int = TEXT_STORE_BLOCK_CHARS,
+                 level: int = TEXT_STORE_LEVEL, index_cache: int = TEXT_STORE_INDEX_CACHE):
+        self.root = root
+        self.block_chars = block_chars
+        self.level = level
+        self.index_cache = index_cache
+        self._indexes: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.zst")
+
+    def put(self, key: str, text: str) -> Dict[str, int]:
+        """Compress text block by block and store it atomically under key"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressor = zstd.ZstdCompressor(level=self.level)
+
+        frames, raw_bytes = [], 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for start in range(0, len(text), self.block_chars):
+                    raw = text[start:start + self.block_chars].encode("utf-8")
+                    frame = compressor.compress(raw)
+                    out.write(frame)
+                    frames.append(len(frame))
+                    raw_bytes += len(raw)
+                index = json.dumps({
+                    "version": _INDEX_VERSION,
+                    "length": len(text),
+                    "block_chars": self.block_chars,
+                    "frames": frames,
+                }).encode("utf-8")
+                payload = index + struct.pack("<I", len(index))
+                out.write(struct.pack("<II", _SKIPPABLE_MAGIC, len(payload)) + payload)
+            # Same key means same content, so replacing a concurrent writer's blob is harmless
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        stored_bytes = sum(frames)
+        print(f"🗜️  Stored text {key[:12]}: {raw_bytes / 1024:.0f} KB -> {stored_bytes / 1024:.0f} KB "
+              f"in {len(frames)} frame(s)")
+        return {"length": len(text), "raw_bytes": raw_bytes, "stored_bytes": stored_bytes, "frames": len(frames)}
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._indexes.pop(key, None)
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def length(self, key: str) -> int:
+        """Character length of the stored text, read from the index only"""
+        return self._index(key)["length"]
+
+    def read(self, key: str, start: int = 0, end: Optional[int] = None) -> str:
+        """Characters [start, end) of the stored text, decompressing only the blocks they span"""
+        return self.read_ranges(key, [(start, end)])[0]
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        """Yield characters [start, end) one block at a time, for streaming responses"""
+        index = self._index(key)
+        length, block_chars = index["length"], index["block_chars"]
+        start = max(0, min(start, length))
+        end = length if end is None else max(start, min(end, length))
+        for block in range(start // block_chars, (end - 1) // block_chars + 1 if end > start else 0):
+            text = self._read_blocks(key, index, [block])[block]
+            offset = block * block_chars
+            yield text[max(start - offset, 0):end - offset]
+
+    def read_ranges(self, key: str, ranges: List[Tuple[int, Optional[int]]]) -> List[str]:
+        """Several character ranges at once; each block is decompressed at most once"""
+        index = self._index(key)
+        length, block_chars = index["length"], index["block_chars"]
+        spans = []
+        for start, end in ranges:
+            start = max(0, min(start, length))
+            end = length if end is None else max(start, min(end, length))
+            spans.append((start, end))
+
+        needed = sorted({block for start, end in spans if end > start
+                         for block in range(start // block_chars, (end - 1) // block_chars + 1)})
+        blocks = self._read_blocks(key, index, needed)
+
+        texts = []
+        for start, end in spans:
+            if end <= start:
+                texts.append("")
+                continue
+            first, last = start // block_chars, (end - 1) // block_chars
+            joined = "".join(blocks[block] for block in range(first, last + 1))
+            offset = first * block_chars
+            texts.append(joined[start - offset:end - offset])
+        return texts
+
+    def _read_blocks(self, key: str, index: Dict[str, Any], blocks: List[int]) -> Dict[int, str]:
+        if not blocks:
+            return {}
+        decompressor = zstd.ZstdDecompressor()
+        offsets = index["offsets"]
+        result = {}
+        with open(self._path(key), "rb") as f:
+            for block in blocks:
+                f.seek(offsets[block])
+                frame = f.read(index["frames"][block])
+                result[block] = decompressor.decompress(frame).decode("utf-8")
+        return result
+
+    def _index(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No stored text for content {key}")
+        with open(path, "rb") as f:
+            f.seek(-4, os.SEEK_END)
+            (index_length,) = struct.unpack("<I", f.read(4))
+            f.seek(-(4 + index_length), os.SEEK_END)
+            index = json.loads(f.read(index_length))
+        # Frames are contiguous from the start of the file
+        offsets, position = [], 0
+        for size in index["frames"]:
+            offsets.append(position)
+            position += size
+        index["offsets"] = offsets
+
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.index_cache:
+                self._indexes.popitem(last=False)
+        return index
+
+
+text_store = TextStore()
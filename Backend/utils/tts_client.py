@@ -1,17 +1,112 @@
 from gtts import gTTS
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
 import os
+import tempfile
 import textwrap
+import threading
+import time
 from pydub import AudioSegment
 from pydub.utils import which
 
+try:
+    import resource  # CPU time of ffmpeg children; not available on Windows
+except ImportError:
+    resource = None
+
 # ✅ Tell pydub where ffmpeg is (if not already in PATH)
 AudioSegment.converter = which("ffmpeg")
 
+# gTTS fetches ~100 characters per request, one request after another, so text is
+# split into chunks synthesized side by side; smaller chunks mean more parallel requests
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "1000"))
+TTS_CHUNK_WORKERS = int(os.getenv("TTS_CHUNK_WORKERS", "4"))
+
+# MPEG audio frame header fields (Layer III only: gTTS returns MPEG-2 Layer III)
+_BITRATES_KBPS = {
+    "1": [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    "2": [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {"1": [44100, 48000, 32000], "2": [22050, 24000, 16000], "2.5": [11025, 12000, 8000]}
+_VERSIONS = {0b00: "2.5", 0b10: "2", 0b11: "1"}
+
+
+def _strip_tags(data: bytes) -> bytes:
+    """MP3 bytes without a leading ID3v2 tag or a trailing ID3v1 tag"""
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    return data
+
+
+def _frame_header(data: bytes, offset: int) -> Optional[Tuple[Tuple[str, int, int], int, int]]:
+    """((version, sample rate, channel mode), frame length, samples) of the Layer III frame at offset"""
+    if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+    version = _VERSIONS.get((data[offset + 1] >> 3) & 0b11)
+    layer = (data[offset + 1] >> 1) & 0b11
+    bitrate_index = data[offset + 2] >> 4
+    rate_index = (data[offset + 2] >> 2) & 0b11
+    if version is None or layer != 0b01 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _BITRATES_KBPS["1" if version == "1" else "2"][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (data[offset + 2] >> 1) & 1
+    samples = 1152 if version == "1" else 576
+    length = samples // 8 * bitrate // sample_rate + padding
+    return (version, sample_rate, data[offset + 3] >> 6), length, samples
+
+
+def _scan_frames(data: bytes) -> Optional[Tuple[Tuple[str, int, int], float]]:
+    """(stream format, duration in seconds) if data is a run of Layer III frames of one format, else None"""
+    offset, stream_format, samples = 0, None, 0
+    while offset < len(data):
+        header = _frame_header(data, offset)
+        if header is None:
+            return None
+        frame_format, length, frame_samples = header
+        if stream_format is None:
+            stream_format = frame_format
+        elif frame_format != stream_format:
+            return None
+        offset += length
+        samples += frame_samples
+    if stream_format is None:
+        return None
+    return stream_format, samples / stream_format[1]
+
+
+def _children_cpu_seconds() -> Optional[float]:
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
 class TTSClient:
-    def text_to_speech(self, text: str, output_path: str, lang: str = "en"):
+    def __init__(self, chunk_chars: int = TTS_CHUNK_CHARS, workers: int = TTS_CHUNK_WORKERS):
+        self.chunk_chars = chunk_chars
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-chunk")
+        self._lock = threading.Lock()
+        self._totals = {"files": 0, "chunks": 0, "audio_seconds": 0.0, "synthesis_seconds": 0.0,
+                        "frame_joins": 0, "ffmpeg_joins": 0, "ffmpeg_cpu_seconds": 0.0}
+
+    @staticmethod
+    def _synthesize(text: str, lang: str) -> bytes:
+        buffer = BytesIO()
+        gTTS(text=text, lang=lang).write_to_fp(buffer)
+        return _strip_tags(buffer.getvalue())
+
+    def text_to_speech(self, text: str, output_path: str, lang: str = "en") -> Dict[str, Any]:
         """
         Convert text to real speech and save as MP3.
-        Handles long text by splitting into chunks.
+        Long text is split into chunks synthesized concurrently in memory and
+        joined frame by frame; ffmpeg re-encodes only if the chunks' formats differ.
+        Returns timings for the file.
         """
         try:
             safe_text = (text or "").strip()
@@ -27,27 +122,80 @@ class TTSClient:
             print(f"Generating audio for: '{safe_text[:60]}...'")
             print(f"Saving to: {output_path}")
 
-            # ✅ gTTS max length ~5000 chars → split into 4000
-            chunks = textwrap.wrap(safe_text, 4000)
-
-            if len(chunks) == 1:
-                # Single chunk → direct save
-                tts = gTTS(text=safe_text, lang=lang)
-                tts.save(output_path)
-            else:
-                # Multiple chunks → merge with pydub
-                combined = AudioSegment.empty()
-                for i, chunk in enumerate(chunks, start=1):
-                    temp_file = f"{output_path}.part{i}.mp3"
-                    tts = gTTS(text=chunk, lang=lang)
-                    tts.save(temp_file)
-                    combined += AudioSegment.from_file(temp_file, format="mp3")
-                    os.remove(temp_file)
-
-                # ✅ Export final mp3 properly
-                combined.export(output_path, format="mp3")
+            chunks = textwrap.wrap(safe_text, self.chunk_chars)
+            started = time.perf_counter()
+            parts = list(self._executor.map(lambda chunk: self._synthesize(chunk, lang), chunks))
+            synthesis_seconds = time.perf_counter() - started
+
+            audio, audio_seconds, ffmpeg_cpu = self._join(parts)
+            self._write(output_path, audio)
+
+            stats = {
+                "chunks": len(chunks),
+                "audio_seconds": round(audio_seconds, 2),
+                "synthesis_seconds": round(synthesis_seconds, 2),
+                # Wall time spent synthesizing per minute of resulting audio
+                "synthesis_seconds_per_audio_minute": round(synthesis_seconds / audio_seconds * 60, 2)
+                if audio_seconds else None,
+                "join": "frames" if ffmpeg_cpu is None else "ffmpeg",
+                "ffmpeg_cpu_seconds": round(ffmpeg_cpu, 3) if ffmpeg_cpu is not None else 0.0,
+            }
+            self._record(stats)
+            print(f"🔊 {stats['audio_seconds']}s of audio from {len(chunks)} chunk(s) in "
+                  f"{stats['synthesis_seconds']}s ({stats['synthesis_seconds_per_audio_minute']}s per audio minute), "
+                  f"joined by {stats['join']}, ffmpeg CPU {stats['ffmpeg_cpu_seconds']}s")
+            return stats
 
         except Exception as e:
             raise Exception(f"TTS generation failed: {str(e)}")
 
+    @staticmethod
+    def _join(parts: List[bytes]) -> Tuple[bytes, float, Optional[float]]:
+        """(joined MP3, duration, ffmpeg CPU seconds or None when no re-encode was needed)"""
+        scans = [_scan_frames(part) for part in parts]
+        if all(scans) and len({scan[0] for scan in scans}) == 1:
+            # Same format throughout, so the frames can simply follow each other (as gTTS does for its own requests)
+            return b"".join(parts), sum(scan[1] for scan in scans), None
+
+        cpu_before = _children_cpu_seconds()
+        combined = AudioSegment.empty()
+        for part in parts:
+            combined += AudioSegment.from_file(BytesIO(part), format="mp3")
+        out = BytesIO()
+        combined.export(out, format="mp3")
+        cpu_after = _children_cpu_seconds()
+        # Counts every child process that finished meanwhile, so concurrent re-encodes share their totals
+        ffmpeg_cpu = cpu_after - cpu_before if cpu_before is not None else 0.0
+        return out.getvalue(), len(combined) / 1000, ffmpeg_cpu
+
+    @staticmethod
+    def _write(output_path: str, audio: bytes):
+        # Written whole and renamed, so the static mount never serves a partial episode
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(output_path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(audio)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _record(self, stats: Dict[str, Any]):
+        with self._lock:
+            self._totals["files"] += 1
+            self._totals["chunks"] += stats["chunks"]
+            self._totals["audio_seconds"] += stats["audio_seconds"]
+            self._totals["synthesis_seconds"] += stats["synthesis_seconds"]
+            self._totals["frame_joins" if stats["join"] == "frames" else "ffmpeg_joins"] += 1
+            self._totals["ffmpeg_cpu_seconds"] += stats["ffmpeg_cpu_seconds"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {name: round(value, 3) if isinstance(value, float) else value
+                     for name, value in self._totals.items()}
+        audio = stats["audio_seconds"]
+        stats["synthesis_seconds_per_audio_minute"] = round(stats["synthesis_seconds"] / audio * 60, 2) if audio else None
+        return stats
+
 tts_client = TTSClient()
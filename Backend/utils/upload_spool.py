@@ -0,0 +1,116 @@
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+import aiofiles
+import hashlib
+import mmap
+import os
+import tempfile
+
+# Uploads are streamed to disk in chunks and never held in memory as a whole
+UPLOAD_MAX_MB = int(os.getenv("UPLOAD_MAX_MB", "100"))
+UPLOAD_MAX_BYTES = UPLOAD_MAX_MB * 1024 * 1024
+# Whole request bodies (all files of a batch plus form fields), refused before they are read
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_MB", str(4 * UPLOAD_MAX_MB))) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_KB", "1024")) * 1024
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds UPLOAD_MAX_BYTES"""
+
+
+class SpooledUpload:
+    """An upload spooled to a temporary file, removed again on close"""
+
+    def __init__(self, path: str, filename: str, size: int, sha256: str):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+
+    def mmap(self) -> mmap.mmap:
+        """Map the spooled file read-only; caller closes the map"""
+        with open(self.path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+async def spool_upload(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> SpooledUpload:
+    """Copy a received upload to a named temp file in chunks, hashing it on the way.
+
+    Starlette has already read the body by now (UploadLimitMiddleware caps
+    that); the copy gives the extractors a path to open and applies the
+    per-file limit.
+    """
+    suffix = os.path.splitext(file.filename or "")[1]
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=UPLOAD_SPOOL_DIR)
+    os.close(fd)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(path, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"{file.filename} exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    return SpooledUpload(path, file.filename, size, digest.hexdigest())
+
+
+class UploadLimitMiddleware:
+    """Refuse request bodies over max_bytes before they are read.
+
+    Starlette parses a multipart body completely before the endpoint runs,
+    so this is the only place an oversized upload can be stopped early: a
+    Content-Length over the limit is answered with 413 without reading the
+    body, and a body without one is cut off once it passes the limit.
+    """
+
+    def __init__(self, app, max_bytes: int = UPLOAD_MAX_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit"
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside body parsing, which passes HTTPExceptions through unchanged
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -2,6 +2,7 @@ import React, { useState, useEffect, useRef } from "react";
 import "./audiosummarypage.css";
 import { useAuth } from "../../context/AuthContext";
 import { usePodcasts } from "../../context/PodcastContext";
+import { fetchAllPages } from "../../config/pagination";
 
 const AudioSummaryPage = () => {
   const { user } = useAuth();
@@ -30,13 +31,10 @@ const AudioSummaryPage = () => {
     if (!user || !user.id) return;
     console.log("Fetching documents for user:", user);
     try {
-      const response = await fetch(`${API_BASE_URL}/documents/${user.id}`);
-      if (!response.ok) {
-        throw new Error("Failed to fetch documents");
-      }
-      const data = await response.json();
-      console.log("Fetched documents:", data);
-      setDocuments(data);
+      // Every page, so users with many documents still see all of them
+      const items = await fetchAllPages(`${API_BASE_URL}/documents/${user.id}?fields=id,filename&limit=200`);
+      console.log("Fetched documents:", items);
+      setDocuments(items);
     } catch (err) {
       console.error("Error fetching documents:", err);
       setError(err.message);
@@ -47,12 +45,8 @@ const AudioSummaryPage = () => {
   const fetchPodcasts = async () => {
     if (!user || !user.id) return;
     try {
-      const response = await fetch(`${API_BASE_URL}/podcasts/${user.id}`);
-      if (!response.ok) {
-        throw new Error("Failed to fetch podcasts");
-      }
-      const data = await response.json();
-      setPodcasts(data);
+      // The history is paginated; follow the cursor so older podcasts are listed too
+      setPodcasts(await fetchAllPages(`${API_BASE_URL}/podcasts/${user.id}?limit=200`));
     } catch (err) {
       setError(err.message);
     }
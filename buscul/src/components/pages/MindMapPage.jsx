@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../../context/AuthContext';
+import { fetchAllPages } from '../../config/pagination';
 import './MindMapPage.css';
 
 const MindMapPage = () => {
@@ -21,11 +22,8 @@ const MindMapPage = () => {
 
   const fetchDocuments = async () => {
     try {
-      const response = await fetch(`http://localhost:8000/documents/${user.id}`);
-      if (response.ok) {
-        const data = await response.json();
-        setDocuments(data);
-      }
+      // Every page, so users with many documents still see all of them
+      setDocuments(await fetchAllPages(`http://localhost:8000/documents/${user.id}?fields=id,filename&limit=200`));
     } catch (error) {
       console.error('Error fetching documents:', error);
     }
@@ -33,11 +31,8 @@ const MindMapPage = () => {
 
   const fetchUserMindMaps = async () => {
     try {
-      const response = await fetch(`http://localhost:8000/mindmaps/${user.id}`);
-      if (response.ok) {
-        const data = await response.json();
-        setUserMindMaps(data);
-      }
+      // The history is paginated; follow the cursor so older mind maps are listed too
+      setUserMindMaps(await fetchAllPages(`http://localhost:8000/mindmaps/${user.id}?limit=200`));
     } catch (error) {
       console.error('Error fetching mind maps:', error);
     }
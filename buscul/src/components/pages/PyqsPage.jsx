@@ -72,7 +72,7 @@ const PyqsPage = () => {
           <label className="file-input-wrapper">
             <input
               type="file"
-              accept=".pdf,.docx,.txt"
+              accept=".pdf,.docx,.pptx,.txt"
               onChange={handleFileUpload}
               className="file-input"
               disabled={loading}
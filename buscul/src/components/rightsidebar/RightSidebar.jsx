@@ -35,11 +35,11 @@ const RightSidebar = () => {
 
   const fetchUserMindMaps = async () => {
     try {
-      const response = await fetch(`http://localhost:8000/mindmaps/${user.id}`);
+      const response = await fetch(`http://localhost:8000/mindmaps/${user.id}?limit=5`);
       if (response.ok) {
         const data = await response.json();
-        // Keep only the most recent 5 mind maps
-        setSavedMindMaps(data.slice(0, 5));
+        // The most recent 5 mind maps
+        setSavedMindMaps(data.items);
       }
     } catch (error) {
       console.error('Error fetching mind maps:', error);
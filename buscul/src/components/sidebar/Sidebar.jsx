@@ -4,6 +4,7 @@ import { useContext, useState, useRef, useEffect } from "react";
 import { Context } from "../../context/Context";
 import { useNavigate } from "react-router-dom";
 import { useAuth } from "../../context/AuthContext";
+import { fetchAllPages } from "../../config/pagination";
 
 const Sidebar = () => {
   const [extended, setExtended] = useState(true);
@@ -23,13 +24,8 @@ const Sidebar = () => {
     if (user && user.id) {
       try {
         const API_BASE_URL = "http://localhost:8000";
-        const response = await fetch(`${API_BASE_URL}/documents/${user.id}`);
-        if (response.ok) {
-          const data = await response.json();
-          setDocuments(data);
-        } else {
-          console.error("Failed to fetch documents");
-        }
+        // Every page, so users with many documents still see all of them
+        setDocuments(await fetchAllPages(`${API_BASE_URL}/documents/${user.id}?fields=id,filename&limit=200`));
       } catch (error) {
         console.error("Error fetching documents:", error);
       }
@@ -104,10 +100,22 @@ const Sidebar = () => {
         result = responseBody;
       }
 
+      fetchDocuments(); // Call fetchDocuments after successful upload
+
+      // A batch succeeds if any file does, so name the files that were dropped
+      const failed = (result.results || []).filter((item) => item.status !== "success");
+      if (failed.length > 0) {
+        console.warn("Some files failed to upload:", failed);
+        setUploadError(
+          `Uploaded ${result.succeeded} of ${result.results.length} files. Not uploaded: ` +
+            failed.map((item) => `${item.filename} (${item.error})`).join("; ")
+        );
+        return;
+      }
+
       console.log("Upload successful:", result);
       setUploadSuccess(true);
       setTimeout(() => setUploadSuccess(false), 3000);
-      fetchDocuments(); // Call fetchDocuments after successful upload
     } catch (error) {
       console.error("Upload error:", error);
       setUploadError(error.message);
@@ -177,7 +185,7 @@ const Sidebar = () => {
             ref={fileInputRef}
             style={{ display: "none" }}
             onChange={handleFileChange}
-            accept=".pdf,.docx,.doc,.png,.jpg,.jpeg,.gif,.bmp,.tiff"
+            accept=".pdf,.docx,.doc,.pptx,.png,.jpg,.jpeg,.gif,.bmp,.tiff"
             disabled={uploading}
             multiple
           />
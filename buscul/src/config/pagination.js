@@ -0,0 +1,23 @@
+/**
+ * Fetch every page of a cursor-paginated list endpoint
+ * @param {string} url - List URL, optionally with query parameters such as limit or fields
+ * @returns {Promise<Array>} - The items of all pages, in order
+ */
+export async function fetchAllPages(url) {
+  const items = [];
+  let cursor = null;
+  do {
+    const pageUrl = new URL(url);
+    if (cursor) {
+      pageUrl.searchParams.set("cursor", cursor);
+    }
+    const response = await fetch(pageUrl);
+    if (!response.ok) {
+      throw new Error(`Failed to fetch ${pageUrl.pathname}: ${response.status}`);
+    }
+    const data = await response.json();
+    items.push(...data.items);
+    cursor = data.next_cursor;
+  } while (cursor);
+  return items;
+}